@@ -1,28 +1,32 @@
+from datetime import datetime, timedelta, timezone
+
 from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from fastapi import APIRouter, Depends
 
-from app.db.session import get_db
-from app.models import Node, NodeUsage, User
+from app.db.session import get_db, get_read_db
+from app.models import Node, User
 from app.services.rbac import require_scopes
+from app.services.usage_store import compact_usage, usage_rows
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
 @router.get("/overview", dependencies=[Depends(require_scopes("billing.read"))])
-def overview(db: Session = Depends(get_db)) -> dict:
+def overview(db: Session = Depends(get_read_db)) -> dict:
     users_total = len(db.scalars(select(User.id)).all())
     users_active = len(db.scalars(select(User.id).where(User.status == "active")).all())
     nodes_total = len(db.scalars(select(Node.id)).all())
     nodes_online = len(db.scalars(select(Node.id).where(Node.status == "online")).all())
-    total_traffic = db.scalar(select(func.coalesce(func.sum(NodeUsage.bytes_used), 0))) or 0
+    usage = usage_rows()
+    total_traffic = db.scalar(select(func.coalesce(func.sum(usage.c.bytes_used), 0))) or 0
 
+    recent = usage_rows(since=datetime.now(timezone.utc) - timedelta(days=30))
     per_day_rows = db.execute(
-        select(func.date(NodeUsage.reported_at), func.coalesce(func.sum(NodeUsage.bytes_used), 0))
-        .group_by(func.date(NodeUsage.reported_at))
-        .order_by(func.date(NodeUsage.reported_at))
-        .limit(30)
+        select(func.date(recent.c.reported_at), func.coalesce(func.sum(recent.c.bytes_used), 0))
+        .group_by(func.date(recent.c.reported_at))
+        .order_by(func.date(recent.c.reported_at))
     ).all()
     traffic_per_day = [{"day": str(day), "bytes": int(total)} for day, total in per_day_rows]
 
@@ -31,3 +35,8 @@ def overview(db: Session = Depends(get_db)) -> dict:
         "nodes": {"total": nodes_total, "online": nodes_online},
         "traffic": {"total_bytes": int(total_traffic), "per_day": traffic_per_day},
     }
+
+
+@router.post("/usage/compact", dependencies=[Depends(require_scopes("api.manage"))])
+def compact_usage_storage(db: Session = Depends(get_db)) -> dict:
+    return compact_usage(db)
@@ -1,42 +1,111 @@
+import json
+from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import desc, select
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import Text, cast, desc, func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.core.responses import ORJSONResponse
+from app.db.session import get_read_db
 from app.models import AuditLog
+from app.services.pagination import decode_time_cursor, encode_cursor
 from app.services.rbac import require_scopes
 
 router = APIRouter(prefix="/audit", tags=["audit"])
 
 
-@router.get("/logs", dependencies=[Depends(require_scopes("users.read"))])
+def _utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _payload_filters(db: Session, contains: Optional[str], search: Optional[str]) -> list:
+    postgres = db.get_bind().dialect.name == "postgresql"
+    clauses = []
+    if contains:
+        try:
+            document = json.loads(contains)
+        except ValueError:
+            document = None
+        if not isinstance(document, dict):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_payload_filter")
+        if postgres:
+            # Served by ix_audit_logs_payload_jsonb.
+            clauses.append(cast(AuditLog.payload, JSONB).contains(document))
+        else:
+            for key, value in document.items():
+                # Compare JSON values, not their text: 1, true and "1" are different.
+                path, encoded = f"$.{json.dumps(key)}", json.dumps(value)
+                clauses.append(func.json_type(AuditLog.payload, path) == func.json_type(encoded))
+                clauses.append(func.json_extract(AuditLog.payload, path).is_(func.json_extract(encoded, "$")))
+    if search:
+        if postgres:
+            # Served by ix_audit_logs_payload_fts. The expression must match the
+            # index exactly, so the text search config is inlined, not bound.
+            config = literal_column("'simple'::regconfig")
+            clauses.append(
+                func.to_tsvector(config, cast(AuditLog.payload, Text)).bool_op("@@")(func.plainto_tsquery(config, search))
+            )
+        else:
+            clauses.append(cast(AuditLog.payload, Text).contains(search, autoescape=True))
+    return clauses
+
+
+@router.get("/logs", response_class=ORJSONResponse, dependencies=[Depends(require_scopes("users.read"))])
 def list_audit_logs(
     limit: int = Query(default=100, ge=1, le=500),
-    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    offset: Optional[int] = Query(default=None, ge=0, deprecated=True, description="use cursor instead"),
     action: Optional[str] = Query(default=None),
     entity_type: Optional[str] = Query(default=None),
-    db: Session = Depends(get_db),
-) -> dict:
+    entity_id: Optional[str] = Query(default=None),
+    actor: Optional[str] = Query(default=None),
+    since: Optional[datetime] = Query(default=None),
+    until: Optional[datetime] = Query(default=None),
+    payload: Optional[str] = Query(default=None, description='JSON object the payload must contain, e.g. {"user_id": "..."}'),
+    q: Optional[str] = Query(default=None, description="free-text search over payload values"),
+    db: Session = Depends(get_read_db),
+) -> ORJSONResponse:
     query = select(AuditLog)
     if action:
         query = query.where(AuditLog.action == action)
     if entity_type:
         query = query.where(AuditLog.entity_type == entity_type)
+    if entity_id:
+        query = query.where(AuditLog.entity_id == entity_id)
+    if actor:
+        query = query.where(AuditLog.actor == actor)
+    if since:
+        query = query.where(AuditLog.created_at >= _utc(since))
+    if until:
+        query = query.where(AuditLog.created_at < _utc(until))
+    for clause in _payload_filters(db, payload, q):
+        query = query.where(clause)
+    if cursor and offset is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="use_cursor_or_offset")
+    if cursor:
+        query = query.where(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(*decode_time_cursor(cursor)))
+    elif offset:
+        # Deprecated: scans every skipped row. The page still carries next_cursor to switch over.
+        query = query.offset(offset)
 
-    items = db.scalars(query.order_by(desc(AuditLog.created_at)).offset(offset).limit(limit)).all()
-    return {
-        "items": [
-            {
-                "id": item.id,
-                "actor": item.actor,
-                "action": item.action,
-                "entity_type": item.entity_type,
-                "entity_id": item.entity_id,
-                "payload": item.payload,
-                "created_at": item.created_at,
-            }
-            for item in items
-        ]
-    }
+    rows = db.scalars(query.order_by(desc(AuditLog.created_at), desc(AuditLog.id)).limit(limit + 1)).all()
+    items = rows[:limit]
+    return ORJSONResponse(
+        {
+            "items": [
+                {
+                    "id": item.id,
+                    "actor": item.actor,
+                    "action": item.action,
+                    "entity_type": item.entity_type,
+                    "entity_id": item.entity_id,
+                    "payload": item.payload,
+                    "created_at": item.created_at,
+                }
+                for item in items
+            ],
+            "next_cursor": encode_cursor((items[-1].created_at, items[-1].id)) if len(rows) > limit else None,
+        }
+    )
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.models import ApiKey, ApiKeyStatus, AuthPrincipal, Reseller, RoleName
 from app.schemas.auth import (
     ApiKeyCreate,
@@ -22,6 +22,7 @@ from app.services.auth import (
     hash_password,
     principal_scopes,
 )
+from app.services.auth_cache import api_key_cache
 from app.services.rbac import require_scopes
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -159,7 +160,7 @@ def create_api_key(payload: ApiKeyCreate, db: Session = Depends(get_db), ctx=Dep
 
 
 @router.get("/api-keys", response_model=list[ApiKeyResponse], dependencies=[Depends(require_scopes("api.manage"))])
-def list_api_keys(db: Session = Depends(get_db), ctx=Depends(get_auth_context)) -> list[ApiKey]:
+def list_api_keys(db: Session = Depends(get_read_db), ctx=Depends(get_auth_context)) -> list[ApiKey]:
     query = select(ApiKey).where(ApiKey.owner_principal_id == ctx.principal_id).order_by(ApiKey.created_at.desc())
     return db.scalars(query).all()
 
@@ -173,4 +174,5 @@ def revoke_api_key(api_key_id: str, db: Session = Depends(get_db), ctx=Depends(g
     api_key.status = ApiKeyStatus.revoked
     write_audit(db, ctx.principal_id, "api_key.revoked", "api_key", api_key.id)
     db.commit()
+    api_key_cache.invalidate(api_key.key_hash)
     return {"ok": True}
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.models import Order, OrderStatus, Payment, Plan, User
 from app.schemas.billing import (
     OrderCreate,
@@ -33,7 +33,7 @@ def create_plan(payload: PlanCreate, db: Session = Depends(get_db)) -> Plan:
 
 
 @router.get("/plans", response_model=list[PlanResponse], dependencies=[Depends(require_scopes("billing.read"))])
-def list_plans(db: Session = Depends(get_db)) -> list[Plan]:
+def list_plans(db: Session = Depends(get_read_db)) -> list[Plan]:
     return db.scalars(select(Plan).where(Plan.is_active.is_(True)).order_by(Plan.price)).all()
 
 
@@ -84,10 +84,10 @@ def get_order(order_id: str, db: Session = Depends(get_db)) -> Order:
 
 
 @router.get("/orders", response_model=list[OrderResponse], dependencies=[Depends(require_scopes("billing.read"))])
-def list_orders(limit: int = 100, db: Session = Depends(get_db)) -> list[Order]:
+def list_orders(limit: int = 100, db: Session = Depends(get_read_db)) -> list[Order]:
     return db.scalars(select(Order).order_by(Order.created_at.desc()).limit(limit)).all()
 
 
 @router.get("/payments", response_model=list[PaymentResponse], dependencies=[Depends(require_scopes("billing.read"))])
-def list_payments(limit: int = 100, db: Session = Depends(get_db)) -> list[Payment]:
+def list_payments(limit: int = 100, db: Session = Depends(get_read_db)) -> list[Payment]:
     return db.scalars(select(Payment).order_by(Payment.created_at.desc()).limit(limit)).all()
@@ -1,8 +1,16 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from app.core import metrics
+from app.services.rbac import require_scopes
 
 router = APIRouter(tags=["health"])
 
 
 @router.get("/health")
-def health() -> dict:
+async def health() -> dict:
     return {"status": "ok"}
+
+
+@router.get("/metrics", dependencies=[Depends(require_scopes("api.manage"))])
+async def runtime_metrics() -> dict:
+    return metrics.snapshot()
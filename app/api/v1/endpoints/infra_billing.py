@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 
 from fastapi import APIRouter, Depends
 
-from app.db.session import get_db
+from app.db.session import get_read_db
 from app.models import Server
 from app.services.rbac import require_scopes
 
@@ -11,7 +11,7 @@ router = APIRouter(prefix="/infra-billing", tags=["infra-billing"])
 
 
 @router.get("/report", dependencies=[Depends(require_scopes("infra.billing.read"))])
-def report(db: Session = Depends(get_db)) -> dict:
+def report(db: Session = Depends(get_read_db)) -> dict:
     rows = db.execute(
         select(Server.provider, Server.currency, func.count(Server.id), func.coalesce(func.sum(Server.price), 0)).group_by(
             Server.provider, Server.currency
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.models import MigrationMode, MigrationRun, SubscriptionAlias, User
 from app.schemas.migration import LegacyTokenMapCreate, MigrationRunRequest, MigrationRunResponse
 from app.services.audit import write_audit
@@ -57,5 +57,5 @@ def create_legacy_map(
 
 
 @router.get("/runs", response_model=list[MigrationRunResponse], dependencies=[Depends(require_scopes("migration.run"))])
-def list_runs(db: Session = Depends(get_db)) -> list[MigrationRun]:
+def list_runs(db: Session = Depends(get_read_db)) -> list[MigrationRun]:
     return db.scalars(select(MigrationRun).order_by(MigrationRun.created_at.desc())).all()
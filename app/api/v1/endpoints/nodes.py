@@ -3,9 +3,11 @@ from typing import Optional
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
 from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.core.responses import ORJSONResponse
+from app.db.session import get_async_db, get_db, get_read_db
 from app.models import ConfigRevision, ConfigRevisionStatus, Node, NodeStatus, Server
 from app.schemas.nodes import (
     AgentApplyResult,
@@ -17,8 +19,14 @@ from app.schemas.nodes import (
 )
 from app.services.audit import write_audit
 from app.services.auth import AuthContext, get_auth_context
+from app.services.config_patch import desired_config_delivery
+from app.services.config_render import render_nodes
+from app.services.config_store import put_config
+from app.services.node_load import node_load
 from app.services.rbac import require_scopes
+from app.services.rollouts import record_apply_result, supersede_rollouts
 from app.services.traffic import report_usage
+from app.services.user_feed import compact_user_changes, squad_changes
 from app.services.webhooks import enqueue_event
 
 admin_router = APIRouter(prefix="/nodes", tags=["nodes"])
@@ -31,11 +39,14 @@ def create_node(payload: NodeCreate, db: Session = Depends(get_db), ctx: AuthCon
     if not server:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="server_not_found")
 
-    node = Node(**payload.model_dump())
+    node = Node(
+        **payload.model_dump(exclude={"desired_config"}),
+        desired_config_hash=put_config(db, payload.desired_config),
+    )
     db.add(node)
     db.flush()
 
-    revision = ConfigRevision(node_id=node.id, revision=node.desired_config_revision, config=node.desired_config)
+    revision = ConfigRevision(node_id=node.id, revision=node.desired_config_revision, config_hash=node.desired_config_hash)
     db.add(revision)
 
     write_audit(db, ctx.principal_id, "node.created", "node", node.id, {"server_id": node.server_id})
@@ -45,13 +56,48 @@ def create_node(payload: NodeCreate, db: Session = Depends(get_db), ctx: AuthCon
 
 
 @admin_router.get("", response_model=list[NodeResponse], dependencies=[Depends(require_scopes("nodes.control"))])
-def list_nodes(status_filter: Optional[str] = None, db: Session = Depends(get_db)) -> list[Node]:
+def list_nodes(status_filter: Optional[str] = None, db: Session = Depends(get_read_db)) -> list[Node]:
     query = select(Node)
     if status_filter:
         query = query.where(Node.status == status_filter)
     return db.scalars(query.order_by(Node.last_seen_at.desc().nullslast())).all()
 
 
+@admin_router.get("/load", dependencies=[Depends(require_scopes("nodes.control"))])
+def node_load_snapshot() -> dict:
+    # This worker's view, keyed by server id.
+    return {"servers": node_load.snapshot()}
+
+
+@admin_router.post("/render", dependencies=[Depends(require_scopes("nodes.control"))])
+def render_node_configs(
+    squad_id: Optional[str] = Body(default=None, embed=True),
+    node_ids: Optional[list[str]] = Body(default=None, embed=True),
+    db: Session = Depends(get_db),
+    ctx: AuthContext = Depends(get_auth_context),
+) -> dict:
+    result = render_nodes(db, squad_id=squad_id, node_ids=node_ids)
+    supersede_rollouts(db, result["changed_node_ids"])
+    if result["changed"]:
+        write_audit(
+            db,
+            ctx.principal_id,
+            "node.configs_rendered",
+            "node",
+            squad_id or "fleet",
+            {"changed": result["changed"], "rendered": result["rendered"]},
+        )
+    db.commit()
+    return {"ok": True, **result}
+
+
+@admin_router.post("/user-changes/compact", dependencies=[Depends(require_scopes("nodes.control"))])
+def compact_user_feed(db: Session = Depends(get_db)) -> dict:
+    deleted = compact_user_changes(db)
+    db.commit()
+    return {"ok": True, "deleted": deleted}
+
+
 @admin_router.post("/check-offline", dependencies=[Depends(require_scopes("nodes.control"))])
 def check_offline_nodes(
     offline_after_seconds: int = 120,
@@ -86,9 +132,10 @@ def update_desired_config(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="node_not_found")
 
     node.desired_config_revision += 1
-    node.desired_config = desired_config
-    revision = ConfigRevision(node_id=node.id, revision=node.desired_config_revision, config=desired_config)
+    node.desired_config_hash = put_config(db, desired_config)
+    revision = ConfigRevision(node_id=node.id, revision=node.desired_config_revision, config_hash=node.desired_config_hash)
     db.add(revision)
+    supersede_rollouts(db, [node.id])
     write_audit(
         db,
         ctx.principal_id,
@@ -121,16 +168,17 @@ def rollback_node(
 
     current_revision = node.desired_config_revision
     node.desired_config_revision += 1
-    node.desired_config = target.config
+    node.desired_config_hash = target.config_hash
 
     rollback_revision = ConfigRevision(
         node_id=node.id,
         revision=node.desired_config_revision,
-        config=target.config,
+        config_hash=target.config_hash,
         status=ConfigRevisionStatus.rolled_back,
         rolled_back_from=current_revision,
     )
     db.add(rollback_revision)
+    supersede_rollouts(db, [node.id])
     write_audit(
         db,
         ctx.principal_id,
@@ -144,45 +192,68 @@ def rollback_node(
     return {"ok": True, "desired_config_revision": node.desired_config_revision, "rolled_back_to": target.revision}
 
 
-@agent_router.post("/heartbeat")
-def heartbeat(payload: AgentHeartbeat, db: Session = Depends(get_db)) -> dict:
-    node = db.scalar(select(Node).where(Node.node_token == payload.node_token))
+async def _agent_node(db: AsyncSession, node_token: str) -> Node:
+    node = await db.scalar(select(Node).where(Node.node_token == node_token))
     if not node:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="node_not_found")
+    return node
+
 
+@agent_router.post("/heartbeat")
+async def heartbeat(payload: AgentHeartbeat, db: AsyncSession = Depends(get_async_db)) -> dict:
+    node = await _agent_node(db, payload.node_token)
     node.last_seen_at = datetime.now(timezone.utc)
     node.engine_awg2_version = payload.engine_awg2_version
     node.engine_singbox_version = payload.engine_singbox_version
     node.status = NodeStatus.online
-    db.commit()
+    await db.commit()
+    node_load.record_heartbeat(node.server_id, payload.cpu_percent, payload.connections)
     return {"ok": True}
 
 
-@agent_router.get("/desired-config", response_model=DesiredConfigResponse)
-def desired_config(node_token: str = Query(...), db: Session = Depends(get_db)) -> DesiredConfigResponse:
-    node = db.scalar(select(Node).where(Node.node_token == node_token))
-    if not node:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="node_not_found")
-
-    return DesiredConfigResponse(
-        node_id=node.id,
-        desired_config_revision=node.desired_config_revision,
-        desired_config=node.desired_config,
+@agent_router.get("/desired-config", response_model=DesiredConfigResponse, response_class=ORJSONResponse)
+async def desired_config(
+    node_token: str = Query(...),
+    applied_config_revision: Optional[int] = Query(default=None),
+    db: AsyncSession = Depends(get_async_db),
+) -> ORJSONResponse:
+    # Configs can run to megabytes; they are rendered directly rather than
+    # validated into DesiredConfigResponse first.
+    node = await _agent_node(db, node_token)
+    delivery = await db.run_sync(desired_config_delivery, node.id, node.desired_config_hash, applied_config_revision)
+    return ORJSONResponse(
+        {
+            "node_id": node.id,
+            "desired_config_revision": node.desired_config_revision,
+            "desired_config_hash": node.desired_config_hash,
+            "desired_config": None,
+            "base_config_revision": None,
+            "patch": None,
+            **delivery,
+        }
     )
 
 
-@agent_router.post("/apply-result")
-def apply_result(payload: AgentApplyResult, db: Session = Depends(get_db)) -> dict:
-    node = db.scalar(select(Node).where(Node.node_token == payload.node_token))
-    if not node:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="node_not_found")
+@agent_router.get("/user-changes")
+async def user_changes(
+    node_token: str = Query(...),
+    since: int = Query(default=0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+) -> dict:
+    node = await _agent_node(db, node_token)
+    squad_id = await db.scalar(select(Server.squad_id).where(Server.id == node.server_id))
+    return {"node_id": node.id, "squad_id": squad_id, **await db.run_sync(squad_changes, squad_id, since)}
 
+
+@agent_router.post("/apply-result")
+async def apply_result(payload: AgentApplyResult, db: AsyncSession = Depends(get_async_db)) -> dict:
+    node = await _agent_node(db, payload.node_token)
     node.applied_config_revision = payload.applied_config_revision
     node.last_apply_status = payload.status
     node.last_seen_at = datetime.now(timezone.utc)
     node.status = NodeStatus.online if payload.status == "success" else NodeStatus.error
 
-    revision = db.scalar(
+    revision = await db.scalar(
         select(ConfigRevision).where(
             ConfigRevision.node_id == node.id,
             ConfigRevision.revision == payload.applied_config_revision,
@@ -191,6 +262,7 @@ def apply_result(payload: AgentApplyResult, db: Session = Depends(get_db)) -> di
     if revision:
         revision.status = ConfigRevisionStatus.applied if payload.status == "success" else ConfigRevisionStatus.failed
         revision.applied_at = datetime.now(timezone.utc)
+    await db.run_sync(record_apply_result, node.id, payload.applied_config_revision, payload.status == "success")
 
     write_audit(
         db,
@@ -200,17 +272,19 @@ def apply_result(payload: AgentApplyResult, db: Session = Depends(get_db)) -> di
         entity_id=node.id,
         payload={"status": payload.status, "revision": payload.applied_config_revision},
     )
-    db.commit()
-
-    enqueue_event(
-        db,
+    await db.run_sync(
+        enqueue_event,
         "config.applied",
         {"node_id": node.id, "status": payload.status, "revision": payload.applied_config_revision},
+        auto_commit=False,
     )
+    await db.commit()
     return {"ok": True}
 
 
 @agent_router.post("/report-usage")
-def usage(payload: AgentReportUsage, db: Session = Depends(get_db)) -> dict:
-    report_usage(db, payload.node_token, payload.user_uuid, payload.bytes_used, payload.device_hash)
+async def usage(payload: AgentReportUsage, db: AsyncSession = Depends(get_async_db)) -> dict:
+    # The usage pipeline (devices, audit, webhooks) is shared with sync callers,
+    # so it runs on the async connection through run_sync.
+    await db.run_sync(report_usage, payload.node_token, payload.user_uuid, payload.bytes_used, payload.device_hash)
     return {"ok": True}
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import desc, select
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.models import ProtocolProfile, ProtocolType
 from app.schemas.protocols import ProtocolProfileCreate, ProtocolProfileResponse
 from app.services.auth import AuthContext, get_auth_context
@@ -30,5 +30,5 @@ def create_protocol_profile(
 
 
 @router.get("", response_model=list[ProtocolProfileResponse], dependencies=[Depends(require_scopes("nodes.control"))])
-def list_protocol_profiles(db: Session = Depends(get_db)) -> list[ProtocolProfile]:
+def list_protocol_profiles(db: Session = Depends(get_read_db)) -> list[ProtocolProfile]:
     return db.scalars(select(ProtocolProfile).order_by(desc(ProtocolProfile.created_at))).all()
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.models import Reseller, User
 from app.schemas.reseller import ResellerCreate, ResellerResponse
 from app.services.audit import write_audit
@@ -28,7 +28,7 @@ def create_reseller(
 
 
 @router.get("", response_model=list[ResellerResponse], dependencies=[Depends(require_scopes("api.manage"))])
-def list_resellers(db: Session = Depends(get_db)) -> list[Reseller]:
+def list_resellers(db: Session = Depends(get_read_db)) -> list[Reseller]:
     return db.scalars(select(Reseller).order_by(Reseller.created_at.desc())).all()
 
 
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import desc, select
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db, get_read_db
+from app.models import NodeStatus, Rollout
+from app.schemas.rollouts import RolloutCreate, RolloutResponse
+from app.services.auth import AuthContext, get_auth_context
+from app.services.rbac import require_scopes
+from app.services.rollouts import advance_rollout, start_rollout, wave_counts
+
+router = APIRouter(prefix="/rollouts", tags=["rollouts"])
+
+
+def _response(db: Session, rollout: Rollout) -> RolloutResponse:
+    response = RolloutResponse.model_validate(rollout)
+    response.progress = wave_counts(db, rollout.id)
+    return response
+
+
+@router.post("", response_model=RolloutResponse, dependencies=[Depends(require_scopes("nodes.control"))])
+def create_rollout(
+    payload: RolloutCreate,
+    db: Session = Depends(get_db),
+    ctx: AuthContext = Depends(get_auth_context),
+) -> RolloutResponse:
+    if (payload.config is None) == (payload.template is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="config_or_template_required")
+    if not (payload.squad_id or payload.region or payload.node_status or payload.node_ids or payload.all_nodes):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="rollout_target_required")
+    try:
+        node_status = NodeStatus(payload.node_status) if payload.node_status else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_node_status")
+
+    rollout = start_rollout(
+        db,
+        ctx.principal_id,
+        {"squad_id": payload.squad_id, "region": payload.region, "node_status": node_status, "node_ids": payload.node_ids},
+        config=payload.config,
+        template=payload.template,
+        canary_percent=payload.canary_percent,
+        failure_threshold=payload.failure_threshold,
+        auto_advance=payload.auto_advance,
+    )
+    db.commit()
+    return _response(db, rollout)
+
+
+@router.get("", response_model=list[RolloutResponse], dependencies=[Depends(require_scopes("nodes.control"))])
+def list_rollouts(limit: int = 50, db: Session = Depends(get_read_db)) -> list[Rollout]:
+    return db.scalars(select(Rollout).order_by(desc(Rollout.created_at)).limit(min(limit, 500))).all()
+
+
+@router.get("/{rollout_id}", response_model=RolloutResponse, dependencies=[Depends(require_scopes("nodes.control"))])
+def get_rollout(rollout_id: str, db: Session = Depends(get_read_db)) -> RolloutResponse:
+    rollout = db.get(Rollout, rollout_id)
+    if not rollout:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="rollout_not_found")
+    return _response(db, rollout)
+
+
+@router.post("/{rollout_id}/advance", response_model=RolloutResponse, dependencies=[Depends(require_scopes("nodes.control"))])
+def advance(
+    rollout_id: str,
+    db: Session = Depends(get_db),
+    ctx: AuthContext = Depends(get_auth_context),
+) -> RolloutResponse:
+    rollout = db.get(Rollout, rollout_id, with_for_update=True)
+    if not rollout:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="rollout_not_found")
+    advance_rollout(db, rollout, ctx.principal_id)
+    db.commit()
+    return _response(db, rollout)
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.models import Server, Squad, SquadSelectionPolicy
 from app.schemas.squads import ServerCreate, ServerResponse, SquadCreate, SquadResponse
 from app.services.audit import write_audit
@@ -28,7 +28,7 @@ def create_squad(payload: SquadCreate, db: Session = Depends(get_db)) -> Squad:
 
 
 @router.get("/squads", response_model=list[SquadResponse], dependencies=[Depends(require_scopes("users.read"))])
-def list_squads(db: Session = Depends(get_db)) -> list[Squad]:
+def list_squads(db: Session = Depends(get_read_db)) -> list[Squad]:
     return db.scalars(select(Squad).order_by(Squad.name)).all()
 
 
@@ -47,12 +47,12 @@ def create_server(payload: ServerCreate, db: Session = Depends(get_db)) -> Serve
 
 
 @router.get("/servers", response_model=list[ServerResponse], dependencies=[Depends(require_scopes("users.read"))])
-def list_servers(db: Session = Depends(get_db)) -> list[Server]:
+def list_servers(db: Session = Depends(get_read_db)) -> list[Server]:
     return db.scalars(select(Server).order_by(Server.host.asc())).all()
 
 
 @router.get("/squads/{squad_id}/servers", response_model=list[ServerResponse], dependencies=[Depends(require_scopes("users.read"))])
-def list_squad_servers(squad_id: str, db: Session = Depends(get_db)) -> list[Server]:
+def list_squad_servers(squad_id: str, db: Session = Depends(get_read_db)) -> list[Server]:
     squad = db.get(Squad, squad_id)
     if not squad:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="squad_not_found")
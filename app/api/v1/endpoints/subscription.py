@@ -1,13 +1,26 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.core.responses import ORJSONResponse
+from app.db.session import get_async_db
 from app.services.subscription import build_subscription_payload, resolve_user_by_subscription_token
 
 router = APIRouter(tags=["subscription"])
 
 
-@router.get("/subscriptions/{token}")
-def subscription(token: str, db: Session = Depends(get_db)) -> dict:
+def _subscription_payload(db: Session, token: str, limit: Optional[int], region: Optional[str]) -> dict:
     user = resolve_user_by_subscription_token(db, token)
-    return build_subscription_payload(db, user)
+    return build_subscription_payload(db, user, limit=limit, region=region)
+
+
+@router.get("/subscriptions/{token}", response_class=ORJSONResponse)
+async def subscription(
+    token: str,
+    limit: Optional[int] = Query(default=None, ge=1),
+    region: Optional[str] = Query(default=None, max_length=64),
+    db: AsyncSession = Depends(get_async_db),
+) -> ORJSONResponse:
+    return ORJSONResponse(await db.run_sync(_subscription_payload, token, limit, region))
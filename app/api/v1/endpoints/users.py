@@ -2,20 +2,30 @@ import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy import asc, desc, select
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
-from app.models import Device, Squad, User, UserStatus
+from app.core.config import get_settings
+from app.db.session import get_db, get_read_db
+from app.models import BulkUserJob, BulkUserOperation, Device, Squad, User, UserStatus
 from app.schemas.devices import DeviceRegisterRequest, DeviceResponse
-from app.schemas.users import UserCreate, UserLimitUpdate, UserListResponse, UserResponse
+from app.schemas.users import (
+    BulkUserJobResponse,
+    BulkUserRequest,
+    UserCreate,
+    UserLimitUpdate,
+    UserListResponse,
+    UserResponse,
+)
 from app.services.audit import write_audit
 from app.services.auth import AuthContext, get_auth_context
+from app.services.bulk_users import run_bulk_job, start_bulk_job
 from app.services.devices import register_device, reset_devices
 from app.services.rbac import require_scopes
 from app.services.webhooks import enqueue_event
 
+settings = get_settings()
 router = APIRouter(prefix="/users", tags=["users"])
 
 
@@ -48,7 +58,7 @@ def list_users(
     sort_by: str = Query(default="created_at"),
     sort_order: str = Query(default="desc", pattern="^(asc|desc)$"),
     status_filter: Optional[str] = Query(default=None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     ctx: AuthContext = Depends(get_auth_context),
 ) -> UserListResponse:
     sortable_columns = {
@@ -76,6 +86,57 @@ def list_users(
     return UserListResponse(items=items, total=total)
 
 
+@router.post(
+    "/bulk",
+    response_model=BulkUserJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_scopes("users.write"))],
+)
+def bulk_users(
+    payload: BulkUserRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    ctx: AuthContext = Depends(get_auth_context),
+) -> BulkUserJob:
+    try:
+        operation = BulkUserOperation(payload.operation)
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_operation") from err
+
+    criteria = payload.filter.model_dump(mode="json", exclude_none=True) if payload.filter else {}
+    if sum((payload.user_ids is not None, bool(criteria), payload.all_users)) != 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="bulk_target_required")
+    if payload.user_ids is not None and len(payload.user_ids) > settings.bulk_user_max_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="too_many_user_ids")
+    if "status" in criteria and criteria["status"] not in {item.value for item in UserStatus}:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_status")
+    selection = {"user_ids": sorted(set(payload.user_ids))} if payload.user_ids is not None else {"filter": criteria}
+
+    params: dict = {}
+    if operation == BulkUserOperation.update_limits:
+        if payload.traffic_limit_bytes is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="traffic_limit_required")
+        params = {"traffic_limit_bytes": payload.traffic_limit_bytes, "max_devices": payload.max_devices}
+    elif operation == BulkUserOperation.assign_squad:
+        if not payload.squad_id or not db.get(Squad, payload.squad_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="squad_not_found")
+        params = {"squad_id": payload.squad_id}
+
+    job = start_bulk_job(db, ctx.principal_id, operation, selection, params, reseller_id=ctx.reseller_id)
+    db.commit()
+    db.refresh(job)
+    background_tasks.add_task(run_bulk_job, job.id)
+    return job
+
+
+@router.get("/bulk/{job_id}", response_model=BulkUserJobResponse, dependencies=[Depends(require_scopes("users.read"))])
+def get_bulk_job(job_id: str, db: Session = Depends(get_db), ctx: AuthContext = Depends(get_auth_context)) -> BulkUserJob:
+    job = db.get(BulkUserJob, job_id)
+    if not job or (ctx.reseller_id and job.reseller_id != ctx.reseller_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="bulk_job_not_found")
+    return job
+
+
 @router.get("/{user_id}", response_model=UserResponse, dependencies=[Depends(require_scopes("users.read"))])
 def get_user(user_id: str, db: Session = Depends(get_db), ctx: AuthContext = Depends(get_auth_context)) -> User:
     user = db.get(User, user_id)
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy import desc, select
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.models import WebhookDelivery, WebhookEndpoint
 from app.schemas.webhooks import WebhookDeliveryResponse, WebhookEndpointCreate, WebhookEndpointResponse
 from app.services.audit import write_audit
@@ -29,7 +29,7 @@ def create_endpoint(
 
 
 @router.get("/endpoints", response_model=list[WebhookEndpointResponse], dependencies=[Depends(require_scopes("api.manage"))])
-def list_endpoints(db: Session = Depends(get_db)) -> list[WebhookEndpoint]:
+def list_endpoints(db: Session = Depends(get_read_db)) -> list[WebhookEndpoint]:
     return db.scalars(select(WebhookEndpoint).order_by(desc(WebhookEndpoint.created_at))).all()
 
 
@@ -39,5 +39,5 @@ def process_deliveries(limit: int = 100, db: Session = Depends(get_db)) -> dict:
 
 
 @router.get("/deliveries", response_model=list[WebhookDeliveryResponse], dependencies=[Depends(require_scopes("api.manage"))])
-def list_deliveries(db: Session = Depends(get_db)) -> list[WebhookDelivery]:
+def list_deliveries(db: Session = Depends(get_read_db)) -> list[WebhookDelivery]:
     return db.scalars(select(WebhookDelivery).order_by(desc(WebhookDelivery.created_at)).limit(500)).all()
@@ -12,6 +12,7 @@ from app.api.v1.endpoints import (
     nodes,
     protocols,
     reseller,
+    rollouts,
     squads,
     subscription,
     users,
@@ -24,6 +25,7 @@ api_router.include_router(auth.router)
 api_router.include_router(users.router)
 api_router.include_router(squads.router)
 api_router.include_router(nodes.admin_router)
+api_router.include_router(rollouts.router)
 api_router.include_router(billing.router)
 api_router.include_router(subscription.router)
 api_router.include_router(infra_billing.router)
@@ -0,0 +1,128 @@
+"""Negotiated response compression.
+
+Picks the best of ``RESPONSE_COMPRESSION_ENCODINGS`` the client accepts
+(``zstd`` and ``br`` only when ``zstandard`` / ``brotli`` are installed) and
+compresses complete text and JSON bodies of at least
+``RESPONSE_COMPRESSION_MIN_BYTES``. Streaming responses pass through as is.
+
+Serialization is not the bottleneck: routes with a return type or response
+model already render to bytes in Pydantic, and the largest ones return
+``ORJSONResponse`` directly (see ``scripts/bench_responses.py``).
+"""
+import gzip
+from typing import Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+settings = get_settings()
+
+GZIP_LEVEL = 4
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+# Multi-MB configs take tens of milliseconds to compress; keep that off the event loop.
+THREADPOOL_MIN_BYTES = 256 * 1024
+
+
+def _compressors() -> dict[str, Callable[[bytes], bytes]]:
+    compressors = {"gzip": lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        compressors["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+    if zstandard is not None:
+        compressors["zstd"] = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+    return compressors
+
+
+COMPRESSORS = _compressors()
+
+
+def negotiate(accept_encoding: str, preferred: list[str]) -> Optional[str]:
+    """The available coding with the highest q-value, ties going to ``preferred`` order."""
+    weights: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip()] = q
+    best, best_q = None, 0.0
+    for coding in preferred:
+        if coding not in COMPRESSORS:
+            continue
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compressible(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type.endswith(("json", "xml", "javascript"))
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None, encodings: Optional[list[str]] = None) -> None:
+        self.app = app
+        self.minimum_size = settings.response_compression_min_bytes if minimum_size is None else minimum_size
+        self.encodings = encodings or settings.response_compression_encoding_list()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            passthrough = True
+            body = message.get("body", b"")
+            if "content-encoding" in headers or not compressible(headers.get("content-type", "")):
+                await send(start)
+                await send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+            compress = COMPRESSORS[coding]
+            body = await run_in_threadpool(compress, body) if len(body) >= THREADPOOL_MIN_BYTES else compress(body)
+            headers["Content-Encoding"] = coding
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
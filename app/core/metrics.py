@@ -0,0 +1,47 @@
+from collections import deque
+from collections.abc import Callable
+from threading import Lock
+
+_gauges: dict[str, Callable[[], float]] = {}
+_summaries: dict[str, "Summary"] = {}
+
+
+class Summary:
+    """Count plus percentiles over the most recent ``window`` observations."""
+
+    def __init__(self, window: int = 1024) -> None:
+        self.count = 0
+        self._recent: deque[float] = deque(maxlen=window)
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self._recent.append(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            ordered = sorted(self._recent)
+        if not ordered:
+            return {"count": self.count, "p50": 0.0, "p99": 0.0, "max": 0.0}
+        return {
+            "count": self.count,
+            "p50": ordered[(len(ordered) - 1) // 2],
+            "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+            "max": ordered[-1],
+        }
+
+
+def register_gauge(name: str, read: Callable[[], float]) -> None:
+    _gauges[name] = read
+
+
+def register_summary(name: str, window: int = 1024) -> Summary:
+    return _summaries.setdefault(name, Summary(window))
+
+
+def snapshot() -> dict:
+    values = {name: read() for name, read in _gauges.items()}
+    for name, summary in _summaries.items():
+        values.update({f"{name}.{key}": value for key, value in summary.snapshot().items()})
+    return dict(sorted(values.items()))
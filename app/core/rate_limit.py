@@ -1,38 +1,92 @@
+import hashlib
+import re
 import time
-from collections import defaultdict, deque
+from collections import OrderedDict
+from threading import Lock
 from typing import Optional
 
 import redis
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from starlette.responses import JSONResponse
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.core.config import get_settings
+from app.core.metrics import register_gauge
 
 settings = get_settings()
 
 
 class InMemoryRateStore:
-    def __init__(self) -> None:
-        self._buckets: dict[str, deque[float]] = defaultdict(deque)
+    """Token buckets kept in an LRU map capped at ``max_keys`` entries.
+
+    Each bucket is a two-slot list ``[tokens, updated_at]``. Buckets idle for
+    longer than a full refill are indistinguishable from fresh ones, so the
+    periodic sweep drops them.
+    """
+
+    def __init__(self, max_keys: int = 100_000, sweep_interval_seconds: float = 60) -> None:
+        self.max_keys = max_keys
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.evicted = 0
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = Lock()
+        self._next_sweep_at = time.monotonic() + sweep_interval_seconds
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
 
     def hit(self, key: str, limit: int, window_seconds: int) -> bool:
-        now = time.time()
-        bucket = self._buckets[key]
-        threshold = now - window_seconds
-        while bucket and bucket[0] < threshold:
-            bucket.popleft()
-        if len(bucket) >= limit:
-            return False
-        bucket.append(now)
-        return True
+        now = time.monotonic()
+        refill_per_second = limit / window_seconds
+        with self._lock:
+            if now >= self._next_sweep_at:
+                self._sweep(now, window_seconds)
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [float(limit), now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(float(limit), bucket[0] + (now - bucket[1]) * refill_per_second)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+    def _sweep(self, now: float, idle_seconds: float) -> None:
+        # The map is ordered by last hit, so idle buckets sit at the front.
+        threshold = now - idle_seconds
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[1] >= threshold:
+                break
+            del self._buckets[key]
+            self.evicted += 1
+        self._next_sweep_at = now + self.sweep_interval_seconds
 
 
 class RateLimiter:
-    def __init__(self, redis_url: str, limit_per_minute: int) -> None:
+    def __init__(
+        self,
+        redis_url: str,
+        limit_per_minute: int,
+        max_keys: int = 100_000,
+        sweep_interval_seconds: float = 60,
+    ) -> None:
         self.limit_per_minute = limit_per_minute
         self.redis_client: Optional[redis.Redis] = None
-        self.memory_store = InMemoryRateStore()
+        self.memory_store = InMemoryRateStore(max_keys=max_keys, sweep_interval_seconds=sweep_interval_seconds)
         try:
             self.redis_client = redis.from_url(redis_url, decode_responses=True)
             self.redis_client.ping()
@@ -49,18 +103,95 @@ class RateLimiter:
         return self.memory_store.hit(key, self.limit_per_minute, 60)
 
 
-rate_limiter = RateLimiter(settings.redis_url, settings.rate_limit_per_minute)
+rate_limiter = RateLimiter(
+    settings.redis_url,
+    settings.rate_limit_per_minute,
+    max_keys=settings.rate_limit_max_keys,
+    sweep_interval_seconds=settings.rate_limit_sweep_seconds,
+)
+register_gauge("rate_limit.live_keys", lambda: len(rate_limiter.memory_store))
+register_gauge("rate_limit.evicted_keys", lambda: rate_limiter.memory_store.evicted)
+
+
+def _iter_route_paths(routes: list, prefix: str = ""):
+    for route in routes:
+        included = getattr(route, "original_router", None)
+        if included is not None:
+            # Newer FastAPI keeps included routers nested instead of flattening them.
+            yield from _iter_route_paths(included.routes, prefix + route.include_context.prefix)
+        elif isinstance(getattr(route, "path", None), str):
+            yield prefix + route.path
+
+
+class RouteTemplateIndex:
+    """Maps raw request paths to the path template of the route serving them.
+
+    Raw paths embed user ids, tokens and node ids; keying on the template keeps
+    limiter cardinality bounded by the number of routes.
+    """
+
+    def __init__(self, routes: list) -> None:
+        self._static: dict[str, str] = {}
+        self._dynamic: list[tuple[re.Pattern, str]] = []
+        for template in _iter_route_paths(routes):
+            path_regex, _, param_convertors = compile_path(template)
+            if param_convertors:
+                self._dynamic.append((path_regex, template))
+            else:
+                self._static.setdefault(template, template)
+
+    def resolve(self, path: str) -> str:
+        template = self._static.get(path)
+        if template is not None:
+            return template
+        for path_regex, template in self._dynamic:
+            if path_regex.match(path):
+                return template
+        return "unmatched"
+
+
+_route_index: Optional[RouteTemplateIndex] = None
+
+
+def route_template(scope: Scope) -> str:
+    global _route_index
+    if _route_index is None:
+        _route_index = RouteTemplateIndex(scope["app"].router.routes)
+    return _route_index.resolve(scope["path"])
+
+
+def _auth_digest(marker: str) -> str:
+    # Stable across workers, unlike hash(), so Redis buckets are shared.
+    return hashlib.blake2b(marker.encode("utf-8"), digest_size=8).hexdigest()
+
+
+EXEMPT_PATHS = frozenset({"/health", "/api/v1/health"})
+
+
+class RateLimitMiddleware:
+    """Raw ASGI rate limiter.
+
+    Unlike ``BaseHTTPMiddleware`` this does not wrap the downstream app in a
+    task and a memory stream, so accepted requests pass straight through and
+    streaming responses are not buffered.
+    """
 
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.url.path in {"/health", "/api/v1/health"}:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
 
-        client_host = request.client.host if request.client else "unknown"
-        auth_marker = request.headers.get("authorization") or request.headers.get("x-api-key") or client_host
-        key = f"{client_host}:{request.url.path}:{hash(auth_marker)}"
+        client = scope.get("client")
+        client_host = client[0] if client else "unknown"
+        headers = Headers(scope=scope)
+        auth_marker = headers.get("authorization") or headers.get("x-api-key") or client_host
+        key = f"{client_host}:{route_template(scope)}:{_auth_digest(auth_marker)}"
         if not rate_limiter.allow(key):
-            return JSONResponse(status_code=429, content={"error": "rate_limit_exceeded"})
+            response = JSONResponse(status_code=429, content={"error": "rate_limit_exceeded"})
+            await response(scope, receive, send)
+            return
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
@@ -1,6 +1,6 @@
+from app.db.migrations import upgrade
 from app.db.session import engine
-from app.models import Base
 
 
 def init_db() -> None:
-    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
@@ -0,0 +1,64 @@
+"""Ordered schema revisions applied on startup and by ``python -m app.db.migrations``.
+
+Each revision module in ``app.db.revisions`` exposes ``revision`` (a sortable
+id), ``upgrade(connection)`` and optionally ``transactional = False`` for DDL
+that cannot run inside a transaction (``CREATE INDEX CONCURRENTLY``).
+Revisions carry their own frozen table definitions and data logic rather
+than importing models or services, so replaying them later builds the same
+schema: a fresh database gets the original schema from the baseline and every
+later revision on top of it. They must also be idempotent, since a database
+created from the current models (as the tests do) replays them all.
+"""
+import importlib
+import pkgutil
+from datetime import datetime, timezone
+from types import ModuleType
+
+from sqlalchemy import Column, DateTime, Engine, MetaData, String, Table, select
+
+from app.db import revisions
+
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("revision", String(64), primary_key=True),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def load_revisions() -> list[ModuleType]:
+    modules = [importlib.import_module(f"{revisions.__name__}.{info.name}") for info in pkgutil.iter_modules(revisions.__path__)]
+    return sorted(modules, key=lambda module: module.revision)
+
+
+def applied_revisions(engine: Engine) -> set[str]:
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        return set(connection.scalars(select(schema_migrations.c.revision)))
+
+
+def upgrade(engine: Engine) -> list[str]:
+    applied = applied_revisions(engine)
+    ran = []
+    for module in load_revisions():
+        if module.revision in applied:
+            continue
+        if getattr(module, "transactional", True):
+            with engine.begin() as connection:
+                module.upgrade(connection)
+        else:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                module.upgrade(connection)
+        with engine.begin() as connection:
+            connection.execute(schema_migrations.insert().values(revision=module.revision, applied_at=datetime.now(timezone.utc)))
+        ran.append(module.revision)
+    return ran
+
+
+if __name__ == "__main__":
+    from app.db.session import engine
+
+    for revision in upgrade(engine):
+        print(f"applied {revision}")
+    print(f"at {max(applied_revisions(engine))}")
@@ -0,0 +1,300 @@
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    Column,
+    Connection,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+)
+
+revision = "0001_baseline"
+
+# The schema as first released, frozen here so later model changes cannot
+# alter what this revision creates; every change since is a later revision.
+metadata = MetaData()
+
+Table(
+    "audit_logs",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("actor", String(128), nullable=False),
+    Column("action", String(128), nullable=False, index=True),
+    Column("entity_type", String(128), nullable=False, index=True),
+    Column("entity_id", String(36), nullable=False, index=True),
+    Column("payload", JSON, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "backup_snapshots",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("storage_type", String(32), nullable=False),
+    Column("file_path", String(1024), nullable=False),
+    Column("status", String(32), nullable=False),
+    Column("size_bytes", BigInteger, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "migration_runs",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("mode", Enum("dry_run", "apply", "verify", name="migrationmode"), nullable=False),
+    Column("status", Enum("started", "finished", "failed", name="migrationstatus"), nullable=False),
+    Column("details", JSON, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("completed_at", DateTime(timezone=True)),
+)
+
+Table(
+    "plans",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("name", String(128), nullable=False, unique=True, index=True),
+    Column("price", Float, nullable=False),
+    Column("currency", String(8), nullable=False),
+    Column("duration_days", Integer, nullable=False),
+    Column("traffic_limit_bytes", BigInteger, nullable=False),
+    Column("max_devices", Integer, nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "protocol_profiles",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("name", String(128), nullable=False, unique=True, index=True),
+    Column("protocol_type", Enum("awg2", "tuic", "vless", "sing_box", name="protocoltype"), nullable=False),
+    Column("schema_json", JSON, nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "resellers",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("name", String(128), nullable=False, unique=True, index=True),
+    Column("description", Text, nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "squads",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("name", String(128), nullable=False, unique=True, index=True),
+    Column("description", Text, nullable=False),
+    Column(
+        "selection_policy", Enum("random", "weighted", "round_robin", "geo", name="squadselectionpolicy"), nullable=False
+    ),
+    Column("fallback_policy", String(128), nullable=False),
+    Column("allowed_protocols", JSON, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "webhook_endpoints",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("name", String(128), nullable=False),
+    Column("target_url", String(1024), nullable=False),
+    Column("secret", String(255), nullable=False),
+    Column("events", JSON, nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "auth_principals",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("username", String(128), nullable=False, unique=True, index=True),
+    Column("password_hash", String(255), nullable=False),
+    Column(
+        "role",
+        Enum("super_admin", "admin", "operator", "billing_manager", "support", "reseller", "user", name="rolename"),
+        nullable=False,
+    ),
+    Column("scopes", JSON, nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("refresh_token_version", Integer, nullable=False),
+    Column("reseller_id", String(36), ForeignKey("resellers.id")),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "servers",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("host", String(255), nullable=False, unique=True, index=True),
+    Column("ip", String(64), nullable=False),
+    Column("provider", String(128), nullable=False),
+    Column("region", String(128), nullable=False),
+    Column("squad_id", String(36), ForeignKey("squads.id"), nullable=False, index=True),
+    Column("status", String(64), nullable=False),
+    Column("last_paid_at", DateTime(timezone=True)),
+    Column("next_due_at", DateTime(timezone=True)),
+    Column("price", Float, nullable=False),
+    Column("currency", String(8), nullable=False),
+    Column("infra_status", String(64), nullable=False),
+    Column("reminder_days_before", Integer, nullable=False),
+)
+
+Table(
+    "users",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("external_identities", JSON, nullable=False),
+    Column("uuid", String(36), nullable=False, unique=True, index=True),
+    Column("vless_id", String(36), nullable=False, unique=True, index=True),
+    Column("short_id", String(64), nullable=False, index=True),
+    Column("status", Enum("active", "blocked", "expired", "deleted", name="userstatus"), nullable=False),
+    Column("traffic_limit_bytes", BigInteger, nullable=False),
+    Column("traffic_used_bytes", BigInteger, nullable=False),
+    Column("expires_at", DateTime(timezone=True)),
+    Column("max_devices", Integer, nullable=False),
+    Column("hwid_policy", String(64), nullable=False),
+    Column("strict_bind", Boolean, nullable=False),
+    Column("device_eviction_policy", Enum("reject", "evict_oldest", name="deviceevictionpolicy"), nullable=False),
+    Column("squad_id", String(36), ForeignKey("squads.id")),
+    Column("reseller_id", String(36), ForeignKey("resellers.id"), index=True),
+    Column("subscription_token", String(128), nullable=False, unique=True, index=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "webhook_deliveries",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("endpoint_id", String(36), ForeignKey("webhook_endpoints.id"), nullable=False, index=True),
+    Column("event", String(128), nullable=False, index=True),
+    Column("payload", JSON, nullable=False),
+    Column("status", Enum("pending", "sent", "failed", name="webhookdeliverystatus"), nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("response_status", Integer),
+    Column("last_error", Text, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("sent_at", DateTime(timezone=True)),
+)
+
+Table(
+    "api_keys",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("name", String(128), nullable=False),
+    Column("key_prefix", String(16), nullable=False, index=True),
+    Column("key_hash", String(255), nullable=False, unique=True, index=True),
+    Column("scopes", JSON, nullable=False),
+    Column("status", Enum("active", "revoked", name="apikeystatus"), nullable=False),
+    Column("owner_principal_id", String(36), ForeignKey("auth_principals.id"), nullable=False, index=True),
+    Column("reseller_id", String(36), ForeignKey("resellers.id")),
+    Column("last_used_at", DateTime(timezone=True)),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "devices",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", String(36), ForeignKey("users.id"), nullable=False, index=True),
+    Column("device_hash", String(128), nullable=False, index=True),
+    Column("is_active", Boolean, nullable=False),
+    Column("first_seen_at", DateTime(timezone=True), nullable=False),
+    Column("last_seen_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "nodes",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("server_id", String(36), ForeignKey("servers.id"), nullable=False, unique=True, index=True),
+    Column("node_token", String(128), nullable=False, unique=True, index=True),
+    Column("engine_awg2_enabled", Boolean, nullable=False),
+    Column("engine_singbox_enabled", Boolean, nullable=False),
+    Column("engine_awg2_version", String(64), nullable=False),
+    Column("engine_singbox_version", String(64), nullable=False),
+    Column("desired_config_revision", Integer, nullable=False),
+    Column("applied_config_revision", Integer, nullable=False),
+    Column("last_apply_status", String(64), nullable=False),
+    Column("last_seen_at", DateTime(timezone=True)),
+    Column("status", Enum("online", "offline", "error", "provisioning", name="nodestatus"), nullable=False),
+    Column("desired_config", JSON, nullable=False),
+)
+
+Table(
+    "orders",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", String(36), ForeignKey("users.id"), nullable=False, index=True),
+    Column("plan_id", String(36), ForeignKey("plans.id"), nullable=False, index=True),
+    Column("status", Enum("pending", "paid", "cancelled", name="orderstatus"), nullable=False),
+    Column("total_amount", Float, nullable=False),
+    Column("currency", String(8), nullable=False),
+    Column("idempotency_key", String(128), unique=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("paid_at", DateTime(timezone=True)),
+    # constraint UniqueConstraint(Column("idempotency_key", String(length=128), table=<orders>))
+)
+
+Table(
+    "subscription_aliases",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", String(36), ForeignKey("users.id"), nullable=False, index=True),
+    Column("legacy_token", String(128), nullable=False, unique=True, index=True),
+    Column("subscription_token", String(128), nullable=False, index=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "config_revisions",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("node_id", String(36), ForeignKey("nodes.id"), nullable=False, index=True),
+    Column("revision", Integer, nullable=False),
+    Column("config", JSON, nullable=False),
+    Column("status", Enum("desired", "applied", "failed", "rolled_back", name="configrevisionstatus"), nullable=False),
+    Column("rolled_back_from", Integer),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("applied_at", DateTime(timezone=True)),
+)
+
+Table(
+    "node_usage",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("node_id", String(36), ForeignKey("nodes.id"), nullable=False, index=True),
+    Column("user_id", String(36), ForeignKey("users.id"), nullable=False, index=True),
+    Column("bytes_used", BigInteger, nullable=False),
+    Column("reported_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "payments",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("order_id", String(36), ForeignKey("orders.id"), nullable=False, index=True),
+    Column("provider", String(64), nullable=False),
+    Column("external_payment_id", String(128), nullable=False, unique=True, index=True),
+    Column("status", Enum("pending", "succeeded", "failed", name="paymentstatus"), nullable=False),
+    Column("amount", Float, nullable=False),
+    Column("currency", String(8), nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    metadata.create_all(bind=connection)
@@ -0,0 +1,32 @@
+from sqlalchemy import Connection, Index, MetaData, Table
+
+revision = "0002_hot_path_indexes"
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+transactional = False
+
+# name -> (table, columns), matching the filters and sort keys of the queries they serve.
+HOT_PATH_INDEXES = {
+    # deliver_pending: status = 'pending' ORDER BY created_at
+    "ix_webhook_deliveries_status_created_at": ("webhook_deliveries", ("status", "created_at")),
+    # build_subscription_payload: squad_id = ? AND status = 'active'
+    "ix_servers_squad_id_status": ("servers", ("squad_id", "status")),
+    # analytics: reported_at range for per-day traffic; per-user usage history
+    "ix_node_usage_reported_at": ("node_usage", ("reported_at",)),
+    "ix_node_usage_user_id_reported_at": ("node_usage", ("user_id", "reported_at")),
+    # register_device: user_id = ? AND is_active AND device_hash = ?
+    "ix_devices_user_id_is_active_device_hash": ("devices", ("user_id", "is_active", "device_hash")),
+    # audit log browsing: ORDER BY created_at DESC
+    "ix_audit_logs_created_at": ("audit_logs", ("created_at",)),
+    # list_users: ORDER BY created_at, optionally filtered by status or reseller
+    "ix_users_created_at": ("users", ("created_at",)),
+    "ix_users_status_created_at": ("users", ("status", "created_at")),
+    "ix_users_reseller_id_created_at": ("users", ("reseller_id", "created_at")),
+}
+
+
+def upgrade(connection: Connection) -> None:
+    metadata = MetaData()
+    for name, (table_name, columns) in HOT_PATH_INDEXES.items():
+        table = Table(table_name, metadata, autoload_with=connection)
+        index = Index(name, *(table.c[column] for column in columns), postgresql_concurrently=True)
+        index.create(bind=connection, checkfirst=True)
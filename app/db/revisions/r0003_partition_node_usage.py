@@ -0,0 +1,97 @@
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Connection,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    inspect,
+    text,
+)
+
+revision = "0003_partition_node_usage"
+
+COLUMNS = "id, node_id, user_id, bytes_used, reported_at"
+# Daily partitions created with the table, from yesterday on; usage maintenance
+# keeps extending them from there.
+DAYS_AHEAD = 7
+
+
+def _tables(connection: Connection) -> tuple[Table, Table]:
+    metadata = MetaData()
+    for name in ("nodes", "users"):
+        Table(name, metadata, autoload_with=connection)
+    node_usage = Table(
+        "node_usage",
+        metadata,
+        Column("id", String(36), primary_key=True),
+        Column("node_id", String(36), ForeignKey("nodes.id"), nullable=False, index=True),
+        Column("user_id", String(36), ForeignKey("users.id"), nullable=False, index=True),
+        Column("bytes_used", BigInteger, nullable=False),
+        # PostgreSQL requires the partition key in the primary key.
+        Column("reported_at", DateTime(timezone=True), primary_key=True, index=True),
+        Index("ix_node_usage_user_id_reported_at", "user_id", "reported_at"),
+        postgresql_partition_by="RANGE (reported_at)",
+    )
+    node_usage_hourly = Table(
+        "node_usage_hourly",
+        metadata,
+        Column("hour", DateTime(timezone=True), primary_key=True),
+        Column("node_id", String(36), ForeignKey("nodes.id"), primary_key=True),
+        Column("user_id", String(36), ForeignKey("users.id"), primary_key=True),
+        Column("bytes_used", BigInteger, nullable=False),
+        Column("reports", Integer, nullable=False),
+        Index("ix_node_usage_hourly_user_id_hour", "user_id", "hour"),
+    )
+    return node_usage, node_usage_hourly
+
+
+def _is_partitioned(connection: Connection) -> bool:
+    return bool(
+        connection.scalar(text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'node_usage'::regclass"))
+    )
+
+
+def _create_partitions(connection: Connection) -> None:
+    connection.execute(text("CREATE TABLE IF NOT EXISTS node_usage_default PARTITION OF node_usage DEFAULT"))
+    today = datetime.now(timezone.utc).date()
+    for offset in range(-1, DAYS_AHEAD + 1):
+        day = today + timedelta(days=offset)
+        lower = datetime.combine(day, time.min, tzinfo=timezone.utc)
+        upper = lower + timedelta(days=1)
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS node_usage_p{day:%Y%m%d} PARTITION OF node_usage "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+
+
+def upgrade(connection: Connection) -> None:
+    node_usage, node_usage_hourly = _tables(connection)
+    node_usage_hourly.create(bind=connection, checkfirst=True)
+    if connection.dialect.name != "postgresql":
+        # SQLite keeps a single table; the reported_at index serves range pruning.
+        return
+
+    if not _is_partitioned(connection):
+        # Rebuild as a partitioned table. Index and constraint names are
+        # schema-wide, so clear them off the old table before recreating.
+        connection.execute(text("ALTER TABLE node_usage RENAME TO node_usage_legacy"))
+        for index in inspect(connection).get_indexes("node_usage_legacy"):
+            connection.execute(text(f'DROP INDEX "{index["name"]}"'))
+        connection.execute(text("ALTER TABLE node_usage_legacy RENAME CONSTRAINT node_usage_pkey TO node_usage_legacy_pkey"))
+        node_usage.create(bind=connection)
+        # Create recent days' partitions first so their rows land in them, not in DEFAULT.
+        _create_partitions(connection)
+        connection.execute(text(f"INSERT INTO node_usage ({COLUMNS}) SELECT {COLUMNS} FROM node_usage_legacy"))
+        connection.execute(text("DROP TABLE node_usage_legacy"))
+    else:
+        # Later days may already hold rows in DEFAULT; usage maintenance splits those out.
+        connection.execute(text("CREATE TABLE IF NOT EXISTS node_usage_default PARTITION OF node_usage DEFAULT"))
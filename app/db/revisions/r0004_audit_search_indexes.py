@@ -0,0 +1,43 @@
+from sqlalchemy import Connection, Index, MetaData, Table, text
+
+revision = "0004_audit_search_indexes"
+# CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+transactional = False
+
+KEYSET_INDEXES = {
+    "ix_audit_logs_created_at_id": ("created_at", "id"),
+    "ix_audit_logs_action_created_at_id": ("action", "created_at", "id"),
+    "ix_audit_logs_entity_type_created_at_id": ("entity_type", "created_at", "id"),
+    "ix_audit_logs_entity_id_created_at_id": ("entity_id", "created_at", "id"),
+    "ix_audit_logs_actor_created_at_id": ("actor", "created_at", "id"),
+}
+# Leading columns of the composites above; keeping them only costs writes.
+REDUNDANT_INDEXES = (
+    "ix_audit_logs_created_at",
+    "ix_audit_logs_action",
+    "ix_audit_logs_entity_type",
+    "ix_audit_logs_entity_id",
+)
+POSTGRES_PAYLOAD_INDEXES = (
+    # payload @> '{"user_id": ...}' containment filters
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_audit_logs_payload_jsonb "
+    "ON audit_logs USING gin ((payload::jsonb) jsonb_path_ops)",
+    # free-text search over payload values
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_audit_logs_payload_fts "
+    "ON audit_logs USING gin (to_tsvector('simple'::regconfig, payload::text))",
+)
+
+
+def upgrade(connection: Connection) -> None:
+    table = Table("audit_logs", MetaData(), autoload_with=connection)
+    for name, columns in KEYSET_INDEXES.items():
+        Index(name, *(table.c[column] for column in columns), postgresql_concurrently=True).create(
+            bind=connection, checkfirst=True
+        )
+
+    postgres = connection.dialect.name == "postgresql"
+    for name in REDUNDANT_INDEXES:
+        connection.execute(text(f"DROP INDEX {'CONCURRENTLY ' if postgres else ''}IF EXISTS {name}"))
+    if postgres:
+        for statement in POSTGRES_PAYLOAD_INDEXES:
+            connection.execute(text(statement))
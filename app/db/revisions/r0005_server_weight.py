@@ -0,0 +1,8 @@
+from sqlalchemy import Connection, inspect, text
+
+revision = "0005_server_weight"
+
+
+def upgrade(connection: Connection) -> None:
+    if "weight" not in {column["name"] for column in inspect(connection).get_columns("servers")}:
+        connection.execute(text("ALTER TABLE servers ADD COLUMN weight INTEGER NOT NULL DEFAULT 100"))
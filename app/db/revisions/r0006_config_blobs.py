@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    JSON,
+    Column,
+    Connection,
+    DateTime,
+    Integer,
+    LargeBinary,
+    MetaData,
+    String,
+    Table,
+    column,
+    inspect,
+    select,
+    table,
+    text,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+
+revision = "0006_config_blobs"
+
+BATCH = 1000
+# Documents at least this long are stored gzip-compressed.
+COMPRESS_MIN_BYTES = 1024
+# table -> (inline JSON column being replaced, hash column replacing it)
+MOVES = {
+    "nodes": ("desired_config", "desired_config_hash"),
+    "config_revisions": ("config", "config_hash"),
+}
+
+
+config_blobs = Table(
+    "config_blobs",
+    MetaData(),
+    Column("hash", String(64), primary_key=True),
+    Column("encoding", String(16), nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("data", LargeBinary, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def _store(connection: Connection, config: dict) -> str:
+    """Store ``config`` as a blob keyed by the sha256 of its canonical JSON; return the hash."""
+    raw = json.dumps(config, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    if len(raw) < COMPRESS_MIN_BYTES:
+        encoding, data = "identity", raw
+    else:
+        encoding, data = "gzip", gzip.compress(raw, compresslevel=6, mtime=0)
+    dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+    connection.execute(
+        dialect.insert(config_blobs)
+        .values(hash=digest, encoding=encoding, size=len(raw), data=data, created_at=datetime.now(timezone.utc))
+        .on_conflict_do_nothing(index_elements=["hash"])
+    )
+    return digest
+
+
+def _move(connection: Connection, table_name: str, json_column: str, hash_column: str) -> None:
+    columns = {item["name"] for item in inspect(connection).get_columns(table_name)}
+    if json_column not in columns:
+        return
+    if hash_column not in columns:
+        connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {hash_column} VARCHAR(64)"))
+
+    rows = table(table_name, column("id", String), column(json_column, JSON), column(hash_column, String))
+    last_id = ""
+    while True:
+        batch = connection.execute(
+            select(rows.c.id, rows.c[json_column]).where(rows.c.id > last_id).order_by(rows.c.id).limit(BATCH)
+        ).all()
+        if not batch:
+            break
+        for row_id, config in batch:
+            connection.execute(
+                update(rows).where(rows.c.id == row_id).values({hash_column: _store(connection, config or {})})
+            )
+        last_id = batch[-1][0]
+
+    connection.execute(text(f"ALTER TABLE {table_name} DROP COLUMN {json_column}"))
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table_name}_{hash_column} ON {table_name} ({hash_column})"))
+    if connection.dialect.name == "postgresql":
+        connection.execute(
+            text(
+                f"ALTER TABLE {table_name} ADD CONSTRAINT {table_name}_{hash_column}_fkey "
+                f"FOREIGN KEY ({hash_column}) REFERENCES config_blobs (hash)"
+            )
+        )
+
+
+def upgrade(connection: Connection) -> None:
+    config_blobs.create(bind=connection, checkfirst=True)
+    for table_name, (json_column, hash_column) in MOVES.items():
+        _move(connection, table_name, json_column, hash_column)
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("ALTER TABLE config_revisions ALTER COLUMN config_hash SET NOT NULL"))
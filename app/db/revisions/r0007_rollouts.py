@@ -0,0 +1,57 @@
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    Connection,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+)
+
+revision = "0007_rollouts"
+
+
+def upgrade(connection: Connection) -> None:
+    metadata = MetaData()
+    for name in ("nodes", "config_blobs"):
+        Table(name, metadata, autoload_with=connection)
+    rollouts = Table(
+        "rollouts",
+        metadata,
+        Column("id", String(36), primary_key=True),
+        Column("status", Enum("in_progress", "completed", "halted", name="rolloutstatus"), nullable=False, index=True),
+        Column("target", JSON, nullable=False),
+        Column("canary_percent", Integer, nullable=False),
+        Column("failure_threshold", Float, nullable=False),
+        Column("auto_advance", Boolean, nullable=False),
+        Column("waves", Integer, nullable=False),
+        Column("current_wave", Integer, nullable=False),
+        Column("total_nodes", Integer, nullable=False),
+        Column("halt_reason", String(255), nullable=False),
+        Column("created_by", String(128), nullable=False),
+        Column("created_at", DateTime(timezone=True), nullable=False),
+        Column("finished_at", DateTime(timezone=True)),
+    )
+    rollout_nodes = Table(
+        "rollout_nodes",
+        metadata,
+        Column("rollout_id", String(36), ForeignKey("rollouts.id"), primary_key=True),
+        Column("node_id", String(36), ForeignKey("nodes.id"), primary_key=True),
+        Column("wave", Integer, nullable=False),
+        Column("config_hash", String(64), ForeignKey("config_blobs.hash"), nullable=False),
+        Column("revision", Integer, nullable=False),
+        Column(
+            "status",
+            Enum("pending", "desired", "applied", "failed", "superseded", name="rolloutnodestatus"),
+            nullable=False,
+        ),
+        Index("ix_rollout_nodes_node_id_revision", "node_id", "revision"),
+    )
+    rollouts.create(bind=connection, checkfirst=True)
+    rollout_nodes.create(bind=connection, checkfirst=True)
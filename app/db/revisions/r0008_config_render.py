@@ -0,0 +1,14 @@
+from sqlalchemy import Connection, Index, MetaData, Table, inspect, text
+
+revision = "0008_config_render"
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+transactional = False
+
+
+def upgrade(connection: Connection) -> None:
+    if "config_render_digest" not in {column["name"] for column in inspect(connection).get_columns("nodes")}:
+        connection.execute(text("ALTER TABLE nodes ADD COLUMN config_render_digest VARCHAR(64)"))
+    # render_nodes: squad_id = ? AND status = 'active'
+    users = Table("users", MetaData(), autoload_with=connection)
+    index = Index("ix_users_squad_id_status", users.c.squad_id, users.c.status, postgresql_concurrently=True)
+    index.create(bind=connection, checkfirst=True)
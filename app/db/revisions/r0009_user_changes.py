@@ -0,0 +1,22 @@
+from sqlalchemy import JSON, BigInteger, Column, Connection, DateTime, Enum, Index, Integer, MetaData, String, Table
+
+revision = "0009_user_changes"
+
+user_changes = Table(
+    "user_changes",
+    MetaData(),
+    # Insert order; feed positions go in ``seq``, assigned after commit.
+    Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True),
+    Column("seq", BigInteger),
+    Column("squad_id", String(36), nullable=False),
+    Column("user_id", String(36), nullable=False),
+    Column("op", Enum("add", "remove", "update", name="userchangeop"), nullable=False),
+    Column("credentials", JSON, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False, index=True),
+    Index("ix_user_changes_squad_id_seq", "squad_id", "seq"),
+    Index("ix_user_changes_seq", "seq", unique=True),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    user_changes.create(bind=connection, checkfirst=True)
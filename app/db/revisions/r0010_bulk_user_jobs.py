@@ -0,0 +1,28 @@
+from sqlalchemy import JSON, Column, Connection, DateTime, Enum, ForeignKey, Integer, MetaData, String, Table, Text
+
+revision = "0010_bulk_user_jobs"
+
+
+def upgrade(connection: Connection) -> None:
+    metadata = MetaData()
+    Table("resellers", metadata, autoload_with=connection)
+    operations = ("block", "update_limits", "assign_squad", "rotate_keys", "reset_subscription", "delete")
+    bulk_user_jobs = Table(
+        "bulk_user_jobs",
+        metadata,
+        Column("id", String(36), primary_key=True),
+        Column("operation", Enum(*operations, name="bulkuseroperation"), nullable=False),
+        Column("params", JSON, nullable=False),
+        Column("selection", JSON, nullable=False),
+        Column("status", Enum("running", "completed", "failed", name="bulkjobstatus"), nullable=False, index=True),
+        Column("total", Integer, nullable=False),
+        Column("processed", Integer, nullable=False),
+        Column("cursor", String(36), nullable=False),
+        Column("error", Text, nullable=False),
+        Column("reseller_id", String(36), ForeignKey("resellers.id")),
+        Column("created_by", String(128), nullable=False),
+        Column("created_at", DateTime(timezone=True), nullable=False),
+        Column("updated_at", DateTime(timezone=True), nullable=False),
+        Column("finished_at", DateTime(timezone=True)),
+    )
+    bulk_user_jobs.create(bind=connection, checkfirst=True)
@@ -1,22 +1,77 @@
-from collections.abc import Generator
+import importlib.util
+from collections.abc import AsyncGenerator, Generator
+from typing import Optional
 
 from sqlalchemy import create_engine
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.core.config import get_settings
 
 settings = get_settings()
 
-engine_kwargs = {"pool_pre_ping": True}
-if settings.database_url.startswith("sqlite"):
-    engine_kwargs["connect_args"] = {"check_same_thread": False}
-    if ":memory:" in settings.database_url:
-        engine_kwargs["poolclass"] = StaticPool
 
-engine = create_engine(settings.database_url, **engine_kwargs)
+def engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": settings.database_pool_pre_ping}
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+        if "mode=memory" in url:
+            # The database lives only as long as a connection to it stays open.
+            options["poolclass"] = StaticPool
+        return options
+
+    options.update(
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow,
+        pool_recycle=settings.database_pool_recycle_seconds,
+        pool_timeout=settings.database_pool_timeout_seconds,
+    )
+    return options
+
+
+def shared_memory_url(url: str) -> str:
+    """Turn an in-memory SQLite URL into one named, shared-cache database.
+
+    The sync and async engines each open their own connection, and every plain
+    ``:memory:`` connection gets a separate, empty database. A shared-cache URI
+    gives both engines the same one for the life of the process.
+    """
+    if not url.startswith("sqlite") or "mode=memory" in url:
+        return url
+    path = url.partition("://")[2]
+    if path not in ("", "/") and path != "/:memory:":
+        return url
+    return f"{url.partition('://')[0]}:///file:pepoapple?mode=memory&cache=shared&uri=true"
+
+
+def async_database_url(url: str) -> str:
+    # psycopg 3 serves both engines from one URL; SQLite needs the aiosqlite driver.
+    if not url.startswith("sqlite"):
+        return url
+    if importlib.util.find_spec("aiosqlite") is None:
+        raise RuntimeError("DATABASE_URL: SQLite needs the aiosqlite driver, install pepoapple-core[sqlite]")
+    return "sqlite+aiosqlite" + url[url.index(":"):]
+
+
+database_url = shared_memory_url(settings.database_url)
+replica_url: Optional[str] = shared_memory_url(settings.database_replica_url) if settings.database_replica_url else None
+
+engine = create_engine(database_url, **engine_options(database_url))
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# Dashboards, list endpoints and GraphQL queries read from the replica when one
+# is configured, so they do not compete with agent writes for primary connections.
+read_engine = create_engine(replica_url, **engine_options(replica_url)) if replica_url else engine
+ReadSessionLocal = sessionmaker(bind=read_engine, autocommit=False, autoflush=False)
+
+async_engine = create_async_engine(async_database_url(database_url), **engine_options(database_url))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+async_read_engine = (
+    create_async_engine(async_database_url(replica_url), **engine_options(replica_url)) if replica_url else async_engine
+)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
@@ -24,3 +79,21 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncReadSessionLocal() as db:
+        yield db
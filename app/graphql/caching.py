@@ -0,0 +1,135 @@
+import hashlib
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterator
+from threading import Lock
+from typing import Any, Optional
+
+from graphql import GraphQLError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from strawberry.extensions import SchemaExtension
+
+from app.core.config import get_settings
+from app.models import Plan, Squad
+from app.services.auth_cache import TTLCache
+
+settings = get_settings()
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class PersistedQueryRegistry:
+    """sha256 -> document map for automatic persisted queries, capped LRU."""
+
+    def __init__(self, max_entries: int = 1000) -> None:
+        self.max_entries = max_entries
+        self._documents: OrderedDict[str, str] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def register(self, query: str) -> str:
+        digest = query_hash(query)
+        with self._lock:
+            self._documents[digest] = query
+            self._documents.move_to_end(digest)
+            if len(self._documents) > self.max_entries:
+                self._documents.popitem(last=False)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            query = self._documents.get(digest)
+            if query is not None:
+                self._documents.move_to_end(digest)
+            return query
+
+
+persisted_queries = PersistedQueryRegistry(settings.graphql_persisted_queries_max)
+
+
+class PersistedQueries(SchemaExtension):
+    """Apollo-style APQ.
+
+    A request carrying ``extensions.persistedQuery.sha256Hash`` and no query is
+    served from the registry, or answered with ``PersistedQueryNotFound`` so the
+    client resends the full document once, which is then registered.
+    """
+
+    def on_operation(self) -> Iterator[None]:
+        context = self.execution_context
+        persisted = (context.operation_extensions or {}).get("persistedQuery")
+        if isinstance(persisted, dict):
+            digest = str(persisted.get("sha256Hash", ""))
+            if context.query:
+                if query_hash(context.query) != digest:
+                    raise GraphQLError(
+                        "provided sha does not match query", extensions={"code": "PERSISTED_QUERY_HASH_MISMATCH"}
+                    )
+                persisted_queries.register(context.query)
+            else:
+                query = persisted_queries.get(digest)
+                if query is None:
+                    raise GraphQLError("PersistedQueryNotFound", extensions={"code": "PERSISTED_QUERY_NOT_FOUND"})
+                context.query = query
+        yield
+
+
+class ResponseCache:
+    """Caches resolved values of read-only root fields, keyed by field name and arguments.
+
+    Loaders must read from the primary: the cache is cleared when a change
+    commits there, and a lagging replica would refill it with the old rows.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._entries = TTLCache(ttl_seconds)
+        self._generation = 0
+
+    async def get_or_load(self, field: str, arguments: tuple, load: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl_seconds <= 0:
+            return await load()
+        key = f"{field}:{arguments!r}"
+        value = self._entries.get(key)
+        if value is None:
+            generation = self._generation
+            value = await load()
+            # A clear() while loading means the rows may predate the change; serve but do not keep them.
+            if generation == self._generation:
+                self._entries.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+
+response_cache = ResponseCache(settings.graphql_response_cache_ttl_seconds)
+
+INVALIDATE_KEY = "graphql_response_cache_dirty"
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_cached_entities(session: Session, _flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Plan, Squad)):
+            session.info[INVALIDATE_KEY] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_response_cache(session: Session) -> None:
+    # Clearing after commit, not at flush, so a concurrent reader cannot
+    # refill the cache with rows from before the change.
+    if session.info.pop(INVALIDATE_KEY, False):
+        response_cache.clear()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_cached_entity_changes(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(INVALIDATE_KEY, None)
@@ -0,0 +1,56 @@
+import asyncio
+from collections import defaultdict
+from collections.abc import Sequence
+from typing import Any, Optional
+
+from fastapi import Depends
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from strawberry.dataloader import DataLoader
+from strawberry.fastapi import BaseContext
+
+from app.db.session import get_async_db, get_async_read_db
+from app.models import Server, Squad
+
+
+class GraphQLContext(BaseContext):
+    """Per-request sessions and DataLoaders.
+
+    graphql-core resolves sibling fields concurrently and an ``AsyncSession``
+    must not be used concurrently, so every statement goes through ``_lock``.
+    Reads go to the replica unless ``primary`` is set.
+    """
+
+    def __init__(self, read_db: AsyncSession, db: AsyncSession) -> None:
+        super().__init__()
+        self.read_db = read_db
+        self.db = db
+        self._lock = asyncio.Lock()
+        self.squad_by_id = DataLoader(load_fn=self._load_squads)
+        self.server_by_id = DataLoader(load_fn=self._load_servers)
+        self.servers_by_squad_id = DataLoader(load_fn=self._load_squad_servers)
+
+    async def all(self, statement: Select, primary: bool = False) -> Sequence[Any]:
+        async with self._lock:
+            return (await (self.db if primary else self.read_db).scalars(statement)).all()
+
+    async def _load_squads(self, keys: list[str]) -> list[Optional[Squad]]:
+        found = {squad.id: squad for squad in await self.all(select(Squad).where(Squad.id.in_(keys)))}
+        return [found.get(key) for key in keys]
+
+    async def _load_servers(self, keys: list[str]) -> list[Optional[Server]]:
+        found = {server.id: server for server in await self.all(select(Server).where(Server.id.in_(keys)))}
+        return [found.get(key) for key in keys]
+
+    async def _load_squad_servers(self, keys: list[str]) -> list[list[Server]]:
+        grouped: dict[str, list[Server]] = defaultdict(list)
+        for server in await self.all(select(Server).where(Server.squad_id.in_(keys)).order_by(Server.host)):
+            grouped[server.squad_id].append(server)
+        return [grouped[key] for key in keys]
+
+
+async def get_graphql_context(
+    read_db: AsyncSession = Depends(get_async_read_db),
+    db: AsyncSession = Depends(get_async_db),
+) -> GraphQLContext:
+    return GraphQLContext(read_db=read_db, db=db)
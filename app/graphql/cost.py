@@ -0,0 +1,73 @@
+from typing import Optional
+
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLObjectType,
+    InlineFragmentNode,
+    IntValueNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    ValidationRule,
+    get_named_type,
+)
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def field_multiplier(node: FieldNode, field_def) -> int:
+    """How many times a list field's children are resolved: its ``limit``, else the schema default."""
+    limit_arg = field_def.args.get("limit")
+    if limit_arg is None:
+        return 1
+    for argument in node.arguments or ():
+        if argument.name.value == "limit":
+            if isinstance(argument.value, IntValueNode):
+                return max(int(argument.value.value), 1)
+            # A variable is unknown at validation time; assume the largest page.
+            return settings.graphql_max_page_size
+    return limit_arg.default_value if isinstance(limit_arg.default_value, int) else settings.graphql_max_page_size
+
+
+class QueryCostRule(ValidationRule):
+    """Rejects operations whose estimated field resolutions exceed ``graphql_max_cost``.
+
+    Every field costs 1; a paginated field multiplies the cost of its
+    selection by the page size it asks for.
+    """
+
+    max_cost = settings.graphql_max_cost
+
+    def enter_operation_definition(self, node: OperationDefinitionNode, *_args) -> None:
+        root = self.context.schema.get_root_type(node.operation)
+        if root is None:
+            return
+        cost = self._selection_cost(node.selection_set, root, set())
+        if cost > self.max_cost:
+            self.report_error(GraphQLError(f"query cost {cost} exceeds the limit of {self.max_cost}", node))
+
+    def _selection_cost(self, selection_set: Optional[SelectionSetNode], parent, visited: set[str]) -> int:
+        if selection_set is None or not isinstance(parent, GraphQLObjectType):
+            return 0
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field_def = parent.fields.get(selection.name.value)
+                if field_def is None:
+                    continue
+                child = get_named_type(field_def.type)
+                cost += 1 + field_multiplier(selection, field_def) * self._selection_cost(selection.selection_set, child, visited)
+            elif isinstance(selection, InlineFragmentNode):
+                target = self.context.schema.get_type(selection.type_condition.name.value) if selection.type_condition else parent
+                cost += self._selection_cost(selection.selection_set, target, visited)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.context.get_fragment(name)
+                if fragment is None or name in visited:
+                    continue
+                target = self.context.schema.get_type(fragment.type_condition.name.value)
+                cost += self._selection_cost(fragment.selection_set, target, visited | {name})
+        return cost
@@ -1,13 +1,55 @@
-import asyncio
-from dataclasses import dataclass
 from datetime import datetime
-from typing import AsyncGenerator, Optional
+from typing import Annotated, AsyncGenerator, Optional
 
 import strawberry
+from graphql import GraphQLError
 from sqlalchemy import desc, select
+from strawberry.extensions import AddValidationRules, ParserCache, QueryDepthLimiter, ValidationCache
+from strawberry.types import Info
 
-from app.db.session import SessionLocal
-from app.models import AuditLog, Node, Plan, Squad, User
+from app.core.config import get_settings
+from app.graphql.caching import PersistedQueries, response_cache
+from app.graphql.context import GraphQLContext
+from app.graphql.cost import QueryCostRule
+from app.models import Node, Plan, Server, Squad, User
+from app.services.audit import audit_events
+
+settings = get_settings()
+
+
+def page(limit: int, offset: int) -> tuple[int, int]:
+    if not 1 <= limit <= settings.graphql_max_page_size or offset < 0:
+        raise GraphQLError(f"limit must be between 1 and {settings.graphql_max_page_size}, offset must be >= 0")
+    return limit, offset
+
+
+@strawberry.type
+class ServerType:
+    id: str
+    host: str
+    region: str
+    status: str
+
+    @classmethod
+    def from_model(cls, server: Server) -> "ServerType":
+        return cls(id=server.id, host=server.host, region=server.region, status=server.status)
+
+
+@strawberry.type
+class SquadType:
+    id: str
+    name: str
+    selection_policy: str
+
+    @classmethod
+    def from_model(cls, squad: Squad) -> "SquadType":
+        return cls(id=squad.id, name=squad.name, selection_policy=squad.selection_policy.value)
+
+    @strawberry.field
+    async def servers(self, info: Info[GraphQLContext, None], limit: int = 50, offset: int = 0) -> list[ServerType]:
+        limit, offset = page(limit, offset)
+        servers = await info.context.servers_by_squad_id.load(self.id)
+        return [ServerType.from_model(server) for server in servers[offset : offset + limit]]
 
 
 @strawberry.type
@@ -17,6 +59,25 @@ class UserType:
     short_id: str
     status: str
     subscription_token: str
+    squad_id: strawberry.Private[Optional[str]]
+
+    @classmethod
+    def from_model(cls, user: User) -> "UserType":
+        return cls(
+            id=user.id,
+            uuid=user.uuid,
+            short_id=user.short_id,
+            status=user.status.value,
+            subscription_token=user.subscription_token,
+            squad_id=user.squad_id,
+        )
+
+    @strawberry.field
+    async def squad(self, info: Info[GraphQLContext, None]) -> Optional[SquadType]:
+        if self.squad_id is None:
+            return None
+        squad = await info.context.squad_by_id.load(self.squad_id)
+        return SquadType.from_model(squad) if squad else None
 
 
 @strawberry.type
@@ -26,6 +87,10 @@ class PlanType:
     price: float
     currency: str
 
+    @classmethod
+    def from_model(cls, plan: Plan) -> "PlanType":
+        return cls(id=plan.id, name=plan.name, price=plan.price, currency=plan.currency)
+
 
 @strawberry.type
 class NodeType:
@@ -33,13 +98,22 @@ class NodeType:
     status: str
     desired_config_revision: int
     applied_config_revision: int
+    server_id: strawberry.Private[str]
+
+    @classmethod
+    def from_model(cls, node: Node) -> "NodeType":
+        return cls(
+            id=node.id,
+            status=node.status.value,
+            desired_config_revision=node.desired_config_revision,
+            applied_config_revision=node.applied_config_revision,
+            server_id=node.server_id,
+        )
 
-
-@strawberry.type
-class SquadType:
-    id: str
-    name: str
-    selection_policy: str
+    @strawberry.field
+    async def server(self, info: Info[GraphQLContext, None]) -> Optional[ServerType]:
+        server = await info.context.server_by_id.load(self.server_id)
+        return ServerType.from_model(server) if server else None
 
 
 @strawberry.type
@@ -64,85 +138,97 @@ class CreatePlanInput:
 @strawberry.type
 class Query:
     @strawberry.field
-    def users(self, limit: int = 50, offset: int = 0) -> list[UserType]:
-        with SessionLocal() as db:
-            users = db.scalars(select(User).order_by(desc(User.created_at)).offset(offset).limit(limit)).all()
-            return [
-                UserType(
-                    id=user.id,
-                    uuid=user.uuid,
-                    short_id=user.short_id,
-                    status=user.status.value,
-                    subscription_token=user.subscription_token,
-                )
-                for user in users
-            ]
+    async def users(self, info: Info[GraphQLContext, None], limit: int = 50, offset: int = 0) -> list[UserType]:
+        limit, offset = page(limit, offset)
+        users = await info.context.all(select(User).order_by(desc(User.created_at)).offset(offset).limit(limit))
+        return [UserType.from_model(user) for user in users]
 
     @strawberry.field
-    def plans(self) -> list[PlanType]:
-        with SessionLocal() as db:
-            plans = db.scalars(select(Plan).where(Plan.is_active.is_(True)).order_by(Plan.created_at.desc())).all()
-            return [PlanType(id=plan.id, name=plan.name, price=plan.price, currency=plan.currency) for plan in plans]
+    async def plans(self, info: Info[GraphQLContext, None], limit: int = 50, offset: int = 0) -> list[PlanType]:
+        limit, offset = page(limit, offset)
+
+        async def load() -> list[PlanType]:
+            plans = await info.context.all(
+                select(Plan).where(Plan.is_active.is_(True)).order_by(Plan.created_at.desc()).offset(offset).limit(limit),
+                primary=True,
+            )
+            return [PlanType.from_model(plan) for plan in plans]
+
+        return await response_cache.get_or_load("plans", (limit, offset), load)
 
     @strawberry.field
-    def nodes(self) -> list[NodeType]:
-        with SessionLocal() as db:
-            nodes = db.scalars(select(Node).order_by(Node.last_seen_at.desc().nullslast())).all()
-            return [
-                NodeType(
-                    id=node.id,
-                    status=node.status.value,
-                    desired_config_revision=node.desired_config_revision,
-                    applied_config_revision=node.applied_config_revision,
-                )
-                for node in nodes
-            ]
+    async def nodes(self, info: Info[GraphQLContext, None], limit: int = 50, offset: int = 0) -> list[NodeType]:
+        limit, offset = page(limit, offset)
+        nodes = await info.context.all(
+            select(Node).order_by(Node.last_seen_at.desc().nullslast(), Node.id).offset(offset).limit(limit)
+        )
+        return [NodeType.from_model(node) for node in nodes]
 
     @strawberry.field
-    def squads(self) -> list[SquadType]:
-        with SessionLocal() as db:
-            squads = db.scalars(select(Squad).order_by(Squad.name.asc())).all()
-            return [SquadType(id=s.id, name=s.name, selection_policy=s.selection_policy.value) for s in squads]
+    async def squads(self, info: Info[GraphQLContext, None], limit: int = 50, offset: int = 0) -> list[SquadType]:
+        limit, offset = page(limit, offset)
+
+        async def load() -> list[SquadType]:
+            squads = await info.context.all(
+                select(Squad).order_by(Squad.name.asc()).offset(offset).limit(limit), primary=True
+            )
+            return [SquadType.from_model(squad) for squad in squads]
+
+        # Only the squad rows are cached; Squad.servers still resolves per request.
+        return await response_cache.get_or_load("squads", (limit, offset), load)
 
 
 @strawberry.type
 class Mutation:
     @strawberry.mutation
-    def create_plan(self, input: CreatePlanInput) -> PlanType:
-        with SessionLocal() as db:
-            plan = Plan(
-                name=input.name,
-                price=input.price,
-                currency=input.currency,
-                duration_days=input.duration_days,
-                traffic_limit_bytes=input.traffic_limit_bytes,
-                max_devices=input.max_devices,
-            )
-            db.add(plan)
-            db.commit()
-            db.refresh(plan)
-            return PlanType(id=plan.id, name=plan.name, price=plan.price, currency=plan.currency)
+    async def create_plan(self, info: Info[GraphQLContext, None], input: CreatePlanInput) -> PlanType:
+        db = info.context.db
+        plan = Plan(
+            name=input.name,
+            price=input.price,
+            currency=input.currency,
+            duration_days=input.duration_days,
+            traffic_limit_bytes=input.traffic_limit_bytes,
+            max_devices=input.max_devices,
+        )
+        db.add(plan)
+        await db.commit()
+        return PlanType.from_model(plan)
 
 
 @strawberry.type
 class Subscription:
     @strawberry.subscription
-    async def audit_events(self, poll_seconds: float = 1.5) -> AsyncGenerator[AuditEventType, None]:
-        last_id: Optional[str] = None
-        while True:
-            with SessionLocal() as db:
-                query = select(AuditLog).order_by(desc(AuditLog.created_at)).limit(1)
-                event = db.scalar(query)
-                if event and event.id != last_id:
-                    last_id = event.id
-                    yield AuditEventType(
-                        id=event.id,
-                        action=event.action,
-                        entity_type=event.entity_type,
-                        entity_id=event.entity_id,
-                        created_at=event.created_at,
-                    )
-            await asyncio.sleep(poll_seconds)
-
-
-schema = strawberry.Schema(query=Query, mutation=Mutation, subscription=Subscription)
+    async def audit_events(
+        self,
+        poll_seconds: Annotated[
+            Optional[float], strawberry.argument(deprecation_reason="Events are pushed as they are written; ignored.")
+        ] = None,
+    ) -> AsyncGenerator[AuditEventType, None]:
+        subscriber = audit_events.subscribe()
+        try:
+            while True:
+                event = await subscriber.queue.get()
+                yield AuditEventType(
+                    id=event["id"],
+                    action=event["action"],
+                    entity_type=event["entity_type"],
+                    entity_id=event["entity_id"],
+                    created_at=event["created_at"],
+                )
+        finally:
+            audit_events.unsubscribe(subscriber)
+
+
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    subscription=Subscription,
+    extensions=[
+        PersistedQueries,
+        lambda: ParserCache(maxsize=256),
+        lambda: ValidationCache(maxsize=256),
+        lambda: QueryDepthLimiter(max_depth=settings.graphql_max_depth),
+        lambda: AddValidationRules([QueryCostRule]),
+    ],
+)
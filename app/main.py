@@ -7,16 +7,50 @@ from sqlalchemy.exc import IntegrityError
 from strawberry.fastapi import GraphQLRouter
 
 from app.api.v1.router import agent_router, api_router
+from app.core.compression import CompressionMiddleware
 from app.core.config import get_settings
 from app.core.rate_limit import RateLimitMiddleware
 from app.db.init_db import init_db
+from app.db.session import async_engine, async_read_engine
+from app.graphql.context import get_graphql_context
 from app.graphql.schema import schema
+from app.services.audit import audit_writer
+from app.services.auth_cache import api_key_last_used
+from app.services.bulk_users import bulk_job_sweeper
+from app.services.devices import device_last_seen
+from app.services.usage_store import usage_maintenance
+from app.services.user_feed import user_feed_compaction, user_feed_renderer, user_feed_sequencer
 
 settings = get_settings()
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     init_db()
+    audit_writer.start()
+    api_key_last_used.start()
+    device_last_seen.start()
+    user_feed_sequencer.start()
+    if settings.usage_maintenance_interval_seconds > 0:
+        usage_maintenance.start()
+    if settings.user_feed_compact_interval_seconds > 0:
+        user_feed_compaction.start()
+    if settings.user_feed_render_interval_seconds > 0:
+        user_feed_renderer.start()
+    if settings.bulk_user_sweep_interval_seconds > 0:
+        bulk_job_sweeper.start()
+        # Jobs this deployment's previous workers left running.
+        bulk_job_sweeper.wake()
     yield
+    await usage_maintenance.stop(final_run=False)
+    await user_feed_compaction.stop(final_run=False)
+    await user_feed_renderer.stop(final_run=False)
+    await bulk_job_sweeper.stop(final_run=False)
+    await user_feed_sequencer.stop()
+    await audit_writer.stop()
+    await api_key_last_used.stop()
+    await device_last_seen.stop()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
 
 
 app = FastAPI(title=settings.app_name, lifespan=lifespan)
@@ -28,6 +62,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
 
 
 @app.exception_handler(IntegrityError)
@@ -37,4 +72,4 @@ async def integrity_handler(_: Request, exc: IntegrityError) -> JSONResponse:
 
 app.include_router(api_router)
 app.include_router(agent_router)
-app.include_router(GraphQLRouter(schema), prefix="/graphql")
+app.include_router(GraphQLRouter(schema, context_getter=get_graphql_context), prefix="/graphql")
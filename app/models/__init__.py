@@ -5,6 +5,10 @@ from app.models.entities import (
     AuthPrincipal,
     BackupSnapshot,
     Base,
+    BulkJobStatus,
+    BulkUserJob,
+    BulkUserOperation,
+    ConfigBlob,
     ConfigRevision,
     ConfigRevisionStatus,
     Device,
@@ -15,6 +19,7 @@ from app.models.entities import (
     Node,
     NodeStatus,
     NodeUsage,
+    NodeUsageHourly,
     Order,
     OrderStatus,
     Payment,
@@ -24,11 +29,17 @@ from app.models.entities import (
     ProtocolType,
     Reseller,
     RoleName,
+    Rollout,
+    RolloutNode,
+    RolloutNodeStatus,
+    RolloutStatus,
     Server,
     Squad,
     SquadSelectionPolicy,
     SubscriptionAlias,
     User,
+    UserChange,
+    UserChangeOp,
     UserStatus,
     WebhookDelivery,
     WebhookDeliveryStatus,
@@ -42,6 +53,10 @@ __all__ = [
     "AuthPrincipal",
     "BackupSnapshot",
     "Base",
+    "BulkJobStatus",
+    "BulkUserJob",
+    "BulkUserOperation",
+    "ConfigBlob",
     "ConfigRevision",
     "ConfigRevisionStatus",
     "Device",
@@ -52,6 +67,7 @@ __all__ = [
     "Node",
     "NodeStatus",
     "NodeUsage",
+    "NodeUsageHourly",
     "Order",
     "OrderStatus",
     "Payment",
@@ -61,11 +77,17 @@ __all__ = [
     "ProtocolType",
     "Reseller",
     "RoleName",
+    "Rollout",
+    "RolloutNode",
+    "RolloutNodeStatus",
+    "RolloutStatus",
     "Server",
     "Squad",
     "SquadSelectionPolicy",
     "SubscriptionAlias",
     "User",
+    "UserChange",
+    "UserChangeOp",
     "UserStatus",
     "WebhookDelivery",
     "WebhookDeliveryStatus",
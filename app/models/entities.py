@@ -3,7 +3,20 @@ import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import JSON, BigInteger, Boolean, DateTime, Enum, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -100,6 +113,42 @@ class ConfigRevisionStatus(str, enum.Enum):
     rolled_back = "rolled_back"
 
 
+class UserChangeOp(str, enum.Enum):
+    add = "add"
+    remove = "remove"
+    update = "update"
+
+
+class RolloutStatus(str, enum.Enum):
+    in_progress = "in_progress"
+    completed = "completed"
+    halted = "halted"
+
+
+class RolloutNodeStatus(str, enum.Enum):
+    pending = "pending"
+    desired = "desired"
+    applied = "applied"
+    failed = "failed"
+    # A later push (another rollout, a render or a manual push) replaced its config first.
+    superseded = "superseded"
+
+
+class BulkUserOperation(str, enum.Enum):
+    block = "block"
+    update_limits = "update_limits"
+    assign_squad = "assign_squad"
+    rotate_keys = "rotate_keys"
+    reset_subscription = "reset_subscription"
+    delete = "delete"
+
+
+class BulkJobStatus(str, enum.Enum):
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
 class Reseller(Base):
     __tablename__ = "resellers"
 
@@ -146,6 +195,11 @@ class ApiKey(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_status_created_at", "status", "created_at"),
+        Index("ix_users_squad_id_status", "squad_id", "status"),
+        Index("ix_users_reseller_id_created_at", "reseller_id", "created_at"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     external_identities: Mapped[dict] = mapped_column(JSON, default=dict)
@@ -165,7 +219,7 @@ class User(Base):
     squad_id: Mapped[Optional[str]] = mapped_column(ForeignKey("squads.id"), nullable=True)
     reseller_id: Mapped[Optional[str]] = mapped_column(ForeignKey("resellers.id"), nullable=True, index=True)
     subscription_token: Mapped[str] = mapped_column(String(128), unique=True, index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, index=True)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
 
     squad: Mapped["Squad"] = relationship(back_populates="users")
@@ -175,6 +229,9 @@ class User(Base):
 
 class Device(Base):
     __tablename__ = "devices"
+    __table_args__ = (
+        Index("ix_devices_user_id_is_active_device_hash", "user_id", "is_active", "device_hash"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id: Mapped[str] = mapped_column(ForeignKey("users.id"), index=True)
@@ -205,12 +262,17 @@ class Squad(Base):
 
 class Server(Base):
     __tablename__ = "servers"
+    __table_args__ = (
+        Index("ix_servers_squad_id_status", "squad_id", "status"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     host: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     ip: Mapped[str] = mapped_column(String(64), default="")
     provider: Mapped[str] = mapped_column(String(128), default="")
     region: Mapped[str] = mapped_column(String(128), default="")
+    # Relative share of subscriptions under the "weighted" selection policy.
+    weight: Mapped[int] = mapped_column(Integer, default=100, server_default="100")
     squad_id: Mapped[str] = mapped_column(ForeignKey("squads.id"), index=True)
     status: Mapped[str] = mapped_column(String(64), default="active")
     last_paid_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -250,19 +312,34 @@ class Node(Base):
     last_apply_status: Mapped[str] = mapped_column(String(64), default="pending")
     last_seen_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     status: Mapped[NodeStatus] = mapped_column(Enum(NodeStatus), default=NodeStatus.provisioning)
-    desired_config: Mapped[dict] = mapped_column(JSON, default=dict)
+    # NULL means the empty config.
+    desired_config_hash: Mapped[Optional[str]] = mapped_column(ForeignKey("config_blobs.hash"), nullable=True, index=True)
+    # Digest of the inputs the desired config was last rendered from; see app.services.config_render.
+    config_render_digest: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     server: Mapped["Server"] = relationship(back_populates="node")
     config_revisions: Mapped[list["ConfigRevision"]] = relationship(back_populates="node", cascade="all, delete-orphan")
 
 
+class ConfigBlob(Base):
+    """A config document stored once, keyed by the sha256 of its canonical JSON."""
+
+    __tablename__ = "config_blobs"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    encoding: Mapped[str] = mapped_column(String(16), default="identity")
+    size: Mapped[int] = mapped_column(Integer)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+
 class ConfigRevision(Base):
     __tablename__ = "config_revisions"
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     node_id: Mapped[str] = mapped_column(ForeignKey("nodes.id"), index=True)
     revision: Mapped[int] = mapped_column(Integer)
-    config: Mapped[dict] = mapped_column(JSON, default=dict)
+    config_hash: Mapped[str] = mapped_column(ForeignKey("config_blobs.hash"), index=True)
     status: Mapped[ConfigRevisionStatus] = mapped_column(Enum(ConfigRevisionStatus), default=ConfigRevisionStatus.desired)
     rolled_back_from: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
@@ -271,6 +348,80 @@ class ConfigRevision(Base):
     node: Mapped["Node"] = relationship(back_populates="config_revisions")
 
 
+class Rollout(Base):
+    __tablename__ = "rollouts"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    status: Mapped[RolloutStatus] = mapped_column(Enum(RolloutStatus), default=RolloutStatus.in_progress, index=True)
+    target: Mapped[dict] = mapped_column(JSON, default=dict)
+    canary_percent: Mapped[int] = mapped_column(Integer, default=0)
+    failure_threshold: Mapped[float] = mapped_column(Float, default=0.2)
+    auto_advance: Mapped[bool] = mapped_column(Boolean, default=True)
+    # 0 is the canary wave when there is one; the last wave is waves - 1.
+    waves: Mapped[int] = mapped_column(Integer, default=1)
+    current_wave: Mapped[int] = mapped_column(Integer, default=0)
+    total_nodes: Mapped[int] = mapped_column(Integer, default=0)
+    halt_reason: Mapped[str] = mapped_column(String(255), default="")
+    created_by: Mapped[str] = mapped_column(String(128), default="")
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class RolloutNode(Base):
+    __tablename__ = "rollout_nodes"
+    __table_args__ = (Index("ix_rollout_nodes_node_id_revision", "node_id", "revision"),)
+
+    rollout_id: Mapped[str] = mapped_column(ForeignKey("rollouts.id"), primary_key=True)
+    node_id: Mapped[str] = mapped_column(ForeignKey("nodes.id"), primary_key=True)
+    wave: Mapped[int] = mapped_column(Integer, default=0)
+    config_hash: Mapped[str] = mapped_column(ForeignKey("config_blobs.hash"))
+    # Desired revision the push created; 0 until the node's wave is released.
+    revision: Mapped[int] = mapped_column(Integer, default=0)
+    status: Mapped[RolloutNodeStatus] = mapped_column(Enum(RolloutNodeStatus), default=RolloutNodeStatus.pending)
+
+
+class BulkUserJob(Base):
+    __tablename__ = "bulk_user_jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    operation: Mapped[BulkUserOperation] = mapped_column(Enum(BulkUserOperation))
+    params: Mapped[dict] = mapped_column(JSON, default=dict)
+    # {"user_ids": [...]} or {"filter": {...}}
+    selection: Mapped[dict] = mapped_column(JSON, default=dict)
+    status: Mapped[BulkJobStatus] = mapped_column(Enum(BulkJobStatus), default=BulkJobStatus.running, index=True)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    processed: Mapped[int] = mapped_column(Integer, default=0)
+    # Highest user id processed so far; chunks walk users in id order.
+    cursor: Mapped[str] = mapped_column(String(36), default="")
+    error: Mapped[str] = mapped_column(Text, default="")
+    reseller_id: Mapped[Optional[str]] = mapped_column(ForeignKey("resellers.id"), nullable=True)
+    created_by: Mapped[str] = mapped_column(String(128), default="")
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    # Stamped with every chunk; a running job left unstamped has lost its worker.
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class UserChange(Base):
+    """One entry of the squad membership feed that node agents follow."""
+
+    __tablename__ = "user_changes"
+    __table_args__ = (
+        Index("ix_user_changes_squad_id_seq", "squad_id", "seq"),
+        Index("ix_user_changes_seq", "seq", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    # Feed position, assigned after commit in commit order; NULL until then.
+    seq: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    squad_id: Mapped[str] = mapped_column(String(36))
+    user_id: Mapped[str] = mapped_column(String(36))
+    op: Mapped[UserChangeOp] = mapped_column(Enum(UserChangeOp))
+    # uuid, vless_id and short_id; for "remove" the values the node has to drop
+    credentials: Mapped[dict] = mapped_column(JSON, default=dict)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, index=True)
+
+
 class Plan(Base):
     __tablename__ = "plans"
 
@@ -322,14 +473,32 @@ class SubscriptionAlias(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
 
 
+# Raw usage reports; on PostgreSQL range-partitioned by day (see app.services.usage_store).
 class NodeUsage(Base):
     __tablename__ = "node_usage"
+    __table_args__ = (
+        Index("ix_node_usage_user_id_reported_at", "user_id", "reported_at"),
+        {"postgresql_partition_by": "RANGE (reported_at)"},
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     node_id: Mapped[str] = mapped_column(ForeignKey("nodes.id"), index=True)
     user_id: Mapped[str] = mapped_column(ForeignKey("users.id"), index=True)
     bytes_used: Mapped[int] = mapped_column(BigInteger)
-    reported_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    # Part of the primary key because PostgreSQL requires the partition key in it.
+    reported_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, default=utcnow, index=True)
+
+
+# node_usage rows older than usage_compact_after_days, summed per hour, node and user.
+class NodeUsageHourly(Base):
+    __tablename__ = "node_usage_hourly"
+    __table_args__ = (Index("ix_node_usage_hourly_user_id_hour", "user_id", "hour"),)
+
+    hour: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    node_id: Mapped[str] = mapped_column(ForeignKey("nodes.id"), primary_key=True)
+    user_id: Mapped[str] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    bytes_used: Mapped[int] = mapped_column(BigInteger)
+    reports: Mapped[int] = mapped_column(Integer, default=1)
 
 
 class MigrationRun(Base):
@@ -357,6 +526,9 @@ class WebhookEndpoint(Base):
 
 class WebhookDelivery(Base):
     __tablename__ = "webhook_deliveries"
+    __table_args__ = (
+        Index("ix_webhook_deliveries_status_created_at", "status", "created_at"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     endpoint_id: Mapped[str] = mapped_column(ForeignKey("webhook_endpoints.id"), index=True)
@@ -383,11 +555,20 @@ class BackupSnapshot(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # Every filter is paired with the (created_at, id) keyset sort. PostgreSQL
+    # also gets GIN indexes over payload, see revision 0004.
+    __table_args__ = (
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_action_created_at_id", "action", "created_at", "id"),
+        Index("ix_audit_logs_entity_type_created_at_id", "entity_type", "created_at", "id"),
+        Index("ix_audit_logs_entity_id_created_at_id", "entity_id", "created_at", "id"),
+        Index("ix_audit_logs_actor_created_at_id", "actor", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     actor: Mapped[str] = mapped_column(String(128), default="system")
-    action: Mapped[str] = mapped_column(String(128), index=True)
-    entity_type: Mapped[str] = mapped_column(String(128), index=True)
-    entity_id: Mapped[str] = mapped_column(String(36), index=True)
+    action: Mapped[str] = mapped_column(String(128))
+    entity_type: Mapped[str] = mapped_column(String(128))
+    entity_id: Mapped[str] = mapped_column(String(36))
     payload: Mapped[dict] = mapped_column(JSON, default=dict)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
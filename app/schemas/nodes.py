@@ -17,6 +17,7 @@ class NodeResponse(BaseModel):
     server_id: str
     node_token: str
     desired_config_revision: int
+    desired_config_hash: Optional[str]
     applied_config_revision: int
     last_apply_status: str
     last_seen_at: Optional[datetime]
@@ -29,6 +30,8 @@ class AgentHeartbeat(BaseModel):
     node_token: str
     engine_awg2_version: str = ""
     engine_singbox_version: str = ""
+    cpu_percent: Optional[float] = Field(default=None, ge=0, le=100)
+    connections: Optional[int] = Field(default=None, ge=0)
 
 
 class AgentApplyResult(BaseModel):
@@ -48,4 +51,8 @@ class AgentReportUsage(BaseModel):
 class DesiredConfigResponse(BaseModel):
     node_id: str
     desired_config_revision: int
-    desired_config: dict
+    desired_config_hash: Optional[str] = None
+    # Either the full document, or an RFC 6902 patch against base_config_revision.
+    desired_config: Optional[dict] = None
+    base_config_revision: Optional[int] = None
+    patch: Optional[list[dict]] = None
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class RolloutCreate(BaseModel):
+    squad_id: Optional[str] = None
+    region: Optional[str] = None
+    node_status: Optional[str] = None
+    node_ids: Optional[list[str]] = None
+    all_nodes: bool = False
+    # Exactly one of these. Template strings may use {{node_id}}, {{server_id}},
+    # {{host}}, {{ip}}, {{region}}, {{provider}} and {{squad_id}}.
+    config: Optional[dict] = None
+    template: Optional[dict] = None
+    canary_percent: int = Field(default=0, ge=0, le=100)
+    failure_threshold: float = Field(default=0.2, ge=0, le=1)
+    auto_advance: bool = True
+
+
+class RolloutResponse(BaseModel):
+    id: str
+    status: str
+    target: dict
+    canary_percent: int
+    failure_threshold: float
+    auto_advance: bool
+    waves: int
+    current_wave: int
+    total_nodes: int
+    halt_reason: str
+    created_by: str
+    created_at: datetime
+    finished_at: Optional[datetime]
+    progress: dict[int, dict[str, int]] = Field(default_factory=dict)
+
+    model_config = {"from_attributes": True}
@@ -8,7 +8,8 @@ class SquadCreate(BaseModel):
     name: str
     description: str = ""
     selection_policy: str = "round-robin"
-    fallback_policy: str = "none"
+    # "none", "degraded" (serve unhealthy endpoints last) or "squad:<squad_id>"
+    fallback_policy: str = Field(default="none", pattern=r"^(none|degraded|squad:[0-9a-f-]{36})$")
     allowed_protocols: list[str] = Field(default_factory=lambda: ["AWG2", "Sing-box"])
 
 
@@ -28,6 +29,7 @@ class ServerCreate(BaseModel):
     ip: str = ""
     provider: str = ""
     region: str = ""
+    weight: int = Field(default=100, ge=0)
     squad_id: str
     price: float = 0
     currency: str = "USD"
@@ -39,6 +41,7 @@ class ServerResponse(BaseModel):
     ip: str
     provider: str
     region: str
+    weight: int
     squad_id: str
     status: str
     price: float
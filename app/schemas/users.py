@@ -47,3 +47,37 @@ class UserResponse(BaseModel):
 class UserListResponse(BaseModel):
     items: list[UserResponse]
     total: int
+
+
+class BulkUserFilter(BaseModel):
+    status: Optional[str] = None
+    squad_id: Optional[str] = None
+    expires_before: Optional[datetime] = None
+
+
+class BulkUserRequest(BaseModel):
+    operation: str
+    # Exactly one way of selecting users.
+    user_ids: Optional[list[str]] = None
+    filter: Optional[BulkUserFilter] = None
+    all_users: bool = False
+    # Arguments of update_limits and assign_squad.
+    traffic_limit_bytes: Optional[int] = Field(default=None, ge=0)
+    max_devices: Optional[int] = Field(default=None, ge=0)
+    squad_id: Optional[str] = None
+
+
+class BulkUserJobResponse(BaseModel):
+    id: str
+    operation: str
+    params: dict
+    selection: dict
+    status: str
+    total: int
+    processed: int
+    error: str
+    created_by: str
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+    model_config = {"from_attributes": True}
@@ -1,18 +1,212 @@
-from typing import Optional
+import logging
+import time
+import uuid
+from collections import deque
+from collections.abc import Callable, Iterable
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Optional, Union
 
+from sqlalchemy import event, insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
+from app.core.metrics import register_gauge, register_summary
+from app.db.session import SessionLocal
 from app.models import AuditLog
+from app.services.background import PeriodicTask
+from app.services.broadcast import Broadcaster
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "pending_audit"
+PUBLISH_KEY = "publish_audit"
+
+# Live feed behind the GraphQL audit_events subscription.
+audit_events = Broadcaster(settings.redis_url, "pepoapple:audit_events", queue_size=settings.audit_stream_queue_size)
+register_gauge("audit.stream_subscribers", lambda: len(audit_events))
+register_gauge("audit.stream_dropped", lambda: audit_events.dropped)
+register_gauge("audit.stream_unpublished", lambda: audit_events.unpublished)
+
+
+class AuditWriter:
+    """Queues committed audit records and inserts them in multi-row batches.
+
+    Writes happen on a background task started from the app lifespan, never
+    in the committing request: when the queue grows past ``max_queue`` the
+    writer is woken early instead. A batch that keeps failing for
+    ``max_attempts`` flushes is retried row by row; rows that still fail for
+    a reason other than the database being unreachable are logged and
+    dropped, so one bad payload cannot hold up every later record.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        broadcaster: Optional[Broadcaster] = None,
+        batch_size: int = 500,
+        flush_interval_seconds: float = 1.0,
+        max_queue: int = 50_000,
+        max_attempts: int = 5,
+    ) -> None:
+        self.session_factory = session_factory
+        self.broadcaster = broadcaster
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.dead_lettered = 0
+        self.flush_latency = register_summary("audit.flush_latency_ms")
+        self._queue: deque[dict] = deque()
+        self._failed_attempts = 0
+        self._flush_lock = Lock()
+        self._task = PeriodicTask("audit flush", self.flush, flush_interval_seconds)
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> bool:
+        return self._task.running
+
+    def submit(self, records: Iterable[dict]) -> None:
+        self._queue.extend(records)
+        if len(self._queue) >= self.max_queue:
+            self._task.wake()
+
+    def _insert(self, records: list[dict]) -> None:
+        with self.session_factory() as db:
+            db.execute(insert(AuditLog), records)
+            db.commit()
+
+    def _insert_each(self, batch: list[dict]) -> list[dict]:
+        written = []
+        for index, record in enumerate(batch):
+            try:
+                self._insert([record])
+            except (OperationalError, InterfaceError):
+                # The database went away mid-way; keep the rest for the next flush.
+                self._queue.extendleft(reversed(batch[index:]))
+                raise
+            except Exception:
+                self.dead_lettered += 1
+                logger.exception("audit record dropped after %d failed flushes: %r", self.max_attempts, record)
+            else:
+                written.append(record)
+        return written
+
+    def flush(self) -> int:
+        written = 0
+        with self._flush_lock:
+            while self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                started = time.perf_counter()
+                try:
+                    self._insert(batch)
+                except Exception:
+                    self._failed_attempts += 1
+                    if self._failed_attempts < self.max_attempts:
+                        self._queue.extendleft(reversed(batch))
+                        raise
+                    self._failed_attempts = 0
+                    batch = self._insert_each(batch)
+                else:
+                    self._failed_attempts = 0
+                self.flush_latency.observe((time.perf_counter() - started) * 1000)
+                if self.broadcaster is not None and batch:
+                    self.broadcaster.publish(batch)
+                written += len(batch)
+        return written
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+
+
+audit_writer = AuditWriter(
+    SessionLocal,
+    broadcaster=audit_events,
+    batch_size=settings.audit_batch_size,
+    flush_interval_seconds=settings.audit_flush_interval_seconds,
+    max_queue=settings.audit_max_queue,
+    max_attempts=settings.audit_flush_max_attempts,
+)
+register_gauge("audit.queue_depth", lambda: len(audit_writer))
+register_gauge("audit.dead_lettered", lambda: audit_writer.dead_lettered)
 
 
 def write_audit(
-    db: Session, actor: str, action: str, entity_type: str, entity_id: str, payload: Optional[dict] = None
+    db: Union[Session, AsyncSession],
+    actor: str,
+    action: str,
+    entity_type: str,
+    entity_id: str,
+    payload: Optional[dict] = None,
+    durable: bool = False,
+) -> None:
+    """Record an audit entry for the caller's transaction.
+
+    By default the entry is handed to ``audit_writer`` once the transaction
+    commits and dropped if it rolls back. ``durable=True`` (or a writer that is
+    not running) adds the row to the transaction itself, so it commits or rolls
+    back together with the business change.
+    """
+    write_audits(db, actor, action, entity_type, [(entity_id, payload)], durable=durable)
+
+
+def write_audits(
+    db: Union[Session, AsyncSession],
+    actor: str,
+    action: str,
+    entity_type: str,
+    entries: list[tuple[str, Optional[dict]]],
+    durable: bool = False,
 ) -> None:
-    record = AuditLog(
-        actor=actor,
-        action=action,
-        entity_type=entity_type,
-        entity_id=entity_id or "pending",
-        payload=payload or {},
-    )
-    db.add(record)
+    """``write_audit`` for many ``(entity_id, payload)`` pairs; durable rows go in one multi-row insert."""
+    now = datetime.now(timezone.utc)
+    records = [
+        {
+            "id": str(uuid.uuid4()),
+            "actor": actor,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id or "pending",
+            "payload": payload or {},
+            "created_at": now,
+        }
+        for entity_id, payload in entries
+    ]
+    if not records:
+        return
+    session = db.sync_session if isinstance(db, AsyncSession) else db
+    if durable or not settings.audit_async or not audit_writer.running:
+        if len(records) == 1:
+            session.add(AuditLog(**records[0]))
+        else:
+            session.execute(insert(AuditLog), records)
+        session.info.setdefault(PUBLISH_KEY, []).extend(records)
+        return
+    if not session.in_transaction():
+        # Nothing else may touch the session before commit/rollback; begin
+        # explicitly so the transaction events below still fire.
+        session.begin()
+    session.info.setdefault(PENDING_KEY, []).extend(records)
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_committed_audit(session: Session) -> None:
+    records = session.info.pop(PENDING_KEY, None)
+    if records:
+        audit_writer.submit(records)
+    audit_events.publish(session.info.pop(PUBLISH_KEY, None) or [])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back_audit(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
+        session.info.pop(PUBLISH_KEY, None)
@@ -2,17 +2,21 @@ import hashlib
 import secrets
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
 
-from fastapi import Depends, Header, HTTPException, status
+from fastapi import Header, HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
-from app.db.session import get_db
+from app.db.session import SessionLocal
 from app.models import ApiKey, ApiKeyStatus, AuthPrincipal, RoleName
+from app.services.auth_cache import PrincipalState, api_key_cache, api_key_last_used, principal_cache
+from app.services.scopes import registry as scope_registry
+from app.services.scopes import scope_mask
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
@@ -25,16 +29,23 @@ ROLE_SCOPES = {
     RoleName.reseller: ["users.read", "users.write", "billing.read"],
     RoleName.user: ["users.read"],
 }
+for granted in ROLE_SCOPES.values():
+    for scope in granted:
+        scope_registry.register(scope)
 
 
 @dataclass
 class AuthContext:
     principal_id: str
-    scopes: set[str]
+    scope_mask: int
     role: str
     reseller_id: Optional[str] = None
     auth_type: str = "bearer"
 
+    @property
+    def scopes(self) -> set[str]:
+        return scope_registry.names(self.scope_mask)
+
 
 @dataclass
 class ApiKeySecret:
@@ -83,6 +94,7 @@ def create_token_pair(principal: AuthPrincipal) -> tuple[str, str]:
             "role": principal.role.value,
             "scopes": scopes,
             "reseller_id": principal.reseller_id,
+            "v": principal.refresh_token_version,
         },
         timedelta(minutes=settings.access_token_expire_minutes),
     )
@@ -114,53 +126,86 @@ def authenticate_principal(db: Session, username: str, password: str) -> AuthPri
 def generate_api_key_secret() -> ApiKeySecret:
     raw = f"ppa_{secrets.token_urlsafe(32)}"
     prefix = raw[:12]
-    hashed = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    hashed = hash_api_key(raw)
     return ApiKeySecret(raw=raw, prefix=prefix, hashed=hashed)
 
 
-def _from_api_key(db: Session, api_key_raw: str) -> AuthContext:
-    key_hash = hashlib.sha256(api_key_raw.encode("utf-8")).hexdigest()
-    api_key = db.scalar(select(ApiKey).where(ApiKey.key_hash == key_hash, ApiKey.status == ApiKeyStatus.active))
-    if not api_key:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid_api_key")
-    api_key.last_used_at = _now()
-    db.commit()
-    return AuthContext(
-        principal_id=api_key.owner_principal_id,
-        scopes=set(api_key.scopes or []),
-        role="api_key",
-        reseller_id=api_key.reseller_id,
-        auth_type="api_key",
-    )
-
-
-def _from_bearer(db: Session, bearer_token: str) -> AuthContext:
+def hash_api_key(api_key_raw: str) -> str:
+    return hashlib.sha256(api_key_raw.encode("utf-8")).hexdigest()
+
+
+def _from_api_key(api_key_raw: str) -> AuthContext:
+    key_hash = hash_api_key(api_key_raw)
+    cached = api_key_cache.get(key_hash)
+    if cached is None:
+        with SessionLocal() as db:
+            api_key = db.scalar(select(ApiKey).where(ApiKey.key_hash == key_hash, ApiKey.status == ApiKeyStatus.active))
+            if not api_key:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid_api_key")
+            ctx = AuthContext(
+                principal_id=api_key.owner_principal_id,
+                scope_mask=scope_mask(tuple(api_key.scopes or ())),
+                role="api_key",
+                reseller_id=api_key.reseller_id,
+                auth_type="api_key",
+            )
+            cached = (api_key.id, ctx)
+        api_key_cache.put(key_hash, cached)
+
+    api_key_id, ctx = cached
+    api_key_last_used.touch(api_key_id, _now())
+    return ctx
+
+
+def _principal_state(principal_id: str) -> Optional[PrincipalState]:
+    state = principal_cache.get(principal_id)
+    if state is None:
+        with SessionLocal() as db:
+            principal = db.get(AuthPrincipal, principal_id)
+            if not principal:
+                return None
+            state = PrincipalState(
+                is_active=principal.is_active,
+                refresh_token_version=principal.refresh_token_version,
+                role=principal.role.value,
+            )
+        principal_cache.put(principal_id, state)
+    return state
+
+
+def _from_bearer(bearer_token: str) -> AuthContext:
     claims = decode_token(bearer_token)
     if claims.get("typ") != "access":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid_token_type")
 
-    principal = db.get(AuthPrincipal, claims.get("sub"))
-    if not principal or not principal.is_active:
+    principal_id = claims.get("sub")
+    state = _principal_state(principal_id) if principal_id else None
+    if not state or not state.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="principal_not_found")
+    if claims.get("v", state.refresh_token_version) != state.refresh_token_version:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="token_revoked")
 
     return AuthContext(
-        principal_id=principal.id,
-        scopes=set(claims.get("scopes", [])),
-        role=claims.get("role", principal.role.value),
+        principal_id=principal_id,
+        scope_mask=scope_mask(tuple(claims.get("scopes", ()))),
+        role=claims.get("role", state.role),
         reseller_id=claims.get("reseller_id"),
         auth_type="bearer",
     )
 
 
+@lru_cache(maxsize=256)
+def _dev_scope_mask(x_scopes: str) -> int:
+    return scope_registry.mask(scope.strip() for scope in x_scopes.split(",") if scope.strip())
+
+
 def _from_dev_scopes(x_scopes: Optional[str]) -> Optional[AuthContext]:
     if not x_scopes:
         return None
-    scopes = {scope.strip() for scope in x_scopes.split(",") if scope.strip()}
-    return AuthContext(principal_id="dev", scopes=scopes, role="dev", auth_type="dev")
+    return AuthContext(principal_id="dev", scope_mask=_dev_scope_mask(x_scopes), role="dev", auth_type="dev")
 
 
 def get_auth_context(
-    db: Session = Depends(get_db),
     authorization: Optional[str] = Header(default=None),
     x_api_key: Optional[str] = Header(default=None, alias="X-API-Key"),
     x_scopes: Optional[str] = Header(default=None, alias="X-Scopes"),
@@ -170,20 +215,19 @@ def get_auth_context(
         return dev_ctx
 
     if x_api_key:
-        return _from_api_key(db, x_api_key)
+        return _from_api_key(x_api_key)
 
     if authorization and authorization.startswith("Bearer "):
-        return _from_bearer(db, authorization.removeprefix("Bearer ").strip())
+        return _from_bearer(authorization.removeprefix("Bearer ").strip())
 
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="auth_required")
 
 
 def get_optional_auth_context(
-    db: Session = Depends(get_db),
     authorization: Optional[str] = Header(default=None),
     x_api_key: Optional[str] = Header(default=None, alias="X-API-Key"),
     x_scopes: Optional[str] = Header(default=None, alias="X-Scopes"),
 ) -> Optional[AuthContext]:
     if not authorization and not x_api_key and not x_scopes:
         return None
-    return get_auth_context(db=db, authorization=authorization, x_api_key=x_api_key, x_scopes=x_scopes)
+    return get_auth_context(authorization=authorization, x_api_key=x_api_key, x_scopes=x_scopes)
@@ -0,0 +1,148 @@
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Any, Optional
+
+from sqlalchemy import Column, bindparam, event, update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.session import SessionLocal
+from app.models import ApiKey, AuthPrincipal
+from app.services.background import PeriodicTask
+
+settings = get_settings()
+
+CHANGED_PRINCIPALS_KEY = "changed_principals"
+
+
+class TTLCache:
+    """Small thread-safe map whose entries expire ``ttl_seconds`` after insert."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10_000) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._items: dict[str, tuple[float, Any]] = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self.invalidate(key)
+            return None
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            if len(self._items) >= self.max_entries:
+                now = time.monotonic()
+                self._items = {k: v for k, v in self._items.items() if v[0] >= now}
+                if len(self._items) >= self.max_entries:
+                    self._items.pop(next(iter(self._items)))
+            self._items[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+@dataclass(frozen=True)
+class PrincipalState:
+    is_active: bool
+    refresh_token_version: int
+    role: str
+
+
+class LastUsedBuffer:
+    """Collects per-row timestamps for ``column`` and writes them in one bulk UPDATE per interval.
+
+    ``touch`` only records the stamp; the write happens on the background
+    task started from the app lifespan, never on the request path. A failed
+    write keeps the stamps for the next attempt.
+    """
+
+    def __init__(
+        self,
+        flush_interval_seconds: float,
+        session_factory: Callable[[], Session],
+        column: Column = ApiKey.__table__.c.last_used_at,
+    ) -> None:
+        self.session_factory = session_factory
+        self.column = column
+        self._pending: dict[str, datetime] = {}
+        self._lock = Lock()
+        self._task = PeriodicTask(f"{column} flush", self.flush, flush_interval_seconds)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, row_id: str, used_at: datetime) -> None:
+        with self._lock:
+            self._pending[row_id] = used_at
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = self.column.table
+        statement = (
+            update(table).where(table.c.id == bindparam("row_id")).values({self.column.name: bindparam("used_at")})
+        )
+        try:
+            with self.session_factory() as db:
+                db.execute(statement, [{"row_id": row_id, "used_at": used_at} for row_id, used_at in pending.items()])
+                db.commit()
+        except Exception:
+            with self._lock:
+                # Stamps touched since the swap are newer and win.
+                self._pending = {**pending, **self._pending}
+            raise
+        return len(pending)
+
+    @property
+    def running(self) -> bool:
+        return self._task.running
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+
+
+api_key_cache = TTLCache(settings.api_key_cache_ttl_seconds)
+api_key_last_used = LastUsedBuffer(settings.api_key_last_used_flush_seconds, SessionLocal)
+principal_cache = TTLCache(settings.principal_cache_ttl_seconds)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_principals(session: Session, _flush_context) -> None:
+    # Push invalidation: a deactivation or refresh_token_version bump evicts
+    # the cached state once it commits. Evicting at flush time would let a
+    # concurrent lookup re-cache the old row before the commit lands.
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, AuthPrincipal):
+            session.info.setdefault(CHANGED_PRINCIPALS_KEY, set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_principals(session: Session) -> None:
+    for principal_id in session.info.pop(CHANGED_PRINCIPALS_KEY, ()):
+        principal_cache.invalidate(principal_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changed_principals(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(CHANGED_PRINCIPALS_KEY, None)
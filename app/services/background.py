@@ -0,0 +1,70 @@
+"""Periodic background work started from the app lifespan.
+
+A task runs its blocking callable in a worker thread, so DB I/O never lands
+on the event loop or on a request. Failures are logged rather than raised;
+the next tick retries.
+"""
+import asyncio
+import logging
+from collections.abc import Callable
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    def __init__(self, name: str, work: Callable[[], Any], interval_seconds: float) -> None:
+        self.name = name
+        self.work = work
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def wake(self) -> None:
+        """Run the work now instead of at the next tick. Safe to call from any thread."""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None:
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # The loop closed under us; stop() runs the work one last time.
+            pass
+
+    async def run_once(self) -> None:
+        try:
+            await asyncio.to_thread(self.work)
+        except Exception:
+            logger.exception("%s failed; retrying in %ss", self.name, self.interval_seconds)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval_seconds)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.run_once()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self.run())
+
+    async def stop(self, final_run: bool = True) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._loop = self._wakeup = None
+        if final_run:
+            await self.run_once()
@@ -48,6 +48,7 @@ def confirm_payment_and_activate(db: Session, order_id: str, external_payment_id
         entity_type="order",
         entity_id=order.id,
         payload={"payment_id": payment.id, "user_id": user.id},
+        durable=True,
     )
     db.commit()
     db.refresh(payment)
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """One consumer's bounded queue. When it is full the oldest event is dropped."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int) -> None:
+        self.loop = loop
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, events: list[dict]) -> None:
+        # Runs on the subscriber's own loop.
+        for event in events:
+            if self.queue.full():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(event)
+
+
+class Broadcaster:
+    """Fans published events out to every subscriber's queue.
+
+    ``publish`` is thread-safe and never blocks: not on slow consumers and
+    not on Redis. With Redis available, events go through a pub/sub channel
+    so subscribers on every worker see events written by any of them; a
+    publisher thread does the round-trips, and a listener thread, running
+    while this worker has subscribers, reconnects with backoff when the
+    connection drops. Without Redis, delivery stays in process.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str],
+        channel: str,
+        queue_size: int = 256,
+        outbox_size: int = 10_000,
+        reconnect_delay_seconds: float = 0.5,
+        max_reconnect_delay_seconds: float = 30.0,
+    ) -> None:
+        self.channel = channel
+        self.queue_size = queue_size
+        self.reconnect_delay_seconds = reconnect_delay_seconds
+        self.max_reconnect_delay_seconds = max_reconnect_delay_seconds
+        self.unpublished = 0
+        self._departed_dropped = 0
+        self.redis_client: Optional[redis.Redis] = None
+        self._subscribers: set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._publisher: Optional[threading.Thread] = None
+        self._outbox: queue.Queue[list[dict]] = queue.Queue(outbox_size)
+        if redis_url:
+            try:
+                self.redis_client = redis.from_url(redis_url, decode_responses=True)
+                self.redis_client.ping()
+            except Exception:
+                self.redis_client = None
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def dropped(self) -> int:
+        """Events discarded from full subscriber queues, past and present subscribers."""
+        with self._lock:
+            return self._departed_dropped + sum(subscriber.dropped for subscriber in self._subscribers)
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self.redis_client is not None and self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name=f"broadcast:{self.channel}", daemon=True)
+                self._listener.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.discard(subscriber)
+                self._departed_dropped += subscriber.dropped
+
+    def publish(self, events: list[dict]) -> None:
+        if not events:
+            return
+        if self.redis_client is None:
+            self._fan_out(events)
+            return
+        try:
+            self._outbox.put_nowait(events)
+        except queue.Full:
+            self.unpublished += len(events)
+            return
+        if self._publisher is None:
+            with self._lock:
+                if self._publisher is None:
+                    self._publisher = threading.Thread(
+                        target=self._publish_outbox, name=f"broadcast-publish:{self.channel}", daemon=True
+                    )
+                    self._publisher.start()
+
+    def _publish_outbox(self) -> None:
+        while True:
+            events = self._outbox.get()
+            try:
+                self.redis_client.publish(self.channel, json.dumps(events, default=_isoformat))
+            except Exception:
+                logger.warning("redis publish to %s failed; delivering in process only", self.channel)
+                self._fan_out(events)
+
+    def _fan_out(self, events: list[dict]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, events)
+            except RuntimeError:
+                # Loop already closed; the subscriber is gone.
+                self.unsubscribe(subscriber)
+
+    def _deliver(self, message: dict) -> None:
+        try:
+            events = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        for event in events:
+            if isinstance(event.get("created_at"), str):
+                event["created_at"] = datetime.fromisoformat(event["created_at"])
+        self._fan_out(events)
+
+    def _listen(self) -> None:
+        delay = self.reconnect_delay_seconds
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._listener = None
+                        return
+                try:
+                    pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                    try:
+                        pubsub.subscribe(self.channel)
+                        delay = self.reconnect_delay_seconds
+                        while self._subscribers:
+                            message = pubsub.get_message(timeout=1.0)
+                            if message is not None:
+                                self._deliver(message)
+                    finally:
+                        pubsub.close()
+                except Exception:
+                    logger.warning("redis subscription to %s dropped; reconnecting in %.1fs", self.channel, delay)
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.max_reconnect_delay_seconds)
+        finally:
+            # Only on an unexpected exit; a listener started since then is left alone.
+            with self._lock:
+                if self._listener is threading.current_thread():
+                    self._listener = None
+
+
+def _isoformat(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
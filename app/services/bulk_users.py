@@ -0,0 +1,211 @@
+"""Bulk user operations, applied in chunks with set-based statements.
+
+A job selects users by id list or filter and walks them in id order,
+``BULK_USER_CHUNK_SIZE`` at a time, one transaction per chunk: lock the
+chunk's rows, apply the operation with one ``UPDATE ... WHERE id IN`` (or one
+executemany for per-user key rotation), then write the chunk's audit entries,
+webhook deliveries and membership feed entries with multi-row inserts. The
+job row carries the cursor and counts, so progress is visible while it runs.
+
+The cursor commits with each chunk, so a job whose worker went away resumes
+after its last completed chunk: ``bulk_job_sweeper`` picks up running jobs not
+stamped for ``BULK_USER_STALE_AFTER_SECONDS`` and runs them to the end.
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.session import SessionLocal
+from app.models import BulkJobStatus, BulkUserJob, BulkUserOperation, User, UserStatus
+from app.services.audit import write_audit, write_audits
+from app.services.background import PeriodicTask
+from app.services.devices import invalidate_devices_after_commit
+from app.services.selection import invalidate_selectors_after_commit
+from app.services.user_feed import CREDENTIAL_FIELDS, membership_changes, record_user_changes
+from app.services.webhooks import enqueue_event, enqueue_events
+
+settings = get_settings()
+
+# Same audit actions and webhook events as the single-user endpoints.
+AUDIT_ACTIONS = {
+    BulkUserOperation.block: "user.blocked",
+    BulkUserOperation.update_limits: "user.limits_updated",
+    BulkUserOperation.assign_squad: "user.squad_assigned",
+    BulkUserOperation.rotate_keys: "user.keys_rotated",
+    BulkUserOperation.reset_subscription: "user.subscription_reset",
+    BulkUserOperation.delete: "user.deleted",
+}
+WEBHOOK_EVENTS = {BulkUserOperation.block: "user.blocked"}
+
+
+def selection_query(selection: dict, reseller_id: Optional[str]):
+    query = select(User)
+    if "user_ids" in selection:
+        query = query.where(User.id.in_(selection["user_ids"]))
+    criteria = selection.get("filter") or {}
+    if criteria.get("status"):
+        query = query.where(User.status == UserStatus(criteria["status"]))
+    if criteria.get("squad_id"):
+        query = query.where(User.squad_id == criteria["squad_id"])
+    if criteria.get("expires_before"):
+        query = query.where(User.expires_at < datetime.fromisoformat(criteria["expires_before"]))
+    if reseller_id:
+        query = query.where(User.reseller_id == reseller_id)
+    return query
+
+
+def start_bulk_job(
+    db: Session,
+    actor: str,
+    operation: BulkUserOperation,
+    selection: dict,
+    params: dict,
+    reseller_id: Optional[str] = None,
+) -> BulkUserJob:
+    total = db.scalar(selection_query(selection, reseller_id).with_only_columns(func.count(User.id)))
+    job = BulkUserJob(
+        operation=operation,
+        params=params,
+        selection=selection,
+        total=total,
+        reseller_id=reseller_id,
+        created_by=actor,
+    )
+    db.add(job)
+    db.flush()
+    write_audit(db, actor, "user.bulk_started", "bulk_user_job", job.id, {"operation": operation.value, "total": total})
+    return job
+
+
+def _uniform_values(job: BulkUserJob, now: datetime) -> dict:
+    if job.operation == BulkUserOperation.block:
+        return {"status": UserStatus.blocked}
+    if job.operation == BulkUserOperation.delete:
+        return {"status": UserStatus.deleted}
+    if job.operation == BulkUserOperation.reset_subscription:
+        return {"expires_at": now, "traffic_used_bytes": 0, "status": UserStatus.expired}
+    if job.operation == BulkUserOperation.update_limits:
+        values = {"traffic_limit_bytes": job.params["traffic_limit_bytes"]}
+        if job.params.get("max_devices") is not None:
+            values["max_devices"] = job.params["max_devices"]
+        return values
+    return {"squad_id": job.params["squad_id"]}
+
+
+def process_chunk(db: Session, job: BulkUserJob) -> int:
+    """Apply the operation to the next chunk of users. Returns how many were processed."""
+    query = selection_query(job.selection, job.reseller_id).with_only_columns(
+        User.id, User.squad_id, User.status, *(getattr(User, field) for field in CREDENTIAL_FIELDS)
+    )
+    rows = db.execute(
+        query.where(User.id > job.cursor).order_by(User.id).limit(settings.bulk_user_chunk_size).with_for_update()
+    ).all()
+    if not rows:
+        return 0
+
+    users = User.__table__
+    ids = [row.id for row in rows]
+    now = datetime.now(timezone.utc)
+    if job.operation == BulkUserOperation.rotate_keys:
+        rotated = [
+            {"row_id": row.id, "new_uuid": str(uuid.uuid4()), "new_vless_id": str(uuid.uuid4()), "new_short_id": uuid.uuid4().hex[:8]}
+            for row in rows
+        ]
+        db.execute(
+            update(users)
+            .where(users.c.id == bindparam("row_id"))
+            .values(uuid=bindparam("new_uuid"), vless_id=bindparam("new_vless_id"), short_id=bindparam("new_short_id")),
+            rotated,
+        )
+        new_states = {
+            item["row_id"]: {"uuid": item["new_uuid"], "vless_id": item["new_vless_id"], "short_id": item["new_short_id"]}
+            for item in rotated
+        }
+    else:
+        values = _uniform_values(job, now)
+        db.execute(update(users).where(users.c.id.in_(ids)).values(**values))
+        new_states = {row.id: values for row in rows}
+
+    changes = []
+    for row in rows:
+        new = new_states[row.id]
+        old_credentials = {field: getattr(row, field) for field in CREDENTIAL_FIELDS}
+        new_credentials = {field: new.get(field, old_credentials[field]) for field in CREDENTIAL_FIELDS}
+        new_squad = new.get("squad_id", row.squad_id)
+        changes.extend(
+            membership_changes(
+                row.id, row.squad_id, row.status, old_credentials, new_squad, new.get("status", row.status), new_credentials
+            )
+        )
+    record_user_changes(db, changes)
+    # Core UPDATEs skip the flush hooks that keep these caches in step.
+    invalidate_devices_after_commit(db, ids)
+    invalidate_selectors_after_commit(db, {change["squad_id"] for change in changes})
+    # The ORM copies of these users, if any, are stale after the Core UPDATE.
+    db.expire_all()
+
+    payload = {**job.params, "bulk_job_id": job.id}
+    write_audits(db, job.created_by, AUDIT_ACTIONS[job.operation], "user", [(user_id, payload) for user_id in ids])
+    if job.operation in WEBHOOK_EVENTS:
+        enqueue_events(db, WEBHOOK_EVENTS[job.operation], [{"user_id": user_id} for user_id in ids])
+
+    job.cursor = ids[-1]
+    job.processed += len(ids)
+    job.updated_at = now
+    return len(ids)
+
+
+def finish_bulk_job(db: Session, job: BulkUserJob, error: str = "") -> None:
+    job.status = BulkJobStatus.failed if error else BulkJobStatus.completed
+    job.error = error
+    job.finished_at = job.updated_at = datetime.now(timezone.utc)
+    summary = {"operation": job.operation.value, "processed": job.processed, "status": job.status.value}
+    write_audit(db, job.created_by, f"user.bulk_{job.status.value}", "bulk_user_job", job.id, summary)
+    enqueue_event(db, f"users.bulk_{job.status.value}", {"job_id": job.id, **summary}, auto_commit=False)
+
+
+def run_bulk_job(job_id: str) -> None:
+    """Process a job to the end, committing after every chunk. Runs after the request returns."""
+    with SessionLocal() as db:
+        while True:
+            # Locked per chunk: a resumed job's slow original runner then waits
+            # and continues from the new cursor instead of repeating a chunk.
+            job = db.get(BulkUserJob, job_id, with_for_update=True, populate_existing=True)
+            if job is None or job.status != BulkJobStatus.running:
+                return
+            try:
+                processed = process_chunk(db, job)
+                if not processed:
+                    finish_bulk_job(db, job)
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                job = db.get(BulkUserJob, job_id)
+                finish_bulk_job(db, job, error=f"{type(exc).__name__}: {exc}"[:1000])
+                db.commit()
+
+
+def resume_stale_bulk_jobs(now: Optional[datetime] = None) -> list[str]:
+    """Claim running jobs whose worker stopped stamping them and run them to the end here."""
+    now = now or datetime.now(timezone.utc)
+    stale = (
+        BulkUserJob.status == BulkJobStatus.running,
+        BulkUserJob.updated_at < now - timedelta(seconds=settings.bulk_user_stale_after_seconds),
+    )
+    claimed = []
+    with SessionLocal() as db:
+        for job_id in db.scalars(select(BulkUserJob.id).where(*stale).order_by(BulkUserJob.created_at)).all():
+            # Only one worker's stamp matches the stale condition.
+            if db.execute(update(BulkUserJob).where(BulkUserJob.id == job_id, *stale).values(updated_at=now)).rowcount:
+                claimed.append(job_id)
+            db.commit()
+    for job_id in claimed:
+        run_bulk_job(job_id)
+    return claimed
+
+
+bulk_job_sweeper = PeriodicTask("bulk job sweeper", resume_stale_bulk_jobs, settings.bulk_user_sweep_interval_seconds)
@@ -0,0 +1,108 @@
+"""RFC 6902 JSON Patches between stored node configs.
+
+An agent that reports the revision it has applied gets the operations that
+turn that revision's config into the desired one instead of the whole
+document. Configs are content-addressed, so a patch depends only on the pair
+of blob hashes and is cached per pair: every node moving between the same two
+documents, as in a rollout, shares one diff.
+"""
+from difflib import SequenceMatcher
+from typing import Any, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import ConfigRevision
+from app.services.config_store import BlobLRU, canonical_json, load_config
+
+settings = get_settings()
+
+# (from_hash, to_hash) -> list of operations, or False when the full document is smaller
+config_patches = BlobLRU(settings.config_patch_cache_max)
+
+
+def _pointer(path: str, token: Any) -> str:
+    return f"{path}/{str(token).replace('~', '~0').replace('/', '~1')}"
+
+
+def diff(old: Any, new: Any, path: str = "") -> list[dict]:
+    """Operations that turn ``old`` into ``new``, applied in order.
+
+    Lists are matched element by element, so inserting or removing a user in
+    a long user list is one operation rather than a shift of every later index.
+    """
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+    if isinstance(old, dict):
+        ops = [{"op": "remove", "path": _pointer(path, key)} for key in old if key not in new]
+        for key, value in new.items():
+            if key in old:
+                ops.extend(diff(old[key], value, _pointer(path, key)))
+            else:
+                ops.append({"op": "add", "path": _pointer(path, key), "value": value})
+        return ops
+    if isinstance(old, list):
+        matcher = SequenceMatcher(None, [canonical_json(item) for item in old], [canonical_json(item) for item in new], autojunk=False)
+        ops, position = [], 0
+        for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+            if tag == "equal":
+                position += old_end - old_start
+                continue
+            removed, added = old[old_start:old_end], new[new_start:new_end]
+            paired = min(len(removed), len(added))
+            for index in range(paired):
+                ops.extend(diff(removed[index], added[index], _pointer(path, position + index)))
+            for index in range(paired, len(added)):
+                ops.append({"op": "add", "path": _pointer(path, position + index), "value": added[index]})
+            ops.extend({"op": "remove", "path": _pointer(path, position + paired)} for _ in range(len(removed) - paired))
+            position += len(added)
+        return ops
+    return [] if old == new else [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_patch(document: Any, ops: list[dict]) -> Any:
+    """Reference implementation of the subset of RFC 6902 that ``diff`` emits."""
+    for op in ops:
+        if op["path"] == "":
+            document = op["value"]
+            continue
+        *parents, last = [token.replace("~1", "/").replace("~0", "~") for token in op["path"].split("/")[1:]]
+        target = document
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        key: Any = int(last) if isinstance(target, list) else last
+        if op["op"] == "remove":
+            del target[key]
+        elif op["op"] == "add" and isinstance(target, list):
+            target.insert(key, op["value"])
+        else:
+            target[key] = op["value"]
+    return document
+
+
+def config_patch(db: Session, from_hash: Optional[str], to_hash: Optional[str]) -> Optional[list[dict]]:
+    """The patch between two stored configs, or None when it is not smaller than the target."""
+    key = (from_hash, to_hash)
+    cached = config_patches.get(key)
+    if cached is None:
+        target = load_config(db, to_hash)
+        ops = [] if from_hash == to_hash else diff(load_config(db, from_hash), target)
+        cached = ops if not ops or len(canonical_json(ops)) < len(canonical_json(target)) else False
+        config_patches.put(key, cached)
+    return None if cached is False else cached
+
+
+def desired_config_delivery(db: Session, node_id: str, desired_hash: Optional[str], applied_revision: Optional[int]) -> dict:
+    """A patch from the applied revision's config when one is known and worth it, else the full config."""
+    if applied_revision is not None:
+        base_hash = db.scalar(
+            select(ConfigRevision.config_hash).where(
+                ConfigRevision.node_id == node_id, ConfigRevision.revision == applied_revision
+            )
+        )
+        if base_hash is not None:
+            patch = config_patch(db, base_hash, desired_hash)
+            if patch is not None:
+                return {"base_config_revision": applied_revision, "patch": patch}
+    return {"desired_config": load_config(db, desired_hash)}
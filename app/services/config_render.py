@@ -0,0 +1,234 @@
+"""Per-node desired configs compiled from protocol profiles and squad membership.
+
+A node's config is a pure function of three inputs, each with its own digest:
+
+- the node itself: id, server address and region, enabled engines
+- its squad's active protocol profiles (``ProtocolProfile.schema_json``)
+- its squad's active users
+
+Squad-level inputs (profiles, members and the rendered user lists) are read
+fresh once per squad per render pass, while the pass holds its nodes' row
+locks, so a render on any worker sees every membership change committed
+before it. Each node stores the combined digest it was last rendered from, so
+a pass only regenerates nodes whose inputs moved: adding a user re-renders
+that squad's nodes and leaves every other squad alone. Membership changes
+trigger that pass from the user feed (see ``app.services.user_feed``); profile
+and node changes are rendered by ``POST /nodes/render``.
+
+Profile templates are sing-box inbound (or AWG2 interface) objects. String
+values may use ``{{host}}``-style placeholders, and a value of exactly
+``"{{users}}"`` becomes the squad's user list in the protocol's format.
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import ConfigRevision, Node, ProtocolProfile, ProtocolType, Server, Squad, User, UserStatus
+from app.services.config_store import canonical_json, put_configs
+from app.services.node_health import reload_after_commit
+
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+def render_template(template: Any, variables: dict[str, Any]) -> Any:
+    """Replace ``{{name}}`` placeholders in every string of a JSON document.
+
+    A string that is exactly one placeholder takes the variable's value as is,
+    so it can expand to a list or object.
+    """
+    if isinstance(template, dict):
+        return {key: render_template(value, variables) for key, value in template.items()}
+    if isinstance(template, list):
+        return [render_template(value, variables) for value in template]
+    if isinstance(template, str):
+        whole = PLACEHOLDER.fullmatch(template)
+        if whole and whole.group(1) in variables:
+            return variables[whole.group(1)]
+        return PLACEHOLDER.sub(lambda match: str(variables.get(match.group(1), match.group(0))), template)
+    return template
+
+
+def user_entry(protocol_type: ProtocolType, user) -> dict:
+    if protocol_type == ProtocolType.vless:
+        return {"name": user.short_id, "uuid": user.vless_id, "flow": "xtls-rprx-vision"}
+    if protocol_type == ProtocolType.tuic:
+        return {"name": user.short_id, "uuid": user.uuid, "password": user.vless_id}
+    if protocol_type == ProtocolType.sing_box:
+        return {"name": user.short_id, "uuid": user.vless_id}
+    return {"name": user.short_id, "uuid": user.uuid}
+
+
+def _digest(*parts: bytes) -> str:
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part)
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+# (name, protocol type, schema_json) of an active profile
+Profile = tuple[str, ProtocolType, dict]
+
+
+@dataclass(frozen=True)
+class SquadInputs:
+    profiles: tuple[Profile, ...]
+    users: dict[ProtocolType, list[dict]]
+    digest: str
+
+
+def active_profiles(db: Session) -> list[Profile]:
+    return [
+        (profile.name, profile.protocol_type, profile.schema_json or {})
+        for profile in db.scalars(
+            select(ProtocolProfile).where(ProtocolProfile.is_active.is_(True)).order_by(ProtocolProfile.name)
+        )
+    ]
+
+
+def load_squad_inputs(db: Session, squad_id: str, profiles: Optional[list[Profile]] = None) -> SquadInputs:
+    """``squad_id``'s inputs as committed now; ``profiles`` are the active profiles, if already loaded."""
+    allowed = db.scalar(select(Squad.allowed_protocols).where(Squad.id == squad_id)) or []
+    if profiles is None:
+        profiles = active_profiles(db)
+    profiles = tuple(profile for profile in profiles if profile[1].value in allowed)
+    members = db.execute(
+        select(User.uuid, User.vless_id, User.short_id)
+        .where(User.squad_id == squad_id, User.status == UserStatus.active)
+        .order_by(User.uuid)
+    ).all()
+    users = {protocol_type: [user_entry(protocol_type, member) for member in members] for _, protocol_type, _ in profiles}
+    profiles_digest = _digest(*(canonical_json({"name": name, "type": kind.value, "schema": schema}) for name, kind, schema in profiles))
+    members_digest = _digest(*(f"{member.uuid}:{member.vless_id}:{member.short_id}".encode() for member in members))
+    return SquadInputs(profiles, users, _digest(profiles_digest.encode(), members_digest.encode()))
+
+
+def renders_from_profiles(db: Session, squad: Squad) -> bool:
+    """Whether ``squad``'s node configs are rendered from an active protocol profile."""
+    allowed = squad.allowed_protocols or []
+    active = db.scalars(select(ProtocolProfile.protocol_type).where(ProtocolProfile.is_active.is_(True)).distinct())
+    return any(protocol_type.value in allowed for protocol_type in active)
+
+
+def render_node_config(node, inputs: SquadInputs) -> dict:
+    variables = {
+        "node_id": node.id,
+        "server_id": node.server_id,
+        "host": node.host,
+        "ip": node.ip,
+        "region": node.region,
+        "provider": node.provider,
+        "squad_id": node.squad_id,
+    }
+    config: dict[str, list] = {"inbounds": [], "awg2": []}
+    for name, protocol_type, schema in inputs.profiles:
+        if protocol_type == ProtocolType.awg2 and not node.engine_awg2_enabled:
+            continue
+        if protocol_type != ProtocolType.awg2 and not node.engine_singbox_enabled:
+            continue
+        fragment = render_template(schema, {**variables, "users": inputs.users[protocol_type]})
+        if isinstance(fragment, dict):
+            fragment.setdefault("tag", name)
+        config["awg2" if protocol_type == ProtocolType.awg2 else "inbounds"].append(fragment)
+    return config
+
+
+def node_digest(node, inputs: SquadInputs) -> str:
+    local = f"{node.id}|{node.server_id}|{node.host}|{node.ip}|{node.region}|{node.provider}|"
+    local += f"{node.engine_awg2_enabled}|{node.engine_singbox_enabled}"
+    return _digest(local.encode(), inputs.digest.encode())
+
+
+def render_nodes(db: Session, squad_id: Optional[str] = None, node_ids: Optional[list[str]] = None) -> dict:
+    """Re-render the desired config of every matching node whose inputs changed.
+
+    Nodes whose squad has no applicable profile keep their hand-pushed
+    configs. A changed config becomes a new desired revision; a node whose
+    inputs changed without changing its output only has its digest updated.
+    """
+    query = (
+        select(
+            Node.id,
+            Node.server_id,
+            Node.engine_awg2_enabled,
+            Node.engine_singbox_enabled,
+            Node.desired_config_revision,
+            Node.desired_config_hash,
+            Node.config_render_digest,
+            Server.host,
+            Server.ip,
+            Server.region,
+            Server.provider,
+            Server.squad_id,
+        )
+        .join(Server, Server.id == Node.server_id)
+        .order_by(Node.id)
+    )
+    if squad_id:
+        query = query.where(Server.squad_id == squad_id)
+    if node_ids:
+        query = query.where(Node.id.in_(node_ids))
+    nodes = db.execute(query.with_for_update(of=Node)).all()
+
+    profiles = active_profiles(db) if nodes else []
+    inputs_by_squad: dict[Optional[str], SquadInputs] = {}
+    stale, digests, configs, skipped = [], [], [], 0
+    for node in nodes:
+        inputs = inputs_by_squad.get(node.squad_id)
+        if inputs is None:
+            inputs = inputs_by_squad[node.squad_id] = load_squad_inputs(db, node.squad_id, profiles)
+        if not inputs.profiles:
+            skipped += 1
+            continue
+        digest = node_digest(node, inputs)
+        if digest == node.config_render_digest:
+            continue
+        stale.append(node)
+        digests.append(digest)
+        configs.append(render_node_config(node, inputs))
+
+    hashes = put_configs(db, configs) if configs else []
+    changed = [
+        {"row_id": node.id, "revision": node.desired_config_revision + 1, "hash": config_hash, "digest": digest}
+        for node, config_hash, digest in zip(stale, hashes, digests)
+        if config_hash != node.desired_config_hash
+    ]
+    if changed:
+        db.execute(
+            insert(ConfigRevision),
+            [{"node_id": item["row_id"], "revision": item["revision"], "config_hash": item["hash"]} for item in changed],
+        )
+        db.execute(
+            update(Node.__table__)
+            .where(Node.__table__.c.id == bindparam("row_id"))
+            .values(
+                desired_config_revision=bindparam("revision"),
+                desired_config_hash=bindparam("hash"),
+                config_render_digest=bindparam("digest"),
+            ),
+            changed,
+        )
+        reload_after_commit(db)
+    changed_ids = {item["row_id"] for item in changed}
+    unchanged = [
+        {"row_id": node.id, "digest": digest} for node, digest in zip(stale, digests) if node.id not in changed_ids
+    ]
+    if unchanged:
+        db.execute(
+            update(Node.__table__)
+            .where(Node.__table__.c.id == bindparam("row_id"))
+            .values(config_render_digest=bindparam("digest")),
+            unchanged,
+        )
+    return {
+        "nodes": len(nodes),
+        "rendered": len(stale),
+        "changed": len(changed),
+        "skipped_without_profiles": skipped,
+        "changed_node_ids": sorted(changed_ids),
+    }
+
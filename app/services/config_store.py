@@ -0,0 +1,122 @@
+"""Content-addressed storage for node configs.
+
+Each distinct config document is stored once in ``config_blobs`` under the
+sha256 of its canonical JSON; nodes and revisions only carry that hash. Blobs
+are immutable, so decoded documents are cached without invalidation. Only
+``load_config`` fills that cache, from a committed row: a document stored by
+a transaction that later rolls back never becomes readable from it.
+"""
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from collections.abc import Hashable
+from threading import Lock
+from typing import Any, Optional, Union
+
+from sqlalchemy import Connection, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import ConfigBlob
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+settings = get_settings()
+
+
+def canonical_json(config: dict) -> bytes:
+    return json.dumps(config, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def config_hash(config: dict) -> str:
+    return hashlib.sha256(canonical_json(config)).hexdigest()
+
+
+def encode_blob(raw: bytes, compression: str = "gzip", min_bytes: int = 1024) -> tuple[str, bytes]:
+    if len(raw) < min_bytes or compression == "none":
+        return "identity", raw
+    if compression == "zstd" and zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=9).compress(raw)
+    return "gzip", gzip.compress(raw, compresslevel=6, mtime=0)
+
+
+def decode_blob(encoding: str, data: bytes) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("config blob is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+class BlobLRU:
+    """LRU of values derived from immutable blobs, such as decoded documents by
+    hash. Entries never go stale, so there is no invalidation. Callers must not
+    mutate the values."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._items: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            if len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+decoded_configs = BlobLRU(settings.config_blob_cache_max)
+
+
+def put_config(db: Union[Session, Connection], config: dict) -> str:
+    """Store ``config`` unless an identical document already exists; return its hash."""
+    return put_configs(db, [config])[0]
+
+
+def put_configs(db: Union[Session, Connection], configs: list[dict]) -> list[str]:
+    """Hashes of ``configs`` in order, storing the missing documents with one multi-row insert."""
+    raws = [canonical_json(config) for config in configs]
+    digests = [hashlib.sha256(raw).hexdigest() for raw in raws]
+    unique = dict(zip(digests, raws))
+    existing = set(db.scalars(select(ConfigBlob.hash).where(ConfigBlob.hash.in_(unique))))
+    missing = []
+    for digest, raw in unique.items():
+        if digest not in existing:
+            encoding, data = encode_blob(raw, settings.config_blob_compression, settings.config_blob_compress_min_bytes)
+            missing.append({"hash": digest, "encoding": encoding, "size": len(raw), "data": data})
+    if missing:
+        bind = db if isinstance(db, Connection) else db.get_bind()
+        dialect = postgresql if bind.dialect.name == "postgresql" else sqlite
+        # Another transaction may store the same document concurrently.
+        db.execute(dialect.insert(ConfigBlob).values(missing).on_conflict_do_nothing(index_elements=["hash"]))
+    return digests
+
+
+def load_config(db: Session, digest: Optional[str]) -> dict:
+    if digest is None:
+        return {}
+    config = decoded_configs.get(digest)
+    if config is None:
+        blob = db.execute(select(ConfigBlob.encoding, ConfigBlob.data).where(ConfigBlob.hash == digest)).one()
+        config = json.loads(decode_blob(blob.encoding, blob.data))
+        decoded_configs.put(digest, config)
+    return config
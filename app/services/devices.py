@@ -1,10 +1,28 @@
+from collections.abc import Iterable
 from datetime import datetime, timezone
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import event, select, update
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
+from app.db.session import SessionLocal
 from app.models import Device, DeviceEvictionPolicy, User
+from app.services.auth_cache import LastUsedBuffer, TTLCache
+
+settings = get_settings()
+
+# user_id -> {device_hash: device_id} for active devices, oldest first.
+active_devices = TTLCache(settings.device_cache_ttl_seconds, max_entries=settings.device_cache_max_users)
+device_last_seen = LastUsedBuffer(
+    settings.device_last_seen_flush_seconds, SessionLocal, column=Device.__table__.c.last_seen_at
+)
+CHANGED_USERS_KEY = "changed_device_users"
+
+
+def invalidate_devices_after_commit(session: Session, user_ids: Iterable[str]) -> None:
+    """For Core UPDATEs of users or devices, which the flush hook below does not see."""
+    session.info.setdefault(CHANGED_USERS_KEY, set()).update(user_ids)
 
 
 def register_device(db: Session, user: User, device_hash: str) -> Device:
@@ -36,9 +54,66 @@ def register_device(db: Session, user: User, device_hash: str) -> Device:
     return device
 
 
+def _active_device_ids(db: Session, user_id: str) -> dict[str, str]:
+    devices = active_devices.get(user_id)
+    if devices is None:
+        rows = db.execute(
+            select(Device.device_hash, Device.id)
+            .where(Device.user_id == user_id, Device.is_active.is_(True))
+            .order_by(Device.first_seen_at.asc())
+        ).all()
+        devices = {device_hash: device_id for device_hash, device_id in rows}
+        active_devices.put(user_id, devices)
+    return devices
+
+
+def touch_device(db: Session, user: User, device_hash: str) -> None:
+    """HWID check for the usage path.
+
+    Known devices are answered from ``active_devices`` and only queue a
+    ``last_seen_at`` stamp for the background flush; this runs on the event
+    loop through ``run_sync``, so it must not touch the sync engine. A new
+    device is admitted, or the oldest one evicted, against the cached set; the
+    resulting writes join the caller's transaction instead of committing here.
+    """
+    now = datetime.now(timezone.utc)
+    devices = _active_device_ids(db, user.id)
+    device_id = devices.get(device_hash)
+    if device_id is not None:
+        device_last_seen.touch(device_id, now)
+        return
+
+    if user.max_devices > 0 and len(devices) >= user.max_devices:
+        if user.device_eviction_policy == DeviceEvictionPolicy.reject:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="max_devices_reached")
+        oldest_id = next(iter(devices.values()))
+        db.execute(update(Device).where(Device.id == oldest_id).values(is_active=False))
+    db.add(Device(user_id=user.id, device_hash=device_hash, first_seen_at=now, last_seen_at=now, is_active=True))
+
+
 def reset_devices(db: Session, user: User) -> int:
     devices = db.scalars(select(Device).where(Device.user_id == user.id, Device.is_active.is_(True))).all()
     for device in devices:
         device.is_active = False
     db.commit()
     return len(devices)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_device_users(session: Session, _flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Device):
+            session.info.setdefault(CHANGED_USERS_KEY, set()).add(obj.user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_device_users(session: Session) -> None:
+    # After commit, so a concurrent reload cannot cache the pre-change set.
+    for user_id in session.info.pop(CHANGED_USERS_KEY, ()):
+        active_devices.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changed_device_users(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(CHANGED_USERS_KEY, None)
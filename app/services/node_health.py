@@ -0,0 +1,147 @@
+"""Cached server -> node health, for filtering subscription endpoints.
+
+The map is loaded in one query and then kept current from committed Node
+changes, which covers agent heartbeats and apply results as well as admin
+actions such as the offline check or a desired-config push. A periodic full
+reload picks up changes committed by other workers.
+
+Liveness comes from the shared ``Node.last_seen_at`` rather than from the
+heartbeats one worker happens to receive, so every worker agrees on which
+nodes are silent. Keep ``NODE_HEALTH_REFRESH_SECONDS`` well below
+``NODE_OFFLINE_AFTER_SECONDS``.
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import Node, NodeStatus
+
+settings = get_settings()
+
+CHANGED_NODES_KEY = "changed_node_health"
+RELOAD_KEY = "reload_node_health"
+# Severity from which a node is left out of subscriptions; below it, it is only ranked lower.
+UNHEALTHY_SEVERITY = 2
+
+
+@dataclass(frozen=True)
+class NodeHealth:
+    status: NodeStatus
+    applied_config_revision: int
+    desired_config_revision: int
+    last_seen_at: Optional[datetime] = None
+
+    @property
+    def severity(self) -> int:
+        """0 healthy, 1 config not applied yet, 2 apply error, 3 offline."""
+        if self.status == NodeStatus.offline:
+            return 3
+        if self.status == NodeStatus.error:
+            return 2
+        if self.applied_config_revision < self.desired_config_revision:
+            return 1
+        return 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.severity == 0
+
+    def silent_for(self, now: datetime) -> Optional[float]:
+        """Seconds since the node was last seen; None if it never was."""
+        if self.last_seen_at is None:
+            return None
+        # SQLite hands back naive UTC timestamps.
+        last_seen_at = self.last_seen_at if self.last_seen_at.tzinfo else self.last_seen_at.replace(tzinfo=timezone.utc)
+        return (now - last_seen_at).total_seconds()
+
+    @classmethod
+    def from_node(cls, node: Node) -> "NodeHealth":
+        return cls(node.status, node.applied_config_revision, node.desired_config_revision, node.last_seen_at)
+
+
+class NodeHealthMap:
+    def __init__(self, refresh_seconds: float, offline_after_seconds: float) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.offline_after_seconds = offline_after_seconds
+        self._health: dict[str, NodeHealth] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._health)
+
+    def refresh_if_stale(self, db: Session) -> None:
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        rows = db.execute(
+            select(
+                Node.server_id, Node.status, Node.applied_config_revision, Node.desired_config_revision, Node.last_seen_at
+            )
+        ).all()
+        with self._lock:
+            self._health = {row[0]: NodeHealth(*row[1:]) for row in rows}
+            self._loaded_at = time.monotonic()
+
+    def severity(self, server_id: str) -> int:
+        # A server without a node is not agent-managed; nothing says it is down.
+        health = self._health.get(server_id)
+        return 0 if health is None else health.severity
+
+    def is_silent(self, server_id: str, now: Optional[datetime] = None) -> bool:
+        """No heartbeat or report for ``offline_after_seconds``; a node never seen is not silent."""
+        health = self._health.get(server_id)
+        if health is None:
+            return False
+        silent_for = health.silent_for(now or datetime.now(timezone.utc))
+        return silent_for is not None and silent_for > self.offline_after_seconds
+
+    def update(self, server_id: str, health: Optional[NodeHealth]) -> None:
+        with self._lock:
+            if health is None:
+                self._health.pop(server_id, None)
+            else:
+                self._health[server_id] = health
+
+    def clear(self) -> None:
+        with self._lock:
+            self._health.clear()
+            self._loaded_at = None
+
+
+node_health = NodeHealthMap(settings.node_health_refresh_seconds, settings.node_offline_after_seconds)
+
+
+def reload_after_commit(session: Session) -> None:
+    """For Core UPDATEs of nodes, which the flush hook below does not see."""
+    session.info[RELOAD_KEY] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_node_health(session: Session, _flush_context) -> None:
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Node):
+            session.info.setdefault(CHANGED_NODES_KEY, {})[obj.server_id] = NodeHealth.from_node(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Node):
+            session.info.setdefault(CHANGED_NODES_KEY, {})[obj.server_id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_node_health(session: Session) -> None:
+    if session.info.pop(RELOAD_KEY, False):
+        node_health.clear()
+    for server_id, health in session.info.pop(CHANGED_NODES_KEY, {}).items():
+        node_health.update(server_id, health)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_node_health(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(CHANGED_NODES_KEY, None)
+        session.info.pop(RELOAD_KEY, None)
@@ -0,0 +1,179 @@
+"""In-memory load model of every node, fed by agent telemetry.
+
+``report_usage`` feeds throughput and active users, and ``heartbeat`` feeds
+the optional CPU and connection gauges. Entries are keyed by server id, which
+is what squad selectors hand out, and are dropped when the server or its node
+is deleted. Each API worker keeps its own model from the reports it receives
+and uses it only for the saturation signal. Liveness needs every heartbeat,
+not one worker's share of them, so it comes from ``node_health`` instead.
+"""
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import register_gauge
+from app.models import Node, Server
+
+settings = get_settings()
+
+DELETED_SERVERS_KEY = "deleted_node_load_servers"
+
+
+@dataclass
+class NodeLoad:
+    bytes_per_sec: float = 0.0
+    active_users: float = 0.0
+    cpu_percent: Optional[float] = None
+    connections: Optional[int] = None
+    last_report_at: Optional[float] = None
+    # user_id -> last report, oldest first
+    users: OrderedDict[str, float] = field(default_factory=OrderedDict)
+
+
+class NodeLoadModel:
+    """EWMA throughput and active-user counts per server.
+
+    Throughput decays continuously: on each report the previous rate is
+    scaled by ``exp(-dt / tau)`` and the new bytes are added as ``bytes / tau``,
+    which is an EWMA of bytes/sec over irregular report intervals. The
+    active-user count is smoothed the same way from the number of distinct
+    users reported within ``user_window_seconds``.
+    """
+
+    def __init__(
+        self,
+        half_life_seconds: float = 60.0,
+        user_window_seconds: float = 300.0,
+        capacity_bytes_per_sec: float = 0,
+        capacity_users: int = 0,
+        capacity_connections: int = 0,
+        saturation_threshold: float = 0.9,
+    ) -> None:
+        self.tau = half_life_seconds / math.log(2)
+        self.user_window_seconds = user_window_seconds
+        self.capacity_bytes_per_sec = capacity_bytes_per_sec
+        self.capacity_users = capacity_users
+        self.capacity_connections = capacity_connections
+        self.saturation_threshold = saturation_threshold
+        self._nodes: dict[str, NodeLoad] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _decay(self, load: NodeLoad, now: float) -> float:
+        if load.last_report_at is None:
+            return 0.0
+        return math.exp(-max(now - load.last_report_at, 0.0) / self.tau)
+
+    def record_usage(self, server_id: str, user_id: str, bytes_used: int, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            load = self._nodes.setdefault(server_id, NodeLoad())
+            decay = self._decay(load, now)
+            load.bytes_per_sec = load.bytes_per_sec * decay + bytes_used / self.tau
+            load.users[user_id] = now
+            load.users.move_to_end(user_id)
+            while load.users and next(iter(load.users.values())) < now - self.user_window_seconds:
+                load.users.popitem(last=False)
+            load.active_users = load.active_users * decay + len(load.users) * (1 - decay)
+            load.last_report_at = now
+
+    def record_heartbeat(
+        self,
+        server_id: str,
+        cpu_percent: Optional[float] = None,
+        connections: Optional[int] = None,
+        now: Optional[float] = None,
+    ) -> None:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            load = self._nodes.setdefault(server_id, NodeLoad())
+            if cpu_percent is not None:
+                load.cpu_percent = cpu_percent
+            if connections is not None:
+                load.connections = connections
+
+    def forget(self, server_id: str) -> None:
+        with self._lock:
+            self._nodes.pop(server_id, None)
+
+    def utilisation(self, server_id: str, now: Optional[float] = None) -> float:
+        """Highest of the configured capacity ratios; 0 for an unknown node."""
+        load = self._nodes.get(server_id)
+        if load is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        ratios = [(load.cpu_percent or 0.0) / 100]
+        if self.capacity_bytes_per_sec > 0:
+            ratios.append(load.bytes_per_sec * self._decay(load, now) / self.capacity_bytes_per_sec)
+        if self.capacity_users > 0:
+            ratios.append(load.active_users * self._decay(load, now) / self.capacity_users)
+        if self.capacity_connections > 0 and load.connections is not None:
+            ratios.append(load.connections / self.capacity_connections)
+        return max(ratios)
+
+    def is_saturated(self, server_id: str, now: Optional[float] = None) -> bool:
+        return self.utilisation(server_id, now) >= self.saturation_threshold
+
+    def saturated_count(self) -> int:
+        return sum(self.is_saturated(server_id) for server_id in list(self._nodes))
+
+    def snapshot(self, now: Optional[float] = None) -> dict[str, dict]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            items = list(self._nodes.items())
+        return {
+            server_id: {
+                "bytes_per_sec": round(load.bytes_per_sec * self._decay(load, now), 2),
+                "active_users": round(load.active_users * self._decay(load, now), 2),
+                "cpu_percent": load.cpu_percent,
+                "connections": load.connections,
+                "utilisation": round(self.utilisation(server_id, now), 4),
+            }
+            for server_id, load in items
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._nodes.clear()
+
+
+node_load = NodeLoadModel(
+    half_life_seconds=settings.node_load_half_life_seconds,
+    user_window_seconds=settings.node_active_user_window_seconds,
+    capacity_bytes_per_sec=settings.node_capacity_bytes_per_sec,
+    capacity_users=settings.node_capacity_users,
+    capacity_connections=settings.node_capacity_connections,
+    saturation_threshold=settings.node_saturation_threshold,
+)
+register_gauge("node_load.tracked", lambda: len(node_load))
+register_gauge("node_load.saturated", node_load.saturated_count)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_deleted_servers(session: Session, _flush_context) -> None:
+    for obj in session.deleted:
+        if isinstance(obj, Server):
+            session.info.setdefault(DELETED_SERVERS_KEY, set()).add(obj.id)
+        elif isinstance(obj, Node):
+            session.info.setdefault(DELETED_SERVERS_KEY, set()).add(obj.server_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_deleted_servers(session: Session) -> None:
+    for server_id in session.info.pop(DELETED_SERVERS_KEY, ()):
+        node_load.forget(server_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _keep_rolled_back_servers(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(DELETED_SERVERS_KEY, None)
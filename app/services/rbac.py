@@ -3,17 +3,25 @@ from collections.abc import Callable
 from fastapi import Depends, HTTPException, status
 
 from app.services.auth import AuthContext, get_auth_context
+from app.services.scopes import has_scopes
+from app.services.scopes import registry as scope_registry
 
 
 def require_scopes(*required_scopes: str) -> Callable:
-    def checker(ctx: AuthContext = Depends(get_auth_context)) -> None:
-        if "*" in ctx.scopes:
-            return
-        missing = [scope for scope in required_scopes if scope not in ctx.scopes]
-        if missing:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail={"error": "insufficient_scope", "missing": missing},
-            )
+    # Interned once at route definition; the per-request check is two int ops.
+    # FastAPI caches get_auth_context per request, so a handler that also
+    # depends on it receives this same AuthContext instead of resolving it again.
+    required_mask = 0
+    for scope in required_scopes:
+        required_mask |= scope_registry.register(scope)
+
+    def checker(ctx: AuthContext = Depends(get_auth_context)) -> AuthContext:
+        if has_scopes(ctx.scope_mask, required_mask):
+            return ctx
+        missing = [scope for scope in required_scopes if not has_scopes(ctx.scope_mask, scope_registry.bit(scope))]
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={"error": "insufficient_scope", "missing": missing},
+        )
 
     return checker
@@ -0,0 +1,288 @@
+"""Fleet-wide desired-config pushes in staged waves.
+
+A rollout targets a set of nodes once, assigns them to a canary wave and a
+main wave, and pushes a wave with a handful of set-based statements: one
+multi-row revision insert, one executemany node update and one bulk status
+update. Agent apply results are tallied against the rollout; a wave whose
+failures exceed ``failure_threshold`` halts the rollout before the next wave
+is released, and a clean canary releases the rest automatically.
+
+The latest push to a node wins: any new desired revision marks that node's
+unapplied members of other in-progress rollouts ``superseded``, so those
+rollouts neither wait for an apply result that can no longer arrive nor
+later overwrite the newer config.
+"""
+import math
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import (
+    ConfigRevision,
+    Node,
+    NodeStatus,
+    Rollout,
+    RolloutNode,
+    RolloutNodeStatus,
+    RolloutStatus,
+    Server,
+)
+from app.services.audit import write_audit
+from app.services.config_render import render_template
+from app.services.config_store import put_configs
+from app.services.node_health import reload_after_commit
+from app.services.webhooks import enqueue_event
+
+
+def target_nodes(
+    db: Session,
+    squad_id: Optional[str] = None,
+    region: Optional[str] = None,
+    node_status: Optional[NodeStatus] = None,
+    node_ids: Optional[list[str]] = None,
+) -> list:
+    query = (
+        select(Node.id, Node.server_id, Server.host, Server.ip, Server.region, Server.provider, Server.squad_id)
+        .join(Server, Server.id == Node.server_id)
+        .order_by(Node.id)
+    )
+    if squad_id:
+        query = query.where(Server.squad_id == squad_id)
+    if region:
+        query = query.where(func.lower(Server.region) == region.lower())
+    if node_status:
+        query = query.where(Node.status == node_status)
+    if node_ids:
+        query = query.where(Node.id.in_(node_ids))
+    return db.execute(query).all()
+
+
+def start_rollout(
+    db: Session,
+    actor: str,
+    target: dict,
+    config: Optional[dict] = None,
+    template: Optional[dict] = None,
+    canary_percent: int = 0,
+    failure_threshold: float = 0.2,
+    auto_advance: bool = True,
+) -> Rollout:
+    nodes = target_nodes(db, **target)
+    if not nodes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="no_target_nodes")
+
+    if template is not None:
+        configs = [
+            render_template(
+                template,
+                {
+                    "node_id": row.id,
+                    "server_id": row.server_id,
+                    "host": row.host,
+                    "ip": row.ip,
+                    "region": row.region,
+                    "provider": row.provider,
+                    "squad_id": row.squad_id,
+                },
+            )
+            for row in nodes
+        ]
+        hashes = put_configs(db, configs)
+    else:
+        hashes = put_configs(db, [config or {}]) * len(nodes)
+
+    canary_size = math.ceil(len(nodes) * canary_percent / 100) if canary_percent else 0
+    waves = 2 if 0 < canary_size < len(nodes) else 1
+    rollout = Rollout(
+        target={key: (value.value if isinstance(value, NodeStatus) else value) for key, value in target.items() if value},
+        canary_percent=canary_percent,
+        failure_threshold=failure_threshold,
+        auto_advance=auto_advance,
+        waves=waves,
+        total_nodes=len(nodes),
+        created_by=actor,
+    )
+    db.add(rollout)
+    db.flush()
+    db.execute(
+        insert(RolloutNode),
+        [
+            {
+                "rollout_id": rollout.id,
+                "node_id": row.id,
+                "wave": 0 if waves == 1 or index < canary_size else 1,
+                "config_hash": digest,
+                "revision": 0,
+                "status": RolloutNodeStatus.pending,
+            }
+            for index, (row, digest) in enumerate(zip(nodes, hashes))
+        ],
+    )
+    push_wave(db, rollout, 0)
+    write_audit(
+        db,
+        actor,
+        "rollout.started",
+        "rollout",
+        rollout.id,
+        {"target": rollout.target, "nodes": len(nodes), "waves": waves, "distinct_configs": len(set(hashes))},
+    )
+    return rollout
+
+
+def push_wave(db: Session, rollout: Rollout, wave: int) -> int:
+    """Make ``wave``'s configs the desired ones on its nodes. Returns the node count."""
+    members = db.execute(
+        select(RolloutNode.node_id, RolloutNode.config_hash, Node.desired_config_revision)
+        .join(Node, Node.id == RolloutNode.node_id)
+        .where(
+            RolloutNode.rollout_id == rollout.id,
+            RolloutNode.wave == wave,
+            RolloutNode.status == RolloutNodeStatus.pending,
+        )
+        .with_for_update(of=Node)
+    ).all()
+    rollout.current_wave = wave
+    if not members:
+        return 0
+    pushes = [
+        {"row_id": node_id, "hash": config_hash, "revision": revision + 1}
+        for node_id, config_hash, revision in members
+    ]
+    db.execute(
+        insert(ConfigRevision),
+        [{"node_id": push["row_id"], "revision": push["revision"], "config_hash": push["hash"]} for push in pushes],
+    )
+    db.execute(
+        update(Node.__table__)
+        .where(Node.__table__.c.id == bindparam("row_id"))
+        .values(desired_config_revision=bindparam("revision"), desired_config_hash=bindparam("hash")),
+        pushes,
+    )
+    db.execute(
+        update(RolloutNode.__table__)
+        .where(
+            RolloutNode.__table__.c.rollout_id == rollout.id,
+            RolloutNode.__table__.c.node_id == bindparam("row_id"),
+        )
+        .values(revision=bindparam("revision"), status=RolloutNodeStatus.desired),
+        pushes,
+    )
+    reload_after_commit(db)
+    supersede_rollouts(db, [push["row_id"] for push in pushes], except_rollout_id=rollout.id)
+    return len(pushes)
+
+
+def supersede_rollouts(db: Session, node_ids: list[str], except_rollout_id: Optional[str] = None) -> int:
+    """Retire unapplied members on ``node_ids`` of in-progress rollouts after a newer push.
+
+    Call this whenever a node gets a new desired revision outside the rollout
+    that owns it. Returns the number of members superseded.
+    """
+    if not node_ids:
+        return 0
+    query = (
+        select(RolloutNode.rollout_id, RolloutNode.node_id)
+        .join(Rollout, Rollout.id == RolloutNode.rollout_id)
+        .where(
+            RolloutNode.node_id.in_(node_ids),
+            RolloutNode.status.in_([RolloutNodeStatus.pending, RolloutNodeStatus.desired]),
+            Rollout.status == RolloutStatus.in_progress,
+        )
+    )
+    if except_rollout_id:
+        query = query.where(RolloutNode.rollout_id != except_rollout_id)
+    members = db.execute(query).all()
+    if not members:
+        return 0
+    db.execute(
+        update(RolloutNode.__table__)
+        .where(
+            RolloutNode.__table__.c.rollout_id == bindparam("member_rollout_id"),
+            RolloutNode.__table__.c.node_id == bindparam("member_node_id"),
+        )
+        .values(status=RolloutNodeStatus.superseded),
+        [{"member_rollout_id": rollout_id, "member_node_id": node_id} for rollout_id, node_id in members],
+    )
+    for rollout_id in sorted({rollout_id for rollout_id, _ in members}):
+        settle_wave(db, db.get(Rollout, rollout_id, with_for_update=True))
+    return len(members)
+
+
+def wave_counts(db: Session, rollout_id: str) -> dict[int, dict[str, int]]:
+    rows = db.execute(
+        select(RolloutNode.wave, RolloutNode.status, func.count())
+        .where(RolloutNode.rollout_id == rollout_id)
+        .group_by(RolloutNode.wave, RolloutNode.status)
+    ).all()
+    counts: dict[int, dict[str, int]] = {}
+    for wave, node_status, count in rows:
+        counts.setdefault(wave, {item.value: 0 for item in RolloutNodeStatus})[node_status.value] = count
+    return counts
+
+
+def advance_rollout(db: Session, rollout: Rollout, actor: str) -> int:
+    if rollout.status != RolloutStatus.in_progress:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="rollout_not_in_progress")
+    if rollout.current_wave + 1 >= rollout.waves:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="rollout_has_no_next_wave")
+    pushed = push_wave(db, rollout, rollout.current_wave + 1)
+    write_audit(db, actor, "rollout.advanced", "rollout", rollout.id, {"wave": rollout.current_wave, "nodes": pushed})
+    settle_wave(db, rollout)
+    return pushed
+
+
+def record_apply_result(db: Session, node_id: str, revision: int, succeeded: bool) -> None:
+    """Tally an agent apply result against the rollout that pushed ``revision``, if any."""
+    member = db.scalar(
+        select(RolloutNode)
+        .join(Rollout, Rollout.id == RolloutNode.rollout_id)
+        .where(
+            RolloutNode.node_id == node_id,
+            RolloutNode.revision == revision,
+            RolloutNode.status == RolloutNodeStatus.desired,
+            Rollout.status == RolloutStatus.in_progress,
+        )
+    )
+    if member is None:
+        return
+    member.status = RolloutNodeStatus.applied if succeeded else RolloutNodeStatus.failed
+    db.flush()
+    settle_wave(db, db.get(Rollout, member.rollout_id, with_for_update=True))
+
+
+def settle_wave(db: Session, rollout: Rollout) -> None:
+    """Halt, advance or complete ``rollout`` once its current wave has no outstanding members.
+
+    Superseded members count neither as failures nor towards the wave size.
+    """
+    while rollout.status == RolloutStatus.in_progress:
+        counts = wave_counts(db, rollout.id).get(rollout.current_wave, {})
+        wave_size = sum(counts.values()) - counts.get(RolloutNodeStatus.superseded.value, 0)
+        failed = counts.get(RolloutNodeStatus.failed.value, 0)
+        if failed > rollout.failure_threshold * wave_size:
+            halt_rollout(db, rollout, f"wave {rollout.current_wave}: {failed}/{wave_size} nodes failed to apply")
+            return
+        if counts.get(RolloutNodeStatus.desired.value, 0):
+            return
+        if rollout.current_wave + 1 < rollout.waves:
+            if not rollout.auto_advance:
+                return
+            pushed = push_wave(db, rollout, rollout.current_wave + 1)
+            write_audit(db, "system", "rollout.advanced", "rollout", rollout.id, {"wave": rollout.current_wave, "nodes": pushed})
+            # Loop: a wave whose members were all superseded settles at once.
+            continue
+        rollout.status = RolloutStatus.completed
+        rollout.finished_at = datetime.now(timezone.utc)
+        write_audit(db, "system", "rollout.completed", "rollout", rollout.id, {"nodes": rollout.total_nodes})
+
+
+def halt_rollout(db: Session, rollout: Rollout, reason: str) -> None:
+    rollout.status = RolloutStatus.halted
+    rollout.halt_reason = reason[:255]
+    rollout.finished_at = datetime.now(timezone.utc)
+    write_audit(db, "system", "rollout.halted", "rollout", rollout.id, {"wave": rollout.current_wave, "reason": reason})
+    enqueue_event(db, "rollout.halted", {"rollout_id": rollout.id, "wave": rollout.current_wave, "reason": reason}, auto_commit=False)
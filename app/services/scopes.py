@@ -0,0 +1,67 @@
+from collections.abc import Iterable
+from functools import lru_cache
+from threading import Lock
+from typing import Optional
+
+WILDCARD = "*"
+
+
+class ScopeRegistry:
+    """Interns known scope names into bit positions so scope sets become plain ints.
+
+    Only ``register`` interns a name: routes register the scopes they require
+    and roles the scopes they grant. ``*`` always owns bit 0. Names from
+    tokens, API keys or ``X-Scopes`` that nothing registered have no bit, so
+    they grant nothing and cannot fill the registry.
+    """
+
+    def __init__(self, max_scopes: int = 4096) -> None:
+        self.max_scopes = max_scopes
+        self._bits: dict[str, int] = {}
+        self._names: list[str] = []
+        self._lock = Lock()
+        self.register(WILDCARD)
+
+    def register(self, scope: str) -> int:
+        bit = self._bits.get(scope)
+        if bit is not None:
+            return bit
+        with self._lock:
+            bit = self._bits.get(scope)
+            if bit is None:
+                if len(self._names) >= self.max_scopes:
+                    raise RuntimeError("scope registry is full")
+                bit = 1 << len(self._names)
+                self._bits[scope] = bit
+                self._names.append(scope)
+        return bit
+
+    def bit(self, scope: str) -> Optional[int]:
+        return self._bits.get(scope)
+
+    def mask(self, scopes: Iterable[str]) -> int:
+        """Mask of the registered names in ``scopes``; unknown names are ignored."""
+        mask = 0
+        for scope in scopes:
+            mask |= self._bits.get(scope, 0)
+        return mask
+
+    def names(self, mask: int) -> set[str]:
+        return {name for index, name in enumerate(self._names) if mask >> index & 1}
+
+
+registry = ScopeRegistry()
+WILDCARD_BIT = registry.register(WILDCARD)
+
+
+@lru_cache(maxsize=1024)
+def scope_mask(scopes: tuple[str, ...]) -> int:
+    """Memoised mask for a scope tuple; JWT claims repeat the same few tuples."""
+    return registry.mask(scopes)
+
+
+def has_scopes(mask: int, required_mask: Optional[int]) -> bool:
+    """``None`` stands for a required scope that was never registered, which nothing satisfies."""
+    if required_mask is None:
+        return False
+    return bool(mask & WILDCARD_BIT) or mask & required_mask == required_mask
@@ -0,0 +1,226 @@
+"""Per-squad endpoint selectors for ``Squad.selection_policy``.
+
+A selector is built once from a squad's active servers and then answers
+``select(k, region, start)`` in O(k): it never rescans or re-sorts the server
+list per request. Rotating policies take their starting offset from
+``next_start()``, once per request, so a caller that widens its window can
+call ``select`` again with the same ``start`` and get a longer prefix of the
+same order. Built selectors are cached per squad and dropped when a server
+or squad commit touches them.
+"""
+import itertools
+import random
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import Server, Squad, SquadSelectionPolicy
+from app.services.auth_cache import TTLCache
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class Candidate:
+    id: str
+    host: str
+    ip: str
+    region: str
+    provider: str
+    weight: int
+
+    @classmethod
+    def from_server(cls, server: Server) -> "Candidate":
+        return cls(server.id, server.host, server.ip, server.region, server.provider, server.weight)
+
+
+class Selector(ABC):
+    def __init__(self, candidates: Sequence[Candidate]) -> None:
+        self.candidates = tuple(candidates)
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def next_start(self) -> int:
+        """Starting offset for one request; only rotating policies use it."""
+        return 0
+
+    @abstractmethod
+    def select(self, k: int, region: Optional[str] = None, start: Optional[int] = None) -> list[Candidate]:
+        """Up to ``k`` distinct candidates in serving order."""
+
+
+class RandomSelector(Selector):
+    def select(self, k: int, region: Optional[str] = None, start: Optional[int] = None) -> list[Candidate]:
+        # random.sample picks k items without touching the rest of the population.
+        return random.sample(self.candidates, min(k, len(self.candidates)))
+
+
+class RoundRobinSelector(Selector):
+    """Each call starts one position after the previous one.
+
+    ``next()`` on ``itertools.count`` is atomic under the GIL, so concurrent
+    requests get distinct starting offsets without a lock.
+    """
+
+    def __init__(self, candidates: Sequence[Candidate]) -> None:
+        super().__init__(candidates)
+        self._cursor = itertools.count()
+
+    def next_start(self) -> int:
+        return next(self._cursor)
+
+    def select(self, k: int, region: Optional[str] = None, start: Optional[int] = None) -> list[Candidate]:
+        size = len(self.candidates)
+        if size == 0:
+            return []
+        start = (self.next_start() if start is None else start) % size
+        return [self.candidates[(start + offset) % size] for offset in range(min(k, size))]
+
+
+class WeightedSelector(Selector):
+    """Weighted order without replacement, drawn from a Vose alias table.
+
+    Each draw is O(1). Repeats are rejected, and after a bounded number of
+    misses the remaining slots are filled in descending weight order, so
+    ``select`` stays O(k) even when a few servers hold most of the weight.
+    Zero-weight servers are never drawn and only appear in that fill.
+    """
+
+    def __init__(self, candidates: Sequence[Candidate]) -> None:
+        super().__init__(candidates)
+        self._by_weight = sorted(self.candidates, key=lambda candidate: -candidate.weight)
+        weighted = [candidate for candidate in self.candidates if candidate.weight > 0]
+        self._drawable = weighted
+        self._probability, self._alias = self._build_alias_table([candidate.weight for candidate in weighted])
+
+    @staticmethod
+    def _build_alias_table(weights: list[int]) -> tuple[list[float], list[int]]:
+        size = len(weights)
+        total = sum(weights)
+        if size == 0:
+            return [], []
+        scaled = [weight * size / total for weight in weights]
+        probability, alias = [1.0] * size, list(range(size))
+        small = [index for index, value in enumerate(scaled) if value < 1]
+        large = [index for index, value in enumerate(scaled) if value >= 1]
+        while small and large:
+            low, high = small.pop(), large.pop()
+            probability[low], alias[low] = scaled[low], high
+            scaled[high] -= 1 - scaled[low]
+            (small if scaled[high] < 1 else large).append(high)
+        return probability, alias
+
+    def _draw(self) -> Candidate:
+        column = random.randrange(len(self._drawable))
+        index = column if random.random() < self._probability[column] else self._alias[column]
+        return self._drawable[index]
+
+    def select(self, k: int, region: Optional[str] = None, start: Optional[int] = None) -> list[Candidate]:
+        k = min(k, len(self.candidates))
+        chosen: dict[str, Candidate] = {}
+        misses = 0
+        while self._drawable and len(chosen) < min(k, len(self._drawable)) and misses < k // 2 + 8:
+            candidate = self._draw()
+            if candidate.id in chosen:
+                misses += 1
+            else:
+                chosen[candidate.id] = candidate
+        for candidate in self._by_weight:
+            if len(chosen) >= k:
+                break
+            chosen.setdefault(candidate.id, candidate)
+        return list(chosen.values())
+
+
+class GeoSelector(Selector):
+    """Servers in the client's region first, then the other regions.
+
+    Regions are indexed once, and each bucket rotates through its own
+    round-robin selector. A request without a region is served round-robin
+    over the whole squad.
+    """
+
+    def __init__(self, candidates: Sequence[Candidate]) -> None:
+        super().__init__(candidates)
+        buckets: dict[str, list[Candidate]] = {}
+        for candidate in self.candidates:
+            buckets.setdefault(candidate.region.lower(), []).append(candidate)
+        self._regions = {region: RoundRobinSelector(members) for region, members in buckets.items()}
+        self._all = RoundRobinSelector(self.candidates)
+        self._cursor = itertools.count()
+
+    def next_start(self) -> int:
+        return next(self._cursor)
+
+    def select(self, k: int, region: Optional[str] = None, start: Optional[int] = None) -> list[Candidate]:
+        if start is None:
+            start = self.next_start()
+        local = self._regions.get(region.lower()) if region else None
+        if local is None:
+            return self._all.select(k, start=start)
+        chosen = local.select(k, start=start)
+        for bucket in self._regions.values():
+            if len(chosen) >= k:
+                break
+            if bucket is not local:
+                chosen.extend(bucket.select(k - len(chosen), start=start))
+        return chosen
+
+
+SELECTORS: dict[SquadSelectionPolicy, type[Selector]] = {
+    SquadSelectionPolicy.random: RandomSelector,
+    SquadSelectionPolicy.weighted: WeightedSelector,
+    SquadSelectionPolicy.round_robin: RoundRobinSelector,
+    SquadSelectionPolicy.geo: GeoSelector,
+}
+
+# squad_id -> Selector over that squad's active servers
+squad_selectors = TTLCache(settings.selector_cache_ttl_seconds)
+CHANGED_SQUADS_KEY = "changed_selector_squads"
+
+
+def build_selector(policy: SquadSelectionPolicy, candidates: Sequence[Candidate]) -> Selector:
+    return SELECTORS.get(policy, RoundRobinSelector)(candidates)
+
+
+def selector_for_squad(db: Session, squad: Squad) -> Selector:
+    selector = squad_selectors.get(squad.id)
+    if selector is None:
+        servers = db.scalars(
+            select(Server).where(Server.squad_id == squad.id, Server.status == "active").order_by(Server.host)
+        ).all()
+        selector = build_selector(squad.selection_policy, [Candidate.from_server(server) for server in servers])
+        squad_selectors.put(squad.id, selector)
+    return selector
+
+
+def invalidate_selectors_after_commit(session: Session, squad_ids: Iterable[str]) -> None:
+    """For Core UPDATEs, which the flush hook below does not see."""
+    session.info.setdefault(CHANGED_SQUADS_KEY, set()).update(squad_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_squads(session: Session, _flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Server):
+            session.info.setdefault(CHANGED_SQUADS_KEY, set()).add(obj.squad_id)
+        elif isinstance(obj, Squad):
+            session.info.setdefault(CHANGED_SQUADS_KEY, set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_squads(session: Session) -> None:
+    for squad_id in session.info.pop(CHANGED_SQUADS_KEY, ()):
+        squad_selectors.invalidate(squad_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changed_squads(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(CHANGED_SQUADS_KEY, None)
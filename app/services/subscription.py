@@ -1,8 +1,17 @@
+from typing import Optional
+
 from fastapi import HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.models import Server, Squad, SubscriptionAlias, User
+from app.core.config import get_settings
+from app.models import Squad, SubscriptionAlias, User
+from app.services.config_render import renders_from_profiles
+from app.services.node_health import UNHEALTHY_SEVERITY, node_health
+from app.services.node_load import node_load
+from app.services.selection import Candidate, Selector, selector_for_squad
+
+settings = get_settings()
 
 
 def resolve_user_by_subscription_token(db: Session, token: str) -> User:
@@ -20,7 +29,82 @@ def resolve_user_by_subscription_token(db: Session, token: str) -> User:
     return user
 
 
-def build_subscription_payload(db: Session, user: User) -> dict:
+def rank_endpoints(selector: Selector, k: int, region: Optional[str] = None) -> tuple[list[Candidate], list[Candidate]]:
+    """Split the squad into healthy endpoints in serving order and unhealthy ones, worst last.
+
+    Only the selector's top ``k`` are looked at first. When health or load
+    demotions leave fewer than ``k`` ready servers the window doubles, up to
+    the whole squad, so a request stays O(k) unless much of the squad is
+    demoted. The start offset is taken once per request, so round-robin
+    advances exactly one step however often the window widens.
+
+    Only nodes in ``error`` or ``offline`` count as unhealthy. The rest keep
+    policy order, with saturated nodes, nodes still applying their desired
+    config and then silent nodes moved behind the others: a config push or
+    rollout wave must not empty the subscription while agents catch up.
+    """
+    start = selector.next_start()
+    window = max(k, 1)
+    while True:
+        ordered = selector.select(window, region, start)
+        ready, saturated, pending, silent, unhealthy = _partition(ordered)
+        if len(ready) >= k or window >= len(selector):
+            break
+        window = min(window * 2, len(selector))
+    unhealthy.sort(key=lambda server: node_health.severity(server.id))
+    return (ready + saturated + pending + silent)[:k], unhealthy
+
+
+def _partition(servers: list[Candidate]) -> tuple[list[Candidate], ...]:
+    ready, saturated, pending, silent, unhealthy = [], [], [], [], []
+    for server in servers:
+        severity = node_health.severity(server.id)
+        if severity >= UNHEALTHY_SEVERITY:
+            unhealthy.append(server)
+        elif node_health.is_silent(server.id):
+            silent.append(server)
+        elif severity:
+            pending.append(server)
+        elif node_load.is_saturated(server.id):
+            saturated.append(server)
+        else:
+            ready.append(server)
+    return ready, saturated, pending, silent, unhealthy
+
+
+def select_endpoints(db: Session, squad: Squad, k: Optional[int], region: Optional[str]) -> tuple[list, Optional[str]]:
+    """Healthy endpoints of ``squad``, topped up per ``Squad.fallback_policy`` when too few remain.
+
+    Returns ``(squad, server)`` pairs and the fallback that was used, if any.
+    ``none`` serves healthy endpoints only, ``degraded`` adds unhealthy ones
+    after them, and ``squad:<id>`` adds healthy endpoints of another squad.
+    A fallback squad whose node configs are rendered from protocol profiles
+    is skipped: those configs carry only its own members' credentials.
+    """
+    node_health.refresh_if_stale(db)
+    selector = selector_for_squad(db, squad)
+    k = k or settings.subscription_default_endpoints or len(selector)
+    healthy, unhealthy = rank_endpoints(selector, k, region)
+    chosen = [(squad, server) for server in healthy]
+    if len(healthy) >= min(k, settings.subscription_min_healthy_endpoints):
+        return chosen, None
+
+    policy = squad.fallback_policy or "none"
+    if policy == "degraded" and unhealthy:
+        return chosen + [(squad, server) for server in unhealthy[: k - len(chosen)]], policy
+    if policy.startswith("squad:"):
+        fallback = db.get(Squad, policy.removeprefix("squad:"))
+        if fallback is not None and fallback.id != squad.id and not renders_from_profiles(db, fallback):
+            extra, _ = rank_endpoints(selector_for_squad(db, fallback), k - len(chosen), region)
+            if extra:
+                return chosen + [(fallback, server) for server in extra], policy
+    return chosen, None
+
+
+def build_subscription_payload(
+    db: Session, user: User, limit: Optional[int] = None, region: Optional[str] = None
+) -> dict:
+    """Endpoints are ordered by the squad's selection policy, node health and load; ``limit`` keeps the top K."""
     if not user.squad_id:
         return {
             "user_uuid": user.uuid,
@@ -33,26 +117,27 @@ def build_subscription_payload(db: Session, user: User) -> dict:
     if not squad:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="squad_not_found")
 
-    servers = db.scalars(select(Server).where(Server.squad_id == squad.id, Server.status == "active")).all()
+    servers, fallback = select_endpoints(db, squad, limit, region)
     endpoints = [
         {
             "host": server.host,
             "ip": server.ip,
             "region": server.region,
             "provider": server.provider,
-            "protocols": squad.allowed_protocols,
+            "protocols": owner.allowed_protocols,
             "uris": {
-                "vless": f"vless://{user.vless_id}@{server.host}:443?encryption=none&flow=xtls-rprx-vision#{squad.name}",
-                "awg2": f"awg2://{user.uuid}@{server.host}:51820#{squad.name}",
+                "vless": f"vless://{user.vless_id}@{server.host}:443?encryption=none&flow=xtls-rprx-vision#{owner.name}",
+                "awg2": f"awg2://{user.uuid}@{server.host}:51820#{owner.name}",
             },
         }
-        for server in servers
+        for owner, server in servers
     ]
 
     return {
         "user_uuid": user.uuid,
         "short_id": user.short_id,
         "selection_policy": squad.selection_policy.value,
+        "fallback_used": fallback,
         "subscription_url": f"/api/v1/subscriptions/{user.subscription_token}",
         "endpoints": endpoints,
     }
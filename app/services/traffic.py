@@ -6,7 +6,8 @@ from sqlalchemy.orm import Session
 
 from app.models import Node, NodeStatus, NodeUsage, User, UserStatus
 from app.services.audit import write_audit
-from app.services.devices import register_device
+from app.services.devices import touch_device
+from app.services.node_load import node_load
 from app.services.webhooks import enqueue_event
 
 
@@ -24,9 +25,9 @@ def report_usage(
     if user.strict_bind:
         if not device_hash:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="device_hash_required")
-        register_device(db, user, device_hash)
+        touch_device(db, user, device_hash)
     elif device_hash:
-        register_device(db, user, device_hash)
+        touch_device(db, user, device_hash)
 
     usage = NodeUsage(node_id=node.id, user_id=user.id, bytes_used=bytes_used)
     user.traffic_used_bytes += bytes_used
@@ -50,4 +51,6 @@ def report_usage(
 
     node.status = NodeStatus.online
     db.add(usage)
+    server_id, user_id = node.server_id, user.id
     db.commit()
+    node_load.record_usage(server_id, user_id, bytes_used)
@@ -0,0 +1,186 @@
+"""Storage lifecycle for ``node_usage``.
+
+Raw reports land in ``node_usage``. On PostgreSQL that table is partitioned by
+day on ``reported_at`` with a DEFAULT partition as a safety net, so inserts are
+routed by the server and range queries only touch the days they ask for. SQLite
+has no partitioning; there the ``reported_at`` index does the pruning and
+expiry is a range DELETE.
+
+Rows older than ``usage_compact_after_days`` are summed into
+``node_usage_hourly`` and removed (whole partitions are dropped on PostgreSQL).
+Hourly rows older than ``usage_retention_days`` are deleted. Readers go through
+``usage_rows`` and see both tiers as one relation.
+
+``usage_maintenance`` runs ``compact_usage`` every
+``usage_maintenance_interval_seconds`` from the app lifespan, which also keeps
+``usage_partition_days_ahead`` days of partitions in place.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Connection, delete, func, literal_column, select, text, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.session import SessionLocal
+from app.models import NodeUsage, NodeUsageHourly
+from app.services.background import PeriodicTask
+
+settings = get_settings()
+
+PARTITION_PREFIX = "node_usage_p"
+PARTITION_LOCK = "SELECT pg_advisory_xact_lock(hashtext('node_usage_partitions'))"
+DEFAULT_PARTITION = "node_usage_default"
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def existing_partitions(connection: Connection) -> dict[date, str]:
+    names = connection.scalars(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'node_usage'::regclass"
+        )
+    )
+    return {
+        datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date(): name
+        for name in names
+        if name.startswith(PARTITION_PREFIX)
+    }
+
+
+def ensure_partitions(connection: Connection, today: Optional[date] = None, days_ahead: Optional[int] = None) -> list[str]:
+    """Create daily partitions from yesterday to ``days_ahead`` days out. No-op outside PostgreSQL."""
+    if connection.dialect.name != "postgresql":
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    days_ahead = settings.usage_partition_days_ahead if days_ahead is None else days_ahead
+
+    # Serialise concurrent workers; the lock is released with the transaction.
+    connection.execute(text(PARTITION_LOCK))
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF node_usage DEFAULT"))
+    existing = existing_partitions(connection)
+    created = []
+    for offset in range(-1, days_ahead + 1):
+        day = today + timedelta(days=offset)
+        if day in existing:
+            continue
+        name = partition_name(day)
+        lower, upper = day_start(day), day_start(day + timedelta(days=1))
+        # Rows for this day may already sit in the default partition; attaching
+        # would fail on them, so move them into the new table first.
+        connection.execute(text(f"CREATE TABLE {name} (LIKE node_usage INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        connection.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE reported_at >= :lower AND reported_at < :upper "
+                f"RETURNING id, node_id, user_id, bytes_used, reported_at) "
+                f"INSERT INTO {name} (id, node_id, user_id, bytes_used, reported_at) SELECT * FROM moved"
+            ),
+            {"lower": lower, "upper": upper},
+        )
+        connection.execute(
+            text(
+                f"ALTER TABLE node_usage ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+        created.append(name)
+    return created
+
+
+def hour_bucket(dialect_name: str):
+    if dialect_name == "postgresql":
+        # Inline literal: a bound 'hour' in both SELECT and GROUP BY is two different parameters to PostgreSQL.
+        return func.date_trunc(literal_column("'hour'"), NodeUsage.reported_at)
+    # Same text layout SQLAlchemy uses for SQLite DATETIME, so comparisons stay lexical.
+    return func.strftime("%Y-%m-%d %H:00:00.000000", NodeUsage.reported_at)
+
+
+def _upsert(dialect_name: str):
+    return postgresql.insert(NodeUsageHourly) if dialect_name == "postgresql" else sqlite.insert(NodeUsageHourly)
+
+
+def compact_usage(db: Session, now: Optional[datetime] = None) -> dict:
+    """Roll raw rows past the compaction horizon into hourly aggregates and expire old aggregates."""
+    now = now or datetime.now(timezone.utc)
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        # Every worker runs this on a timer; two concurrent passes would add the same raw rows twice.
+        db.execute(text(PARTITION_LOCK))
+    cutoff = day_start(now.date() - timedelta(days=settings.usage_compact_after_days))
+    expire_before = day_start(now.date() - timedelta(days=settings.usage_retention_days))
+
+    hour = hour_bucket(dialect_name)
+    aggregates = (
+        select(
+            hour.label("hour"),
+            NodeUsage.node_id,
+            NodeUsage.user_id,
+            func.sum(NodeUsage.bytes_used),
+            func.count(),
+        )
+        .where(NodeUsage.reported_at < cutoff)
+        .group_by(hour, NodeUsage.node_id, NodeUsage.user_id)
+    )
+    statement = _upsert(dialect_name).from_select(["hour", "node_id", "user_id", "bytes_used", "reports"], aggregates)
+    statement = statement.on_conflict_do_update(
+        index_elements=["hour", "node_id", "user_id"],
+        set_={
+            "bytes_used": NodeUsageHourly.bytes_used + statement.excluded.bytes_used,
+            "reports": NodeUsageHourly.reports + statement.excluded.reports,
+        },
+    )
+    compacted_groups = db.execute(statement).rowcount
+
+    dropped = []
+    if dialect_name == "postgresql":
+        connection = db.connection()
+        for day, name in sorted(existing_partitions(connection).items()):
+            if day_start(day + timedelta(days=1)) <= cutoff:
+                connection.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+    # Whatever is left below the cutoff: the default partition on PostgreSQL, the whole table on SQLite.
+    deleted_rows = db.execute(delete(NodeUsage).where(NodeUsage.reported_at < cutoff)).rowcount
+    expired_hours = db.execute(delete(NodeUsageHourly).where(NodeUsageHourly.hour < expire_before)).rowcount
+    created = ensure_partitions(db.connection(), today=now.date())
+    db.commit()
+    return {
+        "compacted_before": cutoff.isoformat(),
+        "hourly_groups_written": compacted_groups,
+        "raw_rows_deleted": deleted_rows,
+        "partitions_dropped": dropped,
+        "partitions_created": created,
+        "hourly_rows_expired": expired_hours,
+    }
+
+
+def run_usage_maintenance() -> dict:
+    with SessionLocal() as db:
+        return compact_usage(db)
+
+
+usage_maintenance = PeriodicTask("usage maintenance", run_usage_maintenance, settings.usage_maintenance_interval_seconds)
+
+
+def usage_rows(since: Optional[datetime] = None):
+    """Raw and hourly usage as one ``(reported_at, node_id, user_id, bytes_used)`` subquery."""
+    raw = select(NodeUsage.reported_at, NodeUsage.node_id, NodeUsage.user_id, NodeUsage.bytes_used)
+    hourly = select(
+        NodeUsageHourly.hour.label("reported_at"),
+        NodeUsageHourly.node_id,
+        NodeUsageHourly.user_id,
+        NodeUsageHourly.bytes_used,
+    )
+    if since is not None:
+        # Filter inside each branch so the planner prunes partitions and uses the hour key.
+        raw = raw.where(NodeUsage.reported_at >= since)
+        hourly = hourly.where(NodeUsageHourly.hour >= since)
+    return union_all(raw, hourly).subquery("usage")
+
@@ -0,0 +1,295 @@
+"""Squad membership change feed for node agents.
+
+Every committed change to who may connect through a squad is appended to
+``user_changes``: ``add`` when a user joins or becomes active, ``remove`` when
+they leave, are blocked, expire or are deleted, and ``update`` when an active
+member's credentials rotate. Entries are written from a ``before_flush`` hook,
+so they commit atomically with the user change whatever code path made it.
+
+An entry's global, monotonic ``seq`` is assigned after it commits, by the
+sequencer task, in the order the sequencer sees entries committed. Insert-time
+ids are not enough: a transaction holding a lower id can commit after an agent
+has already read past a higher one. The sequencer numbers only committed rows
+and serialises on an advisory lock, so every seq up to the feed head is
+visible once the head is.
+
+Agents poll with ``since=<seq>`` and get the ops for their node's squad,
+collapsed to the latest op per user. An agent that is new, behind the
+compacted part of the feed, or more than ``USER_FEED_MAX_DELTA`` ops behind
+gets a full snapshot of the squad's active users instead.
+
+The feed also drives config rendering: ``user_feed_renderer`` re-renders the
+nodes of every squad with newly numbered entries, so nodes whose configs come
+from protocol profiles pick up membership changes without an operator render.
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import bindparam, delete, event, func, insert, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.session import SessionLocal
+from app.models import User, UserChange, UserChangeOp, UserStatus
+from app.services.audit import write_audit
+from app.services.background import PeriodicTask
+from app.services.config_render import render_nodes
+from app.services.rollouts import supersede_rollouts
+
+settings = get_settings()
+
+CREDENTIAL_FIELDS = ("uuid", "vless_id", "short_id")
+SEQUENCE_LOCK = "SELECT pg_advisory_xact_lock(hashtext('user_changes_seq'))"
+UNSEQUENCED_KEY = "unsequenced_user_changes"
+
+
+def _previous(state, attribute: str):
+    history = state.attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.object, attribute)
+
+
+def membership_changes(
+    user_id: str,
+    old_squad: Optional[str],
+    old_status: Optional[UserStatus],
+    old_credentials: dict,
+    new_squad: Optional[str],
+    new_status: Optional[UserStatus],
+    new_credentials: dict,
+) -> list[dict]:
+    """Feed entries for one user moving from the old state to the new one."""
+    old_member = old_squad is not None and old_status == UserStatus.active
+    new_member = new_squad is not None and new_status == UserStatus.active
+    changes = []
+    if old_member and (not new_member or old_squad != new_squad):
+        changes.append({"squad_id": old_squad, "user_id": user_id, "op": UserChangeOp.remove, "credentials": old_credentials})
+    if new_member and (not old_member or old_squad != new_squad):
+        changes.append({"squad_id": new_squad, "user_id": user_id, "op": UserChangeOp.add, "credentials": new_credentials})
+    elif new_member and old_credentials != new_credentials:
+        changes.append(
+            {
+                "squad_id": new_squad,
+                "user_id": user_id,
+                "op": UserChangeOp.update,
+                "credentials": {**new_credentials, "previous": old_credentials},
+            }
+        )
+    return changes
+
+
+def record_user_changes(db: Session, changes: list[dict]) -> None:
+    """Append entries computed by ``membership_changes`` for Core UPDATEs, which the flush hook does not see."""
+    if changes:
+        db.execute(insert(UserChange), changes)
+        db.info[UNSEQUENCED_KEY] = True
+
+
+def _changes_for(user: User, is_new: bool = False, is_deleted: bool = False) -> list[dict]:
+    state = inspect(user)
+    # A pending insert has no status until the column default applies.
+    new_status = UserStatus.active if user.status is None else user.status
+    new_credentials = {field: getattr(user, field) for field in CREDENTIAL_FIELDS}
+    if is_new:
+        return membership_changes(user.id, None, None, new_credentials, user.squad_id, new_status, new_credentials)
+    old_credentials = {field: _previous(state, field) for field in CREDENTIAL_FIELDS}
+    return membership_changes(
+        user.id,
+        _previous(state, "squad_id"),
+        _previous(state, "status"),
+        old_credentials,
+        None if is_deleted else user.squad_id,
+        new_status,
+        new_credentials,
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _record_user_changes(session: Session, _flush_context, _instances) -> None:
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, User):
+            if obj.id is None:
+                # The feed entry needs the id before the insert assigns it.
+                obj.id = str(uuid.uuid4())
+            changes.extend(_changes_for(obj, is_new=True))
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            changes.extend(_changes_for(obj))
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changes.extend(_changes_for(obj, is_deleted=True))
+    if changes:
+        session.add_all(UserChange(**change) for change in changes)
+        session.info[UNSEQUENCED_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_sequencer(session: Session) -> None:
+    if session.info.pop(UNSEQUENCED_KEY, False):
+        user_feed_sequencer.wake()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_unsequenced(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(UNSEQUENCED_KEY, None)
+
+
+def assign_seqs(db: Session) -> int:
+    """Number committed entries that have no seq yet, after the current head. Returns the count."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(SEQUENCE_LOCK))
+    head = db.scalar(select(func.max(UserChange.seq))) or 0
+    ids = db.scalars(select(UserChange.id).where(UserChange.seq.is_(None)).order_by(UserChange.id)).all()
+    if ids:
+        table = UserChange.__table__
+        db.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values(seq=bindparam("position")),
+            [{"row_id": row_id, "position": head + offset} for offset, row_id in enumerate(ids, start=1)],
+        )
+    return len(ids)
+
+
+def run_user_feed_sequencer() -> int:
+    with SessionLocal() as db:
+        assigned = assign_seqs(db)
+        db.commit()
+    if assigned:
+        user_feed_renderer.wake()
+    return assigned
+
+
+def _entry(change: UserChange) -> dict:
+    return {"seq": change.seq, "op": change.op.value, "user_id": change.user_id, **change.credentials}
+
+
+def _collapse(changes: list[UserChange]) -> list[dict]:
+    """Latest op per user, in seq order. An add followed by updates stays an add."""
+    latest: dict[str, dict] = {}
+    for change in changes:
+        entry = _entry(change)
+        earlier = latest.pop(change.user_id, None)
+        if earlier is not None and change.op == UserChangeOp.update and earlier["op"] == UserChangeOp.add.value:
+            entry["op"] = UserChangeOp.add.value
+            entry.pop("previous", None)
+        latest[change.user_id] = entry
+    return list(latest.values())
+
+
+def feed_head(db: Session) -> int:
+    """Highest assigned seq; every entry up to it is committed and numbered."""
+    return db.scalar(select(func.max(UserChange.seq))) or 0
+
+
+def squad_snapshot(db: Session, squad_id: Optional[str], head: int) -> dict:
+    users = []
+    if squad_id:
+        rows = db.execute(
+            select(User.id, User.uuid, User.vless_id, User.short_id)
+            .where(User.squad_id == squad_id, User.status == UserStatus.active)
+            .order_by(User.id)
+        ).all()
+        users = [{"user_id": row.id, "uuid": row.uuid, "vless_id": row.vless_id, "short_id": row.short_id} for row in rows]
+    return {"mode": "snapshot", "seq": head, "users": users}
+
+
+def squad_changes(db: Session, squad_id: Optional[str], since: int) -> dict:
+    # Read the head first: a snapshot taken after it may already contain
+    # later changes, which are idempotent when replayed.
+    head = feed_head(db)
+    if since <= 0 or squad_id is None:
+        return squad_snapshot(db, squad_id, head)
+    oldest = db.scalar(select(func.min(UserChange.seq))) or 0
+    if since < oldest - 1:
+        return squad_snapshot(db, squad_id, head)
+    changes = db.scalars(
+        select(UserChange)
+        .where(UserChange.squad_id == squad_id, UserChange.seq > since, UserChange.seq <= head)
+        .order_by(UserChange.seq)
+        .limit(settings.user_feed_max_delta + 1)
+    ).all()
+    if len(changes) > settings.user_feed_max_delta:
+        return squad_snapshot(db, squad_id, head)
+    return {"mode": "delta", "seq": max(head, since), "changes": _collapse(changes)}
+
+
+def compact_user_changes(db: Session, now: Optional[datetime] = None) -> int:
+    """Drop entries past USER_FEED_RETENTION_HOURS, always keeping the newest.
+
+    Deletion is by age, so the feed stays a contiguous suffix of seq; agents
+    behind its start are answered with snapshots. Entries without a seq yet
+    are never dropped.
+    """
+    now = now or datetime.now(timezone.utc)
+    newest = db.scalar(select(func.max(UserChange.seq)))
+    if newest is None:
+        return 0
+    cutoff = now - timedelta(hours=settings.user_feed_retention_hours)
+    boundary = db.scalar(select(func.min(UserChange.seq)).where(UserChange.created_at > cutoff)) or newest
+    return db.execute(delete(UserChange).where(UserChange.seq < boundary)).rowcount
+
+
+def run_user_feed_compaction() -> int:
+    with SessionLocal() as db:
+        deleted = compact_user_changes(db)
+        db.commit()
+        return deleted
+
+
+user_feed_sequencer = PeriodicTask(
+    "user feed sequencer", run_user_feed_sequencer, settings.user_feed_sequence_interval_seconds
+)
+user_feed_compaction = PeriodicTask(
+    "user feed compaction", run_user_feed_compaction, settings.user_feed_compact_interval_seconds
+)
+
+
+class FeedRenderer:
+    """Re-renders the squads named by feed entries past the last seq it rendered.
+
+    Each squad renders in its own transaction. A worker starts from the oldest
+    retained entry, so changes committed just before a restart still render;
+    nodes whose inputs did not move cost only a digest comparison.
+    """
+
+    def __init__(self) -> None:
+        self.rendered_through = 0
+
+    def clear(self) -> None:
+        self.rendered_through = 0
+
+    def run(self) -> int:
+        with SessionLocal() as db:
+            head = feed_head(db)
+            squad_ids = db.scalars(
+                select(UserChange.squad_id)
+                .where(UserChange.seq > self.rendered_through, UserChange.seq <= head)
+                .distinct()
+                .order_by(UserChange.squad_id)
+            ).all()
+        changed = 0
+        for squad_id in squad_ids:
+            with SessionLocal() as db:
+                result = render_nodes(db, squad_id=squad_id)
+                supersede_rollouts(db, result["changed_node_ids"])
+                if result["changed"]:
+                    write_audit(
+                        db,
+                        "system",
+                        "node.configs_rendered",
+                        "node",
+                        squad_id,
+                        {"changed": result["changed"], "rendered": result["rendered"]},
+                    )
+                db.commit()
+            changed += result["changed"]
+        # Only after every squad rendered: a failed pass retries the same entries.
+        self.rendered_through = head
+        return changed
+
+
+feed_renderer = FeedRenderer()
+user_feed_renderer = PeriodicTask("user feed renderer", feed_renderer.run, settings.user_feed_render_interval_seconds)
@@ -4,7 +4,7 @@ import json
 from datetime import datetime, timezone
 
 import httpx
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
@@ -29,6 +29,21 @@ def enqueue_event(db: Session, event: str, payload: dict, auto_commit: bool = Tr
     return deliveries
 
 
+def enqueue_events(db: Session, event: str, payloads: list[dict]) -> int:
+    """``enqueue_event`` for many payloads in one multi-row insert, without committing. Returns the delivery count."""
+    endpoint_ids = [
+        endpoint.id
+        for endpoint in db.scalars(
+            select(WebhookEndpoint).where(WebhookEndpoint.is_active.is_(True)).order_by(WebhookEndpoint.created_at.asc())
+        )
+        if not endpoint.events or event in endpoint.events
+    ]
+    rows = [{"endpoint_id": endpoint_id, "event": event, "payload": payload} for endpoint_id in endpoint_ids for payload in payloads]
+    if rows:
+        db.execute(insert(WebhookDelivery), rows)
+    return len(rows)
+
+
 def _signature(secret: str, body: bytes) -> str:
     digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
     return f"sha256={digest}"
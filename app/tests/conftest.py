@@ -1,11 +1,23 @@
 import os
+import tempfile
 
-os.environ["DATABASE_URL"] = "sqlite+pysqlite:///:memory:"
+# A file rather than :memory: so the sync and async engines see the same database.
+os.environ["DATABASE_URL"] = f"sqlite+pysqlite:///{tempfile.mkdtemp(prefix='pepoapple-test-')}/test.db"
 
 import pytest
 from fastapi.testclient import TestClient
 
+from app.core.rate_limit import rate_limiter
+from app.graphql.caching import response_cache
 from app.main import app
+from app.services.auth_cache import api_key_cache, principal_cache
+from app.services.config_patch import config_patches
+from app.services.config_store import decoded_configs
+from app.services.devices import active_devices
+from app.services.node_health import node_health
+from app.services.node_load import node_load
+from app.services.selection import squad_selectors
+from app.services.user_feed import feed_renderer
 from app.models import Base
 from app.db.session import engine
 
@@ -14,6 +26,17 @@ from app.db.session import engine
 def client() -> TestClient:
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    rate_limiter.memory_store.clear()
+    api_key_cache.clear()
+    principal_cache.clear()
+    response_cache.clear()
+    active_devices.clear()
+    squad_selectors.clear()
+    node_load.clear()
+    node_health.clear()
+    decoded_configs.clear()
+    config_patches.clear()
+    feed_renderer.clear()
     with TestClient(app) as test_client:
         yield test_client
 
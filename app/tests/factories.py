@@ -0,0 +1,37 @@
+import time
+import uuid
+
+from sqlalchemy import func, select
+
+from app.db.session import SessionLocal
+from app.models import UserChange
+
+
+def make_user_payload(**overrides):
+    base_uuid = overrides.pop("uuid", str(uuid.uuid4()))
+    payload = {
+        "uuid": base_uuid,
+        "vless_id": str(uuid.uuid4()),
+        "short_id": base_uuid.split("-")[0],
+        "squad_id": None,
+        "traffic_limit_bytes": 0,
+        "max_devices": 1,
+        "hwid_policy": "hash",
+        "strict_bind": True,
+        "device_eviction_policy": "reject",
+        "subscription_token": f"tok-{base_uuid.split('-')[0]}",
+        "external_identities": {},
+    }
+    payload.update(overrides)
+    return payload
+
+
+def wait_for_user_feed(timeout: float = 5) -> None:
+    """Wait until the lifespan's sequencer has numbered every committed feed entry."""
+    deadline = time.monotonic() + timeout
+    with SessionLocal() as db:
+        unsequenced = select(func.count()).select_from(UserChange).where(UserChange.seq.is_(None))
+        while db.scalar(unsequenced) and time.monotonic() < deadline:
+            time.sleep(0.02)
+            db.rollback()
+        assert db.scalar(unsequenced) == 0
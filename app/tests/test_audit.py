@@ -0,0 +1,128 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import StatementError
+
+from app.db.session import SessionLocal
+from app.models import AuditLog
+from app.services.audit import AuditWriter, audit_writer, write_audit
+
+
+def test_audit_records_are_batched_after_commit(client, admin_headers):
+    def audit_count(action):
+        with SessionLocal() as db:
+            return db.scalar(select(func.count()).select_from(AuditLog).where(AuditLog.action == action))
+
+    assert audit_writer.running
+    with SessionLocal() as db:
+        write_audit(db, "tester", "test.rolled_back", "user", "u-1")
+        db.rollback()
+        for index in range(3):
+            write_audit(db, "tester", "test.batched", "user", f"u-{index}")
+        db.commit()
+        write_audit(db, "tester", "test.durable", "order", "o-1", durable=True)
+        db.commit()
+
+    assert audit_count("test.durable") == 1
+    audit_writer.flush()
+    assert audit_count("test.batched") == 3
+    assert audit_count("test.rolled_back") == 0
+
+    metrics = client.get("/api/v1/metrics", headers=admin_headers).json()
+    assert metrics["audit.queue_depth"] == 0
+    assert metrics["audit.flush_latency_ms.count"] >= 1
+
+
+def test_audit_writer_never_flushes_inline_and_drops_poison_records(client):
+    def record(action, payload):
+        return {
+            "id": str(uuid.uuid4()),
+            "actor": "tester",
+            "action": action,
+            "entity_type": "user",
+            "entity_id": "u-1",
+            "payload": payload,
+            "created_at": datetime.now(timezone.utc),
+        }
+
+    writer = AuditWriter(SessionLocal, max_queue=2, max_attempts=2)
+    writer.submit([record("test.good", {}), record("test.poison", {"bad": {1, 2}}), record("test.good", {})])
+    assert len(writer) == 3
+
+    with pytest.raises(StatementError):
+        writer.flush()
+    assert len(writer) == 3
+    assert writer.flush() == 2
+    assert (len(writer), writer.dead_lettered) == (0, 1)
+    with SessionLocal() as db:
+        actions = db.scalars(select(AuditLog.action).where(AuditLog.actor == "tester")).all()
+    assert actions == ["test.good", "test.good"]
+
+
+def test_audit_log_keyset_pagination_and_filters(client, admin_headers):
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as db:
+        for index in range(5):
+            db.add(
+                AuditLog(
+                    actor="support" if index % 2 else "system",
+                    action="user.updated",
+                    entity_type="user",
+                    entity_id="user-x" if index < 3 else "user-y",
+                    payload={"field": f"status-{index}"},
+                    created_at=now - timedelta(days=index * 3),
+                )
+            )
+        db.commit()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/v1/audit/logs", params=params, headers=admin_headers).json()
+        seen.extend(item["payload"]["field"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"status-{index}" for index in range(5)]
+
+    last_week = client.get(
+        "/api/v1/audit/logs",
+        params={"entity_id": "user-x", "since": (now - timedelta(days=7)).isoformat()},
+        headers=admin_headers,
+    ).json()["items"]
+    assert [item["payload"]["field"] for item in last_week] == ["status-0", "status-1", "status-2"]
+
+    by_actor = client.get("/api/v1/audit/logs", params={"actor": "support"}, headers=admin_headers).json()["items"]
+    assert {item["payload"]["field"] for item in by_actor} == {"status-1", "status-3"}
+
+    contains = client.get("/api/v1/audit/logs", params={"payload": '{"field": "status-4"}'}, headers=admin_headers)
+    assert [item["entity_id"] for item in contains.json()["items"]] == ["user-y"]
+    assert client.get("/api/v1/audit/logs", params={"q": "status-3"}, headers=admin_headers).json()["items"][0]["actor"] == "support"
+    assert client.get("/api/v1/audit/logs", params={"cursor": "bogus"}, headers=admin_headers).status_code == 400
+
+    legacy = client.get("/api/v1/audit/logs", params={"limit": 2, "offset": 2}, headers=admin_headers).json()
+    assert [item["payload"]["field"] for item in legacy["items"]] == ["status-2", "status-3"]
+    assert legacy["next_cursor"]
+    both = client.get("/api/v1/audit/logs", params={"offset": 2, "cursor": legacy["next_cursor"]}, headers=admin_headers)
+    assert both.status_code == 400
+
+
+def test_audit_log_payload_filter_matches_json_values(client, admin_headers):
+    now = datetime.now(timezone.utc)
+    payloads = {"count-1": {"count": 1}, "count-str": {"count": "1"}, "true": {"count": True}, "null": {"count": None}}
+    with SessionLocal() as db:
+        for entity_id, payload in payloads.items():
+            db.add(AuditLog(action="test.typed", entity_type="test", entity_id=entity_id, payload=payload, created_at=now))
+        db.add(AuditLog(action="test.typed", entity_type="test", entity_id="missing", payload={}, created_at=now))
+        db.commit()
+
+    def matching(document):
+        response = client.get("/api/v1/audit/logs", params={"payload": document}, headers=admin_headers)
+        return [item["entity_id"] for item in response.json()["items"]]
+
+    assert matching('{"count": 1}') == ["count-1"]
+    assert matching('{"count": "1"}') == ["count-str"]
+    assert matching('{"count": true}') == ["true"]
+    assert matching('{"count": null}') == ["null"]
@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.db.session import SessionLocal
+from app.models import ApiKey, AuthPrincipal
+from app.services.auth_cache import LastUsedBuffer, api_key_last_used
+
+
+def test_api_key_cache_revocation_and_last_used_flush(client):
+    bootstrap = client.post("/api/v1/auth/bootstrap", json={"username": "root", "password": "secret123"})
+    bearer = {"Authorization": f"Bearer {bootstrap.json()['access_token']}"}
+    created = client.post("/api/v1/auth/api-keys", json={"name": "cached", "scopes": ["users.read"]}, headers=bearer)
+    api_key = created.json()["key"]
+
+    for _ in range(3):
+        assert client.get("/api/v1/auth/me", headers={"X-API-Key": api_key}).status_code == 200
+
+    # Requests only record the stamp; the lifespan task writes it.
+    with SessionLocal() as db:
+        assert db.get(ApiKey, created.json()["id"]).last_used_at is None
+    assert len(api_key_last_used) == 1
+    assert api_key_last_used.flush() == 1
+    with SessionLocal() as db:
+        assert db.get(ApiKey, created.json()["id"]).last_used_at is not None
+
+    revoke = client.post(f"/api/v1/auth/api-keys/{created.json()['id']}/revoke", headers=bearer)
+    assert revoke.status_code == 200
+    assert client.get("/api/v1/auth/me", headers={"X-API-Key": api_key}).status_code == 401
+
+
+def test_bearer_auth_uses_principal_cache_with_push_invalidation(client):
+    bootstrap = client.post("/api/v1/auth/bootstrap", json={"username": "root", "password": "secret123"})
+    bearer = {"Authorization": f"Bearer {bootstrap.json()['access_token']}"}
+    me = client.get("/api/v1/auth/me", headers=bearer)
+    assert me.status_code == 200
+
+    with SessionLocal() as db:
+        principal = db.get(AuthPrincipal, me.json()["principal_id"])
+        principal.refresh_token_version += 1
+        db.commit()
+    assert client.get("/api/v1/auth/me", headers=bearer).status_code == 401
+
+    login = client.post("/api/v1/auth/login", json={"username": "root", "password": "secret123"})
+    bearer = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert client.get("/api/v1/auth/me", headers=bearer).status_code == 200
+
+    with SessionLocal() as db:
+        db.get(AuthPrincipal, me.json()["principal_id"]).is_active = False
+        db.flush()
+        # A lookup between flush and commit caches the old row; the commit evicts it.
+        assert client.get("/api/v1/auth/me", headers=bearer).status_code == 200
+        db.commit()
+    assert client.get("/api/v1/auth/me", headers=bearer).status_code == 401
+
+
+def test_last_used_buffer_keeps_stamps_when_a_write_fails():
+    def unavailable():
+        raise ConnectionError("database unavailable")
+
+    buffer = LastUsedBuffer(60, unavailable)
+    buffer.touch("key-1", datetime(2026, 1, 1, tzinfo=timezone.utc))
+    with pytest.raises(ConnectionError):
+        buffer.flush()
+    assert len(buffer) == 1
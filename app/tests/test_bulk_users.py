@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.db.session import SessionLocal
+from app.models import AuditLog, BulkJobStatus, BulkUserJob, BulkUserOperation, User, UserStatus
+from app.services import bulk_users
+from app.services.audit import audit_writer
+from app.services.devices import active_devices
+from app.services.selection import squad_selectors
+from app.tests.factories import make_user_payload, wait_for_user_feed
+
+
+def test_bulk_user_operations_run_in_chunks_with_progress(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(bulk_users.settings, "bulk_user_chunk_size", 2)
+    squad = client.post("/api/v1/squads", json={"name": "BK", "allowed_protocols": ["VLESS"]}, headers=admin_headers).json()["id"]
+    other = client.post("/api/v1/squads", json={"name": "BK2", "allowed_protocols": ["VLESS"]}, headers=admin_headers).json()["id"]
+    server = client.post("/api/v1/servers", json={"host": "bulk-1", "squad_id": squad}, headers=admin_headers).json()
+    client.post("/api/v1/nodes", json={"server_id": server["id"], "node_token": "bulk-1"}, headers=admin_headers)
+    client.post(
+        "/api/v1/webhooks/endpoints",
+        json={"name": "bulk", "target_url": "http://127.0.0.1:9/hook", "secret": "abc", "events": ["user.blocked"]},
+        headers=admin_headers,
+    )
+    members = [client.post("/api/v1/users", json=make_user_payload(squad_id=squad), headers=admin_headers).json() for _ in range(5)]
+    bystander = client.post("/api/v1/users", json=make_user_payload(), headers=admin_headers).json()
+    wait_for_user_feed()
+    since = client.get("/agent/user-changes", params={"node_token": "bulk-1", "since": 0}).json()["seq"]
+
+    for payload, detail in (
+        ({"operation": "block"}, "bulk_target_required"),
+        ({"operation": "block", "user_ids": [bystander["id"]], "all_users": True}, "bulk_target_required"),
+        ({"operation": "explode", "all_users": True}, "invalid_operation"),
+        ({"operation": "update_limits", "all_users": True}, "traffic_limit_required"),
+        ({"operation": "block", "filter": {"status": "sleeping"}}, "invalid_status"),
+    ):
+        response = client.post("/api/v1/users/bulk", json=payload, headers=admin_headers)
+        assert (response.status_code, response.json()["detail"]) == (400, detail)
+
+    started = client.post("/api/v1/users/bulk", json={"operation": "block", "filter": {"squad_id": squad}}, headers=admin_headers)
+    assert started.status_code == 202, started.text
+    job = client.get(f"/api/v1/users/bulk/{started.json()['id']}", headers=admin_headers).json()
+    assert (job["status"], job["total"], job["processed"]) == ("completed", 5, 5)
+    listed = client.get("/api/v1/users", params={"status_filter": "blocked"}, headers=admin_headers).json()["items"]
+    assert sorted(user["id"] for user in listed) == sorted(user["id"] for user in members)
+    wait_for_user_feed()
+    delta = client.get("/agent/user-changes", params={"node_token": "bulk-1", "since": since}).json()
+    assert delta["mode"] == "delta"
+    assert sorted((item["op"], item["user_id"]) for item in delta["changes"]) == sorted(("remove", user["id"]) for user in members)
+    audit_writer.flush()
+    audits = client.get("/api/v1/audit/logs", params={"action": "user.blocked", "limit": 50}, headers=admin_headers).json()["items"]
+    assert len(audits) == 5 and {item["payload"]["bulk_job_id"] for item in audits} == {job["id"]}
+    deliveries = client.get("/api/v1/webhooks/deliveries", headers=admin_headers).json()
+    assert sum(item["event"] == "user.blocked" for item in deliveries) == 5
+
+    moved = client.post(
+        "/api/v1/users/bulk",
+        json={"operation": "assign_squad", "user_ids": [bystander["id"], members[0]["id"]], "squad_id": other},
+        headers=admin_headers,
+    )
+    assert moved.status_code == 202
+    assert client.get(f"/api/v1/users/bulk/{moved.json()['id']}", headers=admin_headers).json()["processed"] == 2
+    assert client.get(f"/api/v1/users/{bystander['id']}", headers=admin_headers).json()["squad_id"] == other
+    missing = client.post("/api/v1/users/bulk", json={"operation": "assign_squad", "all_users": True, "squad_id": "nope"}, headers=admin_headers)
+    assert missing.status_code == 404
+    assert client.get("/api/v1/users/bulk/nope", headers=admin_headers).status_code == 404
+
+
+
+def test_stale_bulk_jobs_resume_after_the_last_chunk_and_invalidate_caches(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(bulk_users.settings, "bulk_user_chunk_size", 2)
+    squad = client.post("/api/v1/squads", json={"name": "BS", "allowed_protocols": ["VLESS"]}, headers=admin_headers).json()["id"]
+    users = [client.post("/api/v1/users", json=make_user_payload(squad_id=squad), headers=admin_headers).json() for _ in range(5)]
+    # Chunks walk users in id order.
+    first = min(user["id"] for user in users)
+    active_devices.put(first, {})
+    squad_selectors.put(squad, object())
+
+    # A worker that committed one chunk and then went away.
+    with SessionLocal() as db:
+        job = bulk_users.start_bulk_job(db, "tester", BulkUserOperation.block, {"filter": {"squad_id": squad}}, {})
+        db.commit()
+        bulk_users.process_chunk(db, job)
+        job.updated_at = datetime.now(timezone.utc) - timedelta(seconds=bulk_users.settings.bulk_user_stale_after_seconds + 1)
+        db.commit()
+        job_id = job.id
+    assert active_devices.get(first) is None and squad_selectors.get(squad) is None
+
+    assert bulk_users.resume_stale_bulk_jobs() == [job_id]
+    assert bulk_users.resume_stale_bulk_jobs() == []
+    with SessionLocal() as db:
+        job = db.get(BulkUserJob, job_id)
+        assert (job.status, job.processed, job.total) == (BulkJobStatus.completed, 5, 5)
+        assert set(db.scalars(select(User.status).where(User.squad_id == squad))) == {UserStatus.blocked}
+    audit_writer.flush()
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count()).select_from(AuditLog).where(AuditLog.action == "user.blocked")) == 5
@@ -0,0 +1,24 @@
+from app.core.compression import COMPRESSORS, negotiate
+from app.tests.factories import make_user_payload
+
+
+def test_large_responses_are_compressed_with_negotiated_encoding(client, admin_headers):
+    for _ in range(20):
+        client.post("/api/v1/users", json=make_user_payload(), headers=admin_headers)
+
+    listed = client.get("/api/v1/users", headers={**admin_headers, "Accept-Encoding": "gzip"})
+    assert listed.status_code == 200
+    assert listed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in listed.headers["vary"]
+    assert len(listed.json()["items"]) == 20
+    raw = client.get("/api/v1/users", headers={**admin_headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert int(listed.headers["content-length"]) < len(raw.content)
+    assert listed.content == raw.content
+
+    small = client.get("/api/v1/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    assert negotiate("gzip;q=0.5, br", ["zstd", "br", "gzip"]) == ("br" if "br" in COMPRESSORS else "gzip")
+    assert negotiate("gzip;q=0, *;q=0.1", ["gzip"]) is None
+    assert negotiate("*", ["gzip"]) == "gzip"
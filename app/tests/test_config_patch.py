@@ -0,0 +1,34 @@
+import copy
+import uuid
+
+from app.services.config_patch import apply_patch
+
+
+def test_desired_config_is_delivered_as_json_patch_from_applied_revision(client, admin_headers):
+    squad = client.post("/api/v1/squads", json={"name": "P", "allowed_protocols": ["VLESS"]}, headers=admin_headers).json()
+    server = client.post("/api/v1/servers", json={"host": "patch-1", "squad_id": squad["id"]}, headers=admin_headers).json()
+    node = client.post("/api/v1/nodes", json={"server_id": server["id"], "node_token": "patch-1"}, headers=admin_headers).json()
+    users = [{"name": f"user-{index:03d}", "uuid": str(uuid.uuid4())} for index in range(200)]
+    base = {"inbounds": [{"tag": "vless", "listen_port": 443, "users": users}], "log": {"level": "warn"}}
+    client.post(f"/api/v1/nodes/{node['id']}/desired-config", json=base, headers=admin_headers)
+    changed = copy.deepcopy(base)
+    changed["inbounds"][0]["users"].insert(50, {"name": "user-new", "uuid": str(uuid.uuid4())})
+    del changed["inbounds"][0]["users"][120]
+    changed["log"] = {"level": "info", "output": "/var/log/sing-box.log"}
+    client.post(f"/api/v1/nodes/{node['id']}/desired-config", json=changed, headers=admin_headers)
+
+    def fetch(**params):
+        response = client.get("/agent/desired-config", params={"node_token": "patch-1", **params})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    full = fetch()
+    assert full["desired_config"] == changed and full["patch"] is None
+    delta = fetch(applied_config_revision=2)
+    assert delta["desired_config"] is None and delta["base_config_revision"] == 2
+    assert len(delta["patch"]) == 4
+    assert apply_patch(copy.deepcopy(base), delta["patch"]) == changed
+    assert fetch(applied_config_revision=3)["patch"] == []
+    # Revision 1 was {}: a patch would not be smaller than the document.
+    assert fetch(applied_config_revision=1)["desired_config"] == changed
+    assert fetch(applied_config_revision=99)["desired_config"] == changed
@@ -0,0 +1,90 @@
+import time
+
+from sqlalchemy import update
+
+from app.db.session import engine
+from app.models import User
+from app.services.user_feed import user_feed_renderer
+from app.tests.factories import make_user_payload
+
+
+def test_node_configs_render_from_profiles_and_only_for_changed_inputs(client, admin_headers, monkeypatch):
+    # Render by hand only; the feed renderer is covered below.
+    monkeypatch.setattr(user_feed_renderer, "work", lambda: 0)
+    vless = {
+        "type": "vless",
+        "listen": "::",
+        "listen_port": 443,
+        "users": "{{users}}",
+        "tls": {"enabled": True, "server_name": "{{host}}"},
+    }
+    client.post("/api/v1/protocols", json={"name": "vless-main", "protocol_type": "VLESS", "schema_json": vless}, headers=admin_headers)
+    client.post("/api/v1/protocols", json={"name": "awg", "protocol_type": "AWG2", "schema_json": {"peers": "{{users}}"}}, headers=admin_headers)
+
+    squads, nodes = {}, {}
+    for name, protocols, hosts in (("RA", ["VLESS", "AWG2"], ["ra-1", "ra-2"]), ("RB", ["VLESS"], ["rb-1"]), ("RC", ["TUIC"], ["rc-1"])):
+        squads[name] = client.post(
+            "/api/v1/squads", json={"name": name, "allowed_protocols": protocols}, headers=admin_headers
+        ).json()["id"]
+        for host in hosts:
+            server = client.post("/api/v1/servers", json={"host": host, "squad_id": squads[name]}, headers=admin_headers)
+            node = client.post("/api/v1/nodes", json={"server_id": server.json()["id"], "node_token": host}, headers=admin_headers)
+            nodes[host] = node.json()["id"]
+    users = [client.post("/api/v1/users", json=make_user_payload(squad_id=squads["RA"]), headers=admin_headers).json()]
+    users.append(client.post("/api/v1/users", json=make_user_payload(squad_id=squads["RB"]), headers=admin_headers).json())
+
+    def render():
+        response = client.post("/api/v1/nodes/render", json={}, headers=admin_headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    first = render()
+    assert (first["nodes"], first["rendered"], first["changed"], first["skipped_without_profiles"]) == (4, 3, 3, 1)
+    config = client.get("/agent/desired-config", params={"node_token": "ra-1"}).json()
+    assert config["desired_config_revision"] == 2
+    inbound = config["desired_config"]["inbounds"][0]
+    assert inbound["tag"] == "vless-main"
+    assert inbound["tls"]["server_name"] == "ra-1"
+    assert inbound["users"] == [{"name": users[0]["short_id"], "uuid": users[0]["vless_id"], "flow": "xtls-rprx-vision"}]
+    assert config["desired_config"]["awg2"] == [{"peers": [{"name": users[0]["short_id"], "uuid": users[0]["uuid"]}], "tag": "awg"}]
+    assert render()["rendered"] == 0
+
+    # A new member of RA re-renders RA's two nodes only.
+    client.post("/api/v1/users", json=make_user_payload(squad_id=squads["RA"]), headers=admin_headers)
+    second = render()
+    assert (second["rendered"], second["changed_node_ids"]) == (2, sorted([nodes["ra-1"], nodes["ra-2"]]))
+    assert len(client.get("/agent/desired-config", params={"node_token": "ra-2"}).json()["desired_config"]["inbounds"][0]["users"]) == 2
+    assert client.get("/agent/desired-config", params={"node_token": "rb-1"}).json()["desired_config_revision"] == 2
+
+    # A membership change made outside this process, with no session hook to see it, still lands.
+    with engine.begin() as connection:
+        connection.execute(update(User).where(User.id == users[1]["id"]).values(squad_id=squads["RA"]))
+    third = render()
+    assert third["changed_node_ids"] == sorted([nodes["ra-1"], nodes["ra-2"], nodes["rb-1"]])
+    assert client.get("/agent/desired-config", params={"node_token": "rb-1"}).json()["desired_config"]["inbounds"][0]["users"] == []
+
+
+def test_membership_changes_render_without_an_operator(client, admin_headers):
+    client.post(
+        "/api/v1/protocols",
+        json={"name": "auto", "protocol_type": "VLESS", "schema_json": {"type": "vless", "users": "{{users}}"}},
+        headers=admin_headers,
+    )
+    squad_id = client.post("/api/v1/squads", json={"name": "AUTO", "allowed_protocols": ["VLESS"]}, headers=admin_headers).json()["id"]
+    server = client.post("/api/v1/servers", json={"host": "auto-1", "squad_id": squad_id}, headers=admin_headers).json()
+    client.post("/api/v1/nodes", json={"server_id": server["id"], "node_token": "auto-1"}, headers=admin_headers)
+
+    def rendered_users(expected: int, timeout: float = 5) -> list:
+        deadline = time.monotonic() + timeout
+        while True:
+            inbounds = client.get("/agent/desired-config", params={"node_token": "auto-1"}).json()["desired_config"].get("inbounds")
+            users = inbounds[0]["users"] if inbounds else []
+            if len(users) == expected or time.monotonic() > deadline:
+                return users
+            time.sleep(0.02)
+
+    user = client.post("/api/v1/users", json=make_user_payload(squad_id=squad_id), headers=admin_headers).json()
+    assert [entry["name"] for entry in rendered_users(1)] == [user["short_id"]]
+    client.patch(f"/api/v1/users/{user['id']}/block", headers=admin_headers)
+    assert rendered_users(0) == []
+
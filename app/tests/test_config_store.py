@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import NoResultFound
+
+from app.db.session import SessionLocal
+from app.models import ConfigBlob, ConfigRevision
+from app.services.config_store import decoded_configs, load_config, put_config
+
+
+def test_identical_node_configs_are_stored_once(client, admin_headers):
+    squad = client.post("/api/v1/squads", json={"name": "BLOBS"}, headers=admin_headers).json()
+    config = {"inbounds": [{"tag": f"in-{idx}", "listen": "0.0.0.0", "port": 1000 + idx} for idx in range(100)]}
+    node_ids = []
+    for idx in range(3):
+        server = client.post("/api/v1/servers", json={"host": f"blob-{idx}", "squad_id": squad["id"]}, headers=admin_headers)
+        node = {"server_id": server.json()["id"], "node_token": f"blob-{idx}", "desired_config": config}
+        response = client.post("/api/v1/nodes", json=node, headers=admin_headers)
+        node_ids.append(response.json()["id"])
+    shared_hash = response.json()["desired_config_hash"]
+
+    # Same document with a different key order hashes the same.
+    reordered = {"inbounds": [dict(reversed(list(inbound.items()))) for inbound in config["inbounds"]]}
+    client.post(f"/api/v1/nodes/{node_ids[0]}/desired-config", json=reordered, headers=admin_headers)
+    client.post(f"/api/v1/nodes/{node_ids[1]}/desired-config", json={"inbounds": []}, headers=admin_headers)
+    assert client.post(f"/api/v1/nodes/{node_ids[1]}/rollback", json=1, headers=admin_headers).status_code == 200
+
+    with SessionLocal() as db:
+        blobs = db.execute(select(ConfigBlob.hash, ConfigBlob.encoding, ConfigBlob.size, func.length(ConfigBlob.data))).all()
+        revisions = db.scalar(select(func.count()).select_from(ConfigRevision))
+    assert revisions == 6
+    assert {blob.hash: blob.encoding for blob in blobs}[shared_hash] == "gzip"
+    assert len(blobs) == 2
+    assert all(blob[3] < blob.size for blob in blobs if blob.encoding == "gzip")
+
+    decoded_configs.clear()
+    desired = client.get("/agent/desired-config", params={"node_token": "blob-1"}).json()
+    assert desired["desired_config_revision"] == 3
+    assert desired["desired_config_hash"] == shared_hash
+    assert desired["desired_config"] == config
+
+
+def test_rolled_back_configs_are_not_cached(client):
+    with SessionLocal() as db:
+        digest = put_config(db, {"inbounds": [{"tag": "never-committed"}]})
+        db.rollback()
+        assert decoded_configs.get(digest) is None
+        with pytest.raises(NoResultFound):
+            load_config(db, digest)
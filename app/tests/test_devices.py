@@ -0,0 +1,59 @@
+import uuid
+
+from sqlalchemy import event, select
+
+from app.db.session import SessionLocal, async_engine, engine
+from app.models import Device, Node, Server, Squad, User
+from app.services.devices import device_last_seen
+
+
+def test_report_usage_answers_known_devices_from_cache(client):
+    user_uuid = str(uuid.uuid4())
+    with SessionLocal() as db:
+        squad = Squad(name="HWID", allowed_protocols=["AWG2"])
+        db.add(squad)
+        db.flush()
+        server = Server(host="hwid.example.com", squad_id=squad.id)
+        db.add(server)
+        db.flush()
+        db.add(Node(server_id=server.id, node_token="hwid-node"))
+        db.add(
+            User(
+                uuid=user_uuid,
+                vless_id=str(uuid.uuid4()),
+                short_id=user_uuid[:8],
+                subscription_token="hwid-tok",
+                strict_bind=True,
+                max_devices=2,
+                device_eviction_policy="evict_oldest",
+            )
+        )
+        db.commit()
+
+    def report(device_hash):
+        body = {"node_token": "hwid-node", "user_uuid": user_uuid, "bytes_used": 1, "device_hash": device_hash}
+        assert client.post("/agent/report-usage", json=body).status_code == 200
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    # The sync engine too: last_seen_at stamps must not be written from the request either.
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        report("dev-a")
+        report("dev-b")
+        report("dev-a")  # reloads the set invalidated by dev-b's insert
+        statements.clear()
+        for _ in range(3):
+            report("dev-a")
+        assert [sql for sql in statements if " devices" in sql] == []
+        report("dev-c")
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert device_last_seen.running
+    assert device_last_seen.flush() == 1
+    with SessionLocal() as db:
+        active = db.scalars(select(Device.device_hash).where(Device.is_active.is_(True)).order_by(Device.device_hash)).all()
+    assert active == ["dev-b", "dev-c"]
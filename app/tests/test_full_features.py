@@ -1,23 +1,4 @@
-import uuid
-
-
-def make_user_payload(**overrides):
-    base_uuid = overrides.pop("uuid", str(uuid.uuid4()))
-    payload = {
-        "uuid": base_uuid,
-        "vless_id": str(uuid.uuid4()),
-        "short_id": base_uuid.split("-")[0],
-        "squad_id": None,
-        "traffic_limit_bytes": 0,
-        "max_devices": 1,
-        "hwid_policy": "hash",
-        "strict_bind": True,
-        "device_eviction_policy": "reject",
-        "subscription_token": f"tok-{base_uuid.split('-')[0]}",
-        "external_identities": {},
-    }
-    payload.update(overrides)
-    return payload
+from app.tests.factories import make_user_payload
 
 
 def test_auth_bootstrap_and_api_key_flow(client):
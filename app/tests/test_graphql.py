@@ -0,0 +1,191 @@
+import asyncio
+import tempfile
+import time
+import uuid
+
+import redis
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.db.session import AsyncSessionLocal, SessionLocal, async_engine, async_read_engine
+from app.graphql.context import GraphQLContext
+from app.graphql.caching import query_hash
+from app.graphql.schema import schema
+from app.models import Node, Server, Squad, User
+from app.services.audit import audit_events, audit_writer, write_audit
+from app.services.broadcast import Broadcaster
+
+
+class FakePubSub:
+    def __init__(self, server: "FakeRedis", broken: bool) -> None:
+        self.server = server
+        self.broken = broken
+        self.messages: list[dict] = []
+
+    def subscribe(self, channel: str) -> None:
+        if self.broken:
+            raise redis.ConnectionError("connection reset by peer")
+        self.server.pubsubs.append(self)
+
+    def get_message(self, timeout: float):
+        time.sleep(0.01)
+        return self.messages.pop(0) if self.messages else None
+
+    def close(self) -> None:
+        if self in self.server.pubsubs:
+            self.server.pubsubs.remove(self)
+
+
+class FakeRedis:
+    """Pub/sub whose first connection drops."""
+
+    def __init__(self) -> None:
+        self.connects = 0
+        self.pubsubs: list[FakePubSub] = []
+
+    def pubsub(self, ignore_subscribe_messages: bool) -> FakePubSub:
+        self.connects += 1
+        return FakePubSub(self, broken=self.connects == 1)
+
+    def publish(self, channel: str, data: str) -> int:
+        for pubsub in list(self.pubsubs):
+            pubsub.messages.append({"data": data})
+        return len(self.pubsubs)
+
+
+def test_graphql_audit_events_are_pushed_to_every_subscriber(client):
+    async def scenario():
+        streams = [await schema.subscribe("subscription { auditEvents { action entityId } }") for _ in range(2)]
+        first = [asyncio.ensure_future(stream.__anext__()) for stream in streams]
+        while len(audit_events) < 2:
+            await asyncio.sleep(0)
+
+        with SessionLocal() as db:
+            for index in range(3):
+                write_audit(db, "tester", "test.pushed", "user", f"u-{index}")
+            db.commit()
+        audit_writer.flush()
+
+        received = []
+        for stream, pending in zip(streams, first):
+            results = [await asyncio.wait_for(pending, 2)] + [await asyncio.wait_for(stream.__anext__(), 2) for _ in range(2)]
+            received.append([result.data["auditEvents"]["entityId"] for result in results])
+            await stream.aclose()
+        return received
+
+    assert asyncio.run(scenario()) == [["u-0", "u-1", "u-2"], ["u-0", "u-1", "u-2"]]
+    assert len(audit_events) == 0
+
+
+def test_broadcaster_reconnects_and_stops_listening_without_subscribers():
+    fake = FakeRedis()
+    broadcaster = Broadcaster(None, "test", reconnect_delay_seconds=0.01)
+    broadcaster.redis_client = fake
+
+    async def scenario():
+        subscriber = broadcaster.subscribe()
+        while not fake.pubsubs:
+            await asyncio.sleep(0.01)
+        broadcaster.publish([{"action": "test.after_reconnect"}])
+        event = await asyncio.wait_for(subscriber.queue.get(), 2)
+        broadcaster.unsubscribe(subscriber)
+        return event
+
+    assert asyncio.run(scenario())["action"] == "test.after_reconnect"
+    assert fake.connects == 2
+    deadline = time.monotonic() + 3
+    while broadcaster._listener is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert broadcaster._listener is None and not fake.pubsubs
+
+
+def test_graphql_batches_nested_fields_and_limits_cost(client):
+    with SessionLocal() as db:
+        squads = [Squad(name=f"GQL-{index}", allowed_protocols=["AWG2"]) for index in range(3)]
+        db.add_all(squads)
+        db.flush()
+        for index in range(6):
+            server = Server(host=f"gql-{index}.example.com", squad_id=squads[index % 3].id)
+            db.add(server)
+            db.flush()
+            db.add(Node(server_id=server.id, node_token=f"gql-node-{index}"))
+            user_uuid = str(uuid.uuid4())
+            db.add(
+                User(
+                    uuid=user_uuid,
+                    vless_id=str(uuid.uuid4()),
+                    short_id=user_uuid[:8],
+                    subscription_token=f"gql-{index}",
+                    squad_id=squads[index % 3].id,
+                )
+            )
+        db.commit()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(async_read_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        result = client.post(
+            "/graphql",
+            json={"query": "{ users(limit: 10) { id squad { name servers(limit: 5) { host } } } nodes { server { host } } }"},
+        ).json()
+    finally:
+        event.remove(async_read_engine.sync_engine, "before_cursor_execute", listener)
+    assert "errors" not in result
+    assert len(result["data"]["users"]) == 6
+    assert all(len(user["squad"]["servers"]) == 2 for user in result["data"]["users"])
+    assert {node["server"]["host"] for node in result["data"]["nodes"]} == {f"gql-{index}.example.com" for index in range(6)}
+    # users, nodes, then one batched query per loader instead of one per row
+    assert len(statements) == 5
+
+    costly = client.post("/graphql", json={"query": "{ users(limit: 200) { squad { servers(limit: 200) { host } } } }"}).json()
+    assert "exceeds the limit" in costly["errors"][0]["message"]
+    oversized = client.post("/graphql", json={"query": "{ plans(limit: 1000) { id } }"}).json()
+    assert "limit must be between" in oversized["errors"][0]["message"]
+
+
+def test_graphql_persisted_queries_and_cached_plans(client):
+    query = "{ plans { name } squads { name } }"
+    apq = {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}}
+    missing = client.post("/graphql", json={"extensions": apq}).json()
+    assert missing["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+    assert client.post("/graphql", json={"query": query, "extensions": apq}).json()["data"] == {"plans": [], "squads": []}
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    # Cached fields load from the primary, so a lagging replica cannot refill the cache.
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        assert client.post("/graphql", json={"extensions": apq}).json()["data"] == {"plans": [], "squads": []}
+        assert statements == []
+
+        created = client.post("/graphql", json={"query": 'mutation { createPlan(input: {name: "Pro", price: 5}) { id } }'})
+        assert "errors" not in created.json()
+        with SessionLocal() as db:
+            db.add(Squad(name="APQ", allowed_protocols=["AWG2"]))
+            db.commit()
+        refreshed = client.post("/graphql", json={"extensions": apq}).json()["data"]
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+    assert refreshed == {"plans": [{"name": "Pro"}], "squads": [{"name": "APQ"}]}
+    assert len([sql for sql in statements if sql.startswith("SELECT")]) == 2
+
+
+def test_graphql_cached_fields_do_not_read_the_replica(client):
+    with SessionLocal() as db:
+        db.add(Squad(name="PRIMARY", allowed_protocols=["AWG2"]))
+        db.commit()
+
+    async def scenario():
+        # A replica that has not caught up with anything, not even the schema.
+        lagging = create_async_engine(f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='pepoapple-replica-')}/replica.db")
+        try:
+            async with AsyncSession(lagging) as read_db, AsyncSessionLocal() as db:
+                result = await schema.execute("{ squads { name } }", context_value=GraphQLContext(read_db=read_db, db=db))
+        finally:
+            await lagging.dispose()
+        return result
+
+    result = asyncio.run(scenario())
+    assert result.errors is None
+    assert result.data == {"squads": [{"name": "PRIMARY"}]}
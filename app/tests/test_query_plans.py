@@ -0,0 +1,130 @@
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, desc, func, insert, select, text, tuple_
+from sqlalchemy.orm import Session
+
+from app.db.migrations import upgrade
+from app.db.revisions import r0001_baseline
+from app.db.session import SessionLocal
+from app.models import AuditLog, Device, Node, NodeUsage, Server, Squad, User, WebhookDelivery, WebhookDeliveryStatus, WebhookEndpoint
+
+
+def seed_dataset(db, users: int = 400) -> dict:
+    now = datetime.now(timezone.utc)
+    squad = Squad(name="PLAN", allowed_protocols=["AWG2"])
+    endpoint = WebhookEndpoint(name="plan", target_url="http://127.0.0.1:9/hook", secret="s")
+    db.add_all([squad, endpoint])
+    db.flush()
+    servers = [Server(host=f"plan-{idx}.example.com", squad_id=squad.id, status="active" if idx % 4 else "disabled") for idx in range(50)]
+    db.add_all(servers)
+    db.flush()
+    node = Node(server_id=servers[0].id, node_token="plan-node")
+    db.add(node)
+    db.flush()
+
+    for idx in range(users):
+        user_uuid = str(uuid.uuid4())
+        user = User(
+            id=str(uuid.uuid4()),
+            uuid=user_uuid,
+            vless_id=str(uuid.uuid4()),
+            short_id=user_uuid[:8],
+            subscription_token=f"plan-{user_uuid}",
+            squad_id=squad.id,
+            status="active" if idx % 3 else "blocked",
+            created_at=now - timedelta(minutes=idx),
+        )
+        db.add(user)
+        db.add(Device(user_id=user.id, device_hash=f"dev-{idx}", is_active=bool(idx % 2)))
+        db.add(NodeUsage(node_id=node.id, user_id=user.id, bytes_used=idx, reported_at=now - timedelta(hours=idx)))
+        db.add(AuditLog(action="user.created", entity_type="user", entity_id=user.id, created_at=now - timedelta(minutes=idx)))
+        db.add(WebhookDelivery(endpoint_id=endpoint.id, event="user.created", status=WebhookDeliveryStatus.sent if idx % 5 else WebhookDeliveryStatus.pending))
+    db.commit()
+    db.execute(text("ANALYZE"))
+    return {"squad_id": squad.id, "user_id": user.id, "now": now}
+
+
+def sequential_scans(db, statement) -> list[str]:
+    """Plan lines that read a whole table without an index, for SQLite or PostgreSQL."""
+    dialect = db.get_bind().dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "postgresql":
+        db.execute(text("SET LOCAL enable_seqscan = off"))
+        return [line for line in db.scalars(text(f"EXPLAIN {sql}")) if "Seq Scan" in line]
+    details = [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return [detail for detail in details if detail.startswith("SCAN") and "USING" not in detail]
+
+
+def assert_hot_queries_use_indexes(db) -> None:
+    seeded = seed_dataset(db)
+    since = seeded["now"] - timedelta(days=30)
+    hot_queries = {
+        "deliver_pending": select(WebhookDelivery)
+        .where(WebhookDelivery.status == WebhookDeliveryStatus.pending)
+        .order_by(WebhookDelivery.created_at)
+        .limit(100),
+        "subscription_servers": select(Server).where(Server.squad_id == seeded["squad_id"], Server.status == "active"),
+        "traffic_per_day": select(func.date(NodeUsage.reported_at), func.sum(NodeUsage.bytes_used))
+        .where(NodeUsage.reported_at >= since)
+        .group_by(func.date(NodeUsage.reported_at)),
+        "user_usage": select(NodeUsage)
+        .where(NodeUsage.user_id == seeded["user_id"], NodeUsage.reported_at >= since)
+        .order_by(NodeUsage.reported_at),
+        "register_device": select(Device).where(
+            Device.user_id == seeded["user_id"], Device.device_hash == "dev-1", Device.is_active.is_(True)
+        ),
+        "audit_logs": select(AuditLog).order_by(desc(AuditLog.created_at), desc(AuditLog.id)).limit(100),
+        "audit_logs_for_entity": select(AuditLog)
+        .where(AuditLog.entity_id == seeded["user_id"], AuditLog.created_at >= since)
+        .where(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(seeded["now"], "~"))
+        .order_by(desc(AuditLog.created_at), desc(AuditLog.id))
+        .limit(100),
+        "audit_logs_by_actor": select(AuditLog)
+        .where(AuditLog.actor == "support")
+        .order_by(desc(AuditLog.created_at), desc(AuditLog.id))
+        .limit(100),
+        "list_users": select(User).order_by(desc(User.created_at)).limit(50),
+        "list_users_by_status": select(User).where(User.status == "blocked").order_by(desc(User.created_at)).limit(50),
+        "list_users_by_reseller": select(User).where(User.reseller_id == "r-1").order_by(desc(User.created_at)).limit(50),
+    }
+    for name, statement in hot_queries.items():
+        assert sequential_scans(db, statement) == [], name
+
+
+def test_hot_queries_use_indexes(client):
+    with SessionLocal() as db:
+        assert_hot_queries_use_indexes(db)
+
+
+def test_migrated_schema_uses_indexes():
+    # The indexes must come from the revisions, not from the current models.
+    engine = create_engine(f"sqlite+pysqlite:///{tempfile.mkdtemp(prefix='pepoapple-migrate-')}/plans.db")
+    with engine.begin() as connection:
+        r0001_baseline.upgrade(connection)
+        squads, servers, nodes = (r0001_baseline.metadata.tables[name] for name in ("squads", "servers", "nodes"))
+        connection.execute(
+            insert(squads).values(
+                id="s-1", name="legacy", description="", selection_policy="random", fallback_policy="none",
+                allowed_protocols=[], created_at=datetime.now(timezone.utc),
+            )
+        )
+        connection.execute(
+            insert(servers).values(
+                id="srv-1", host="legacy.example.com", ip="", provider="", region="", squad_id="s-1", status="active",
+                price=0, currency="USD", infra_status="ok", reminder_days_before=3,
+            )
+        )
+        connection.execute(
+            insert(nodes).values(
+                id="n-1", server_id="srv-1", node_token="legacy", engine_awg2_enabled=True, engine_singbox_enabled=True,
+                engine_awg2_version="", engine_singbox_version="", desired_config_revision=1,
+                applied_config_revision=0, last_apply_status="", status="online", desired_config={"log": "info"},
+            )
+        )
+    assert len(upgrade(engine)) > 1
+
+    with Session(engine) as db:
+        assert db.get(Node, "n-1").desired_config_hash is not None
+        assert_hot_queries_use_indexes(db)
@@ -0,0 +1,24 @@
+from app.core.rate_limit import InMemoryRateStore
+
+
+def test_memory_store_caps_keys_and_refills():
+    store = InMemoryRateStore(max_keys=2)
+    assert store.hit("a", 2, 60)
+    assert store.hit("a", 2, 60)
+    assert not store.hit("a", 2, 60)
+
+    store.hit("b", 2, 60)
+    store.hit("c", 2, 60)
+    assert len(store) == 2
+    assert store.evicted == 1
+    # "a" was least recently used and got evicted, so it starts with a full bucket.
+    assert store.hit("a", 2, 60)
+
+
+def test_rate_limit_keys_use_route_template(client, admin_headers):
+    client.get("/api/v1/users/first-id", headers=admin_headers)
+    client.get("/api/v1/users/second-id", headers=admin_headers)
+
+    metrics = client.get("/api/v1/metrics", headers=admin_headers)
+    assert metrics.status_code == 200
+    assert metrics.json()["rate_limit.live_keys"] == 2  # /users/{user_id} + /metrics
@@ -0,0 +1,105 @@
+from sqlalchemy import event
+
+from app.db.session import engine
+
+
+def test_bulk_rollout_in_canary_waves_halts_on_failures(client, admin_headers):
+    squad = client.post("/api/v1/squads", json={"name": "FLEET"}, headers=admin_headers).json()
+    for idx in range(10):
+        server = client.post(
+            "/api/v1/servers", json={"host": f"fleet-{idx}", "region": "eu", "squad_id": squad["id"]}, headers=admin_headers
+        )
+        client.post("/api/v1/nodes", json={"server_id": server.json()["id"], "node_token": f"fleet-{idx}"}, headers=admin_headers)
+
+    def desired(token):
+        return client.get("/agent/desired-config", params={"node_token": token}).json()
+
+    def report(token, result):
+        body = {"node_token": token, "applied_config_revision": desired(token)["desired_config_revision"], "status": result}
+        assert client.post("/agent/apply-result", json=body).status_code == 200
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        created = client.post(
+            "/api/v1/rollouts",
+            json={"squad_id": squad["id"], "template": {"log": {"tag": "{{host}}"}}, "canary_percent": 20},
+            headers=admin_headers,
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert created.status_code == 200, created.text
+    assert len([sql for sql in statements if not sql.startswith("SELECT")]) <= 6
+    rollout = created.json()
+    assert (rollout["total_nodes"], rollout["waves"], rollout["progress"]["0"]["desired"]) == (10, 2, 2)
+
+    pushed = [f"fleet-{idx}" for idx in range(10) if desired(f"fleet-{idx}")["desired_config_revision"] == 2]
+    assert len(pushed) == 2
+    assert desired(pushed[0])["desired_config"] == {"log": {"tag": pushed[0]}}
+    for token in pushed:
+        report(token, "success")
+
+    # A clean canary releases the rest of the fleet.
+    status = client.get(f"/api/v1/rollouts/{rollout['id']}", headers=admin_headers).json()
+    assert (status["current_wave"], status["progress"]["1"]["desired"]) == (1, 8)
+    rest = [f"fleet-{idx}" for idx in range(10) if f"fleet-{idx}" not in pushed]
+    report(rest[0], "failed")
+    assert client.get(f"/api/v1/rollouts/{rollout['id']}", headers=admin_headers).json()["status"] == "in_progress"
+    report(rest[1], "failed")
+    status = client.get(f"/api/v1/rollouts/{rollout['id']}", headers=admin_headers).json()
+    assert status["status"] == "halted"
+    assert "2/8" in status["halt_reason"]
+
+    no_target = client.post("/api/v1/rollouts", json={"config": {}}, headers=admin_headers)
+    assert no_target.status_code == 400
+    assert no_target.json()["detail"] == "rollout_target_required"
+
+
+def test_newer_pushes_supersede_unapplied_rollout_members(client, admin_headers):
+    squad = client.post("/api/v1/squads", json={"name": "OVERLAP"}, headers=admin_headers).json()
+    nodes = {}
+    for idx in range(3):
+        server = client.post("/api/v1/servers", json={"host": f"overlap-{idx}", "squad_id": squad["id"]}, headers=admin_headers)
+        node = {"server_id": server.json()["id"], "node_token": f"overlap-{idx}"}
+        nodes[f"overlap-{idx}"] = client.post("/api/v1/nodes", json=node, headers=admin_headers).json()["id"]
+
+    def report(token):
+        revision = client.get("/agent/desired-config", params={"node_token": token}).json()["desired_config_revision"]
+        body = {"node_token": token, "applied_config_revision": revision, "status": "success"}
+        assert client.post("/agent/apply-result", json=body).status_code == 200
+
+    def rollout(node_ids, **options):
+        created = client.post("/api/v1/rollouts", json={"node_ids": node_ids, "config": {"v": 1}, **options}, headers=admin_headers)
+        assert created.status_code == 200, created.text
+        return created.json()["id"]
+
+    def state(rollout_id):
+        return client.get(f"/api/v1/rollouts/{rollout_id}", headers=admin_headers).json()
+
+    first = rollout(list(nodes.values()))
+    report("overlap-0")
+    # A manual push and a second rollout replace the first rollout's config on the other two nodes.
+    assert client.post(f"/api/v1/nodes/{nodes['overlap-1']}/desired-config", json={"v": 2}, headers=admin_headers).status_code == 200
+    assert state(first)["status"] == "in_progress"
+    second = rollout([nodes["overlap-2"]])
+    status = state(first)
+    assert status["status"] == "completed"
+    assert (status["progress"]["0"]["applied"], status["progress"]["0"]["superseded"]) == (1, 2)
+
+    # Its config is what overlap-2 applies, so the second rollout completes normally.
+    report("overlap-2")
+    assert state(second)["status"] == "completed"
+
+    # A wave whose members were all superseded before release settles at once.
+    def revision(token):
+        return client.get("/agent/desired-config", params={"node_token": token}).json()["desired_config_revision"]
+
+    before = {token: revision(token) for token in ("overlap-0", "overlap-1")}
+    staged = rollout([nodes["overlap-0"], nodes["overlap-1"]], canary_percent=50)
+    assert state(staged)["progress"]["1"]["pending"] == 1
+    canary, other = sorted(before, key=lambda token: revision(token) == before[token])
+    assert client.post(f"/api/v1/nodes/{nodes[other]}/rollback", json=1, headers=admin_headers).status_code == 200
+    report(canary)
+    status = state(staged)
+    assert (status["status"], status["current_wave"], status["progress"]["1"]["superseded"]) == ("completed", 1, 1)
@@ -0,0 +1,25 @@
+import pytest
+
+from app.services.scopes import ScopeRegistry, has_scopes
+
+
+def test_scope_check_reports_missing_scopes(client):
+    denied = client.get("/api/v1/audit/logs", headers={"X-Scopes": "billing.read"})
+    assert denied.status_code == 403
+    assert denied.json()["detail"]["missing"] == ["users.read"]
+
+    allowed = client.get("/api/v1/auth/me", headers={"X-Scopes": "users.read,billing.read"})
+    assert allowed.json()["scopes"] == ["billing.read", "users.read"]
+
+
+def test_unregistered_scopes_grant_nothing_and_never_fill_the_registry():
+    registry = ScopeRegistry(max_scopes=2)
+    users_read = registry.register("users.read")
+    assert registry.mask(f"spam-{index}" for index in range(100)) == 0
+    assert registry.mask(["users.read", "spam"]) == users_read
+
+    with pytest.raises(RuntimeError):
+        registry.register("users.write")
+    assert registry.bit("users.write") is None
+    assert not has_scopes(users_read, registry.bit("users.write"))
+    assert has_scopes(users_read, registry.bit("users.read"))
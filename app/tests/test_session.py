@@ -0,0 +1,28 @@
+import asyncio
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.session import async_database_url, engine_options, shared_memory_url
+
+
+def test_in_memory_sqlite_is_shared_by_the_sync_and_async_engines():
+    assert shared_memory_url("sqlite:////tmp/app.db") == "sqlite:////tmp/app.db"
+    url = shared_memory_url("sqlite+pysqlite:///:memory:")
+    assert shared_memory_url("sqlite://") == "sqlite:///file:pepoapple?mode=memory&cache=shared&uri=true"
+
+    sync_engine = create_engine(url, **engine_options(url))
+    async_engine = create_async_engine(async_database_url(url), **engine_options(url))
+    with sync_engine.begin() as connection:
+        connection.execute(text("CREATE TABLE shared_check (value INTEGER)"))
+        connection.execute(text("INSERT INTO shared_check VALUES (42)"))
+
+    async def read() -> int:
+        async with async_engine.connect() as connection:
+            return await connection.scalar(text("SELECT value FROM shared_check"))
+
+    try:
+        assert asyncio.run(read()) == 42
+    finally:
+        asyncio.run(async_engine.dispose())
+        sync_engine.dispose()
@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.db.session import SessionLocal
+from app.models import Node, NodeStatus, Server
+from app.services.node_load import node_load
+from app.services.selection import Candidate, RoundRobinSelector
+from app.services.subscription import rank_endpoints
+from app.tests.factories import make_user_payload
+
+
+def test_subscription_orders_endpoints_by_selection_policy(client, admin_headers):
+    def make_squad(name, policy, servers):
+        squad = client.post("/api/v1/squads", json={"name": name, "selection_policy": policy}, headers=admin_headers)
+        assert squad.status_code == 200, squad.text
+        for host, region, weight in servers:
+            body = {"host": host, "region": region, "weight": weight, "squad_id": squad.json()["id"]}
+            assert client.post("/api/v1/servers", json=body, headers=admin_headers).status_code == 200
+        user = client.post("/api/v1/users", json=make_user_payload(squad_id=squad.json()["id"]), headers=admin_headers)
+        return user.json()["subscription_token"]
+
+    def hosts(token, **params):
+        response = client.get(f"/api/v1/subscriptions/{token}", params=params)
+        assert response.status_code == 200, response.text
+        return [endpoint["host"] for endpoint in response.json()["endpoints"]]
+
+    geo = make_squad("GEO", "geo", [("eu-1", "eu", 100), ("us-1", "us", 100), ("us-2", "us", 100)])
+    assert set(hosts(geo, region="us", limit=2)) == {"us-1", "us-2"}
+    assert hosts(geo, region="EU", limit=2)[0] == "eu-1"
+    assert len(hosts(geo)) == 3
+
+    rr = make_squad("RR", "round-robin", [("rr-1", "eu", 100), ("rr-2", "eu", 100), ("rr-3", "eu", 100)])
+    assert {hosts(rr, limit=1)[0] for _ in range(3)} == {"rr-1", "rr-2", "rr-3"}
+
+    weighted = make_squad("W", "weighted", [("w-heavy", "eu", 100), ("w-zero", "eu", 0)])
+    for _ in range(5):
+        assert hosts(weighted) == ["w-heavy", "w-zero"]
+        assert hosts(weighted, limit=1) == ["w-heavy"]
+
+    # A committed server change rebuilds the squad's selector.
+    squads = client.get("/api/v1/squads", headers=admin_headers).json()
+    squad_id = next(squad["id"] for squad in squads if squad["name"] == "W")
+    client.post("/api/v1/servers", json={"host": "w-new", "weight": 0, "squad_id": squad_id}, headers=admin_headers)
+    assert len(hosts(weighted)) == 3
+    assert client.get(f"/api/v1/subscriptions/{weighted}", params={"limit": 0}).status_code == 422
+
+
+def test_subscription_steers_away_from_saturated_and_offline_nodes(client, admin_headers):
+    squad = client.post("/api/v1/squads", json={"name": "LOAD", "selection_policy": "round-robin"}, headers=admin_headers)
+    server_ids = {}
+    for host in ("busy", "idle", "gone"):
+        server = client.post("/api/v1/servers", json={"host": host, "squad_id": squad.json()["id"]}, headers=admin_headers)
+        server_ids[host] = server.json()["id"]
+        node = {"server_id": server.json()["id"], "node_token": f"{host}-token"}
+        assert client.post("/api/v1/nodes", json=node, headers=admin_headers).status_code == 200
+        applied = {"node_token": f"{host}-token", "applied_config_revision": 1, "status": "success"}
+        assert client.post("/agent/apply-result", json=applied).status_code == 200
+    user = client.post("/api/v1/users", json=make_user_payload(squad_id=squad.json()["id"]), headers=admin_headers).json()
+
+    assert client.post("/agent/heartbeat", json={"node_token": "busy-token", "cpu_percent": 97.5}).status_code == 200
+    assert client.post("/agent/heartbeat", json={"node_token": "idle-token", "connections": 3}).status_code == 200
+    body = {"node_token": "idle-token", "user_uuid": user["uuid"], "bytes_used": 4096, "device_hash": "d1"}
+    assert client.post("/agent/report-usage", json=body).status_code == 200
+    # Liveness is the shared last_seen_at, not the heartbeats this worker saw.
+    with SessionLocal() as db:
+        gone = db.scalar(select(Node).where(Node.node_token == "gone-token"))
+        gone.last_seen_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        db.commit()
+
+    for _ in range(3):
+        response = client.get(f"/api/v1/subscriptions/{user['subscription_token']}", params={"limit": 1})
+        assert [endpoint["host"] for endpoint in response.json()["endpoints"]] == ["idle"]
+    response = client.get(f"/api/v1/subscriptions/{user['subscription_token']}")
+    assert [endpoint["host"] for endpoint in response.json()["endpoints"]] == ["idle", "busy", "gone"]
+
+    load = client.get("/api/v1/nodes/load", headers=admin_headers).json()["servers"]
+    assert load[server_ids["busy"]]["utilisation"] == 0.975
+    assert load[server_ids["idle"]]["active_users"] == 1
+    assert load[server_ids["idle"]]["bytes_per_sec"] > 0
+
+    with SessionLocal() as db:
+        db.delete(db.scalar(select(Node).where(Node.node_token == "gone-token")))
+        db.flush()
+        db.delete(db.get(Server, server_ids["gone"]))
+        db.commit()
+    assert server_ids["gone"] not in client.get("/api/v1/nodes/load", headers=admin_headers).json()["servers"]
+
+
+class CountingSelector(RoundRobinSelector):
+    starts = 0
+    widest = 0
+
+    def next_start(self):
+        self.starts += 1
+        return super().next_start()
+
+    def select(self, k, region=None, start=None):
+        self.widest = max(self.widest, k)
+        return super().select(k, region, start)
+
+
+def test_demoted_endpoints_advance_round_robin_once_per_request(client):
+    selector = CountingSelector([Candidate(name, name, "", "eu", "", 1) for name in "abcdefgh"])
+    node_load.record_heartbeat("a", cpu_percent=99.0)
+    served = [rank_endpoints(selector, 1)[0][0].id for _ in range(3)]
+    assert selector.starts == 3
+    assert served == ["b", "b", "c"]
+    # Only the window past the demoted server is read, not the whole squad.
+    assert selector.widest == 2
+
+
+def test_subscription_filters_unhealthy_nodes_and_honours_fallback(client, admin_headers):
+    nodes = {}
+
+    def make_squad(name, fallback_policy, hosts, allowed_protocols=("AWG2", "Sing-box")):
+        body = {"name": name, "fallback_policy": fallback_policy, "allowed_protocols": list(allowed_protocols)}
+        squad = client.post("/api/v1/squads", json=body, headers=admin_headers)
+        assert squad.status_code == 200, squad.text
+        for host in hosts:
+            server = client.post("/api/v1/servers", json={"host": host, "squad_id": squad.json()["id"]}, headers=admin_headers)
+            node = {"server_id": server.json()["id"], "node_token": f"{host}-token"}
+            response = client.post("/api/v1/nodes", json=node, headers=admin_headers)
+            assert response.status_code == 200
+            nodes[host] = response.json()["id"]
+        return squad.json()["id"]
+
+    def apply(host, result="success", revision=1):
+        body = {"node_token": f"{host}-token", "applied_config_revision": revision, "status": result}
+        assert client.post("/agent/apply-result", json=body).status_code == 200
+
+    def set_offline(host):
+        with SessionLocal() as db:
+            db.scalar(select(Node).where(Node.node_token == f"{host}-token")).status = NodeStatus.offline
+            db.commit()
+
+    def subscribe(squad_id):
+        user = client.post("/api/v1/users", json=make_user_payload(squad_id=squad_id), headers=admin_headers).json()
+        response = client.get(f"/api/v1/subscriptions/{user['subscription_token']}")
+        assert response.status_code == 200, response.text
+        return [endpoint["host"] for endpoint in response.json()["endpoints"]], response.json()["fallback_used"]
+
+    backup = make_squad("BACKUP", "none", ["backup-1"])
+    strict = make_squad("STRICT", "none", ["ok-1", "lagging-1", "broken-1"])
+    apply("ok-1")
+    apply("broken-1", "failed")
+    # A node still applying its desired config is served, behind the up-to-date one.
+    assert subscribe(strict) == (["ok-1", "lagging-1"], None)
+    assert subscribe(backup) == (["backup-1"], None)
+
+    # A desired-config push (or a rollout wave) must not empty the subscription.
+    apply("backup-1")
+    pushed = client.post(f"/api/v1/nodes/{nodes['backup-1']}/desired-config", json={"v": 2}, headers=admin_headers)
+    assert pushed.status_code == 200
+    assert subscribe(backup) == (["backup-1"], None)
+    apply("backup-1", revision=2)
+
+    degraded = make_squad("DEGRADED", "degraded", ["d-offline", "d-broken"])
+    apply("d-broken", "failed")
+    set_offline("d-offline")
+    assert subscribe(degraded) == (["d-broken", "d-offline"], "degraded")
+
+    spill = make_squad("SPILL", f"squad:{backup}", ["s-broken"])
+    apply("s-broken", "failed")
+    assert subscribe(spill) == (["backup-1"], f"squad:{backup}")
+
+    # Profile-rendered configs only carry their own squad's users, so such a squad is no fallback.
+    rendered = make_squad("RENDERED", "none", ["r-1"], allowed_protocols=["VLESS"])
+    apply("r-1")
+    profile = {"name": "vless-fallback", "protocol_type": "VLESS", "schema_json": {"users": "{{users}}"}}
+    assert client.post("/api/v1/protocols", json=profile, headers=admin_headers).status_code == 200
+    spill_rendered = make_squad("SPILL-RENDERED", f"squad:{rendered}", ["sr-broken"])
+    apply("sr-broken", "failed")
+    assert subscribe(spill_rendered) == ([], None)
+
+    set_offline("ok-1")
+    assert subscribe(strict) == (["lagging-1"], None)
+    set_offline("lagging-1")
+    assert subscribe(strict) == ([], None)
+    bad = client.post("/api/v1/squads", json={"name": "BAD", "fallback_policy": "anything"}, headers=admin_headers)
+    assert bad.status_code == 422
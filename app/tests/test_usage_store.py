@@ -0,0 +1,69 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.db.session import SessionLocal
+from app.models import Node, NodeUsage, NodeUsageHourly, Server, Squad, User
+from app.services.usage_store import usage_maintenance
+
+
+def seed_usage(reports) -> None:
+    with SessionLocal() as db:
+        squad = Squad(name="USAGE", allowed_protocols=["AWG2"])
+        db.add(squad)
+        db.flush()
+        server = Server(host="usage.example.com", squad_id=squad.id)
+        db.add(server)
+        db.flush()
+        node = Node(server_id=server.id, node_token="usage-node")
+        user_uuid = str(uuid.uuid4())
+        user = User(uuid=user_uuid, vless_id=str(uuid.uuid4()), short_id=user_uuid[:8], subscription_token="usage-tok")
+        db.add_all([node, user])
+        db.flush()
+        for reported_at, bytes_used in reports:
+            db.add(NodeUsage(node_id=node.id, user_id=user.id, bytes_used=bytes_used, reported_at=reported_at))
+        db.commit()
+
+
+def test_usage_compaction_and_retention(client, admin_headers):
+    now = datetime.now(timezone.utc)
+    ten_days_ago = now.replace(minute=5) - timedelta(days=10)
+    seed_usage(
+        [
+            (ten_days_ago, 100),
+            (ten_days_ago + timedelta(minutes=30), 50),
+            (now - timedelta(days=500), 7),
+            (now, 1),
+        ]
+    )
+
+    result = client.post("/api/v1/analytics/usage/compact", headers=admin_headers)
+    assert result.status_code == 200
+    assert result.json()["raw_rows_deleted"] == 3
+    assert result.json()["hourly_rows_expired"] == 1
+
+    with SessionLocal() as db:
+        hourly = db.scalars(select(NodeUsageHourly)).all()
+        assert [(row.bytes_used, row.reports) for row in hourly] == [(150, 2)]
+        assert hourly[0].hour.replace(tzinfo=timezone.utc) == ten_days_ago.replace(minute=0, second=0, microsecond=0)
+        assert len(db.scalars(select(NodeUsage)).all()) == 1
+
+    traffic = client.get("/api/v1/analytics/overview", headers=admin_headers).json()["traffic"]
+    assert traffic["total_bytes"] == 151
+    assert sum(day["bytes"] for day in traffic["per_day"]) == 151
+
+
+def test_usage_maintenance_compacts_in_the_background(client):
+    assert usage_maintenance.running
+    seed_usage([(datetime.now(timezone.utc) - timedelta(days=10), 100)])
+
+    usage_maintenance.wake()
+    deadline = time.monotonic() + 5
+    with SessionLocal() as db:
+        while db.scalar(select(func.count()).select_from(NodeUsage)) and time.monotonic() < deadline:
+            time.sleep(0.05)
+            db.rollback()
+        assert db.scalar(select(func.count()).select_from(NodeUsage)) == 0
+        assert db.scalar(select(NodeUsageHourly.bytes_used)) == 100
@@ -0,0 +1,64 @@
+from app.db.session import SessionLocal
+from app.models import UserChange, UserChangeOp
+from app.services import user_feed
+from app.services.user_feed import feed_head, squad_changes, user_feed_compaction, user_feed_sequencer
+from app.tests.factories import make_user_payload, wait_for_user_feed
+
+
+def test_agents_follow_squad_user_changes_with_snapshot_fallback(client, admin_headers, monkeypatch):
+    assert user_feed_sequencer.running and user_feed_compaction.running
+    squad_a = client.post("/api/v1/squads", json={"name": "FA", "allowed_protocols": ["VLESS"]}, headers=admin_headers).json()["id"]
+    squad_b = client.post("/api/v1/squads", json={"name": "FB", "allowed_protocols": ["VLESS"]}, headers=admin_headers).json()["id"]
+    server = client.post("/api/v1/servers", json={"host": "feed-1", "squad_id": squad_a}, headers=admin_headers).json()
+    client.post("/api/v1/nodes", json={"server_id": server["id"], "node_token": "feed-1"}, headers=admin_headers)
+    first = client.post("/api/v1/users", json=make_user_payload(squad_id=squad_a), headers=admin_headers).json()
+    second = client.post("/api/v1/users", json=make_user_payload(squad_id=squad_a), headers=admin_headers).json()
+
+    def changes(since):
+        wait_for_user_feed()
+        response = client.get("/agent/user-changes", params={"node_token": "feed-1", "since": since})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    snapshot = changes(0)
+    assert snapshot["mode"] == "snapshot"
+    assert sorted(user["user_id"] for user in snapshot["users"]) == sorted([first["id"], second["id"]])
+    assert (changes(snapshot["seq"])["mode"], changes(snapshot["seq"])["changes"]) == ("delta", [])
+
+    client.post("/api/v1/users", json=make_user_payload(squad_id=squad_b), headers=admin_headers)
+    client.patch(f"/api/v1/users/{first['id']}/block", headers=admin_headers)
+    rotated = client.post(f"/api/v1/users/{second['id']}/rotate-keys", headers=admin_headers).json()
+    delta = changes(snapshot["seq"])
+    assert delta["mode"] == "delta"
+    assert [(item["op"], item["user_id"]) for item in delta["changes"]] == [("remove", first["id"]), ("update", second["id"])]
+    assert delta["changes"][1]["vless_id"] == rotated["vless_id"]
+    assert delta["changes"][1]["previous"]["vless_id"] == second["vless_id"]
+    assert changes(delta["seq"])["changes"] == []
+
+    compacted = client.post("/api/v1/nodes/user-changes/compact", headers=admin_headers)
+    assert compacted.status_code == 200
+    assert compacted.json()["deleted"] == 0
+    monkeypatch.setattr(user_feed.settings, "user_feed_retention_hours", 0)
+    assert client.post("/api/v1/nodes/user-changes/compact", headers=admin_headers).json()["deleted"] > 0
+    behind = changes(snapshot["seq"])
+    assert behind["mode"] == "snapshot"
+    assert [user["user_id"] for user in behind["users"]] == [second["id"]]
+    assert changes(behind["seq"])["mode"] == "delta"
+
+
+def test_entries_committed_late_still_land_after_the_head(client):
+    def entry(row_id, user_id):
+        return UserChange(id=row_id, squad_id="late-squad", user_id=user_id, op=UserChangeOp.add, credentials={})
+
+    with SessionLocal() as db:
+        db.add(entry(1_000_000, "early"))
+        db.commit()
+    wait_for_user_feed()
+    with SessionLocal() as db:
+        head = feed_head(db)
+        # A lower insert-order id, as a transaction that began earlier but committed later would hold.
+        db.add(entry(999_999, "late"))
+        db.commit()
+    wait_for_user_feed()
+    with SessionLocal() as db:
+        assert squad_changes(db, "late-squad", head)["changes"][0]["user_id"] == "late"
@@ -178,6 +178,7 @@ export default function SquadsPage() {
               <label className="label">Fallback Policy</label>
               <input
                 className="input"
+                placeholder="none | degraded | squad:<squad id>"
                 value={squadForm.fallback_policy}
                 onChange={(e) => setSquadForm({ ...squadForm, fallback_policy: e.target.value })}
               />
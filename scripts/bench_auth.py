@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of per-request auth overhead.
+
+Times ``get_auth_context`` plus the ``require_scopes`` check for dev-scope,
+API-key and bearer requests with warm caches, next to the old set-based
+scope check, against a throwaway SQLite database:
+
+    python3 scripts/bench_auth.py --iterations 100000
+"""
+import argparse
+import timeit
+
+from bench_common import use_temp_database
+
+use_temp_database()
+
+from app.db.init_db import init_db  # noqa: E402
+from app.db.session import SessionLocal  # noqa: E402
+from app.models import ApiKey, AuthPrincipal, RoleName  # noqa: E402
+from app.services.auth import create_token_pair, generate_api_key_secret, get_auth_context  # noqa: E402
+from app.services.rbac import require_scopes  # noqa: E402
+
+REQUIRED = ("users.read", "users.write")
+
+
+def legacy_check(scopes: set[str]) -> None:
+    """The previous per-request check, for comparison."""
+    if "*" in scopes:
+        return
+    missing = [scope for scope in REQUIRED if scope not in scopes]
+    if missing:
+        raise RuntimeError(missing)
+
+
+def seed() -> tuple[str, str]:
+    init_db()
+    with SessionLocal() as db:
+        principal = AuthPrincipal(username="bench", password_hash="-", role=RoleName.operator, scopes=[])
+        db.add(principal)
+        db.flush()
+        secret = generate_api_key_secret()
+        db.add(ApiKey(name="bench", key_prefix=secret.prefix, key_hash=secret.hashed, scopes=list(REQUIRED), owner_principal_id=principal.id))
+        db.commit()
+        access, _ = create_token_pair(principal)
+    return secret.raw, access
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    api_key, access = seed()
+    checker = require_scopes(*REQUIRED)
+    headers = {
+        "dev": {"x_scopes": "users.read,users.write"},
+        "api_key": {"x_api_key": api_key},
+        "bearer": {"authorization": f"Bearer {access}"},
+    }
+
+    print(f"{'auth':<10}{'resolve us':>12}{'bitmask us':>12}{'set us':>10}")
+    for name, kwargs in headers.items():
+        params = {"authorization": None, "x_api_key": None, "x_scopes": None, **kwargs}
+        ctx = get_auth_context(**params)
+        names = ctx.scopes
+        resolve = timeit.timeit(lambda: get_auth_context(**params), number=args.iterations)
+        bitmask = timeit.timeit(lambda: checker(ctx), number=args.iterations)
+        legacy = timeit.timeit(lambda: legacy_check(names), number=args.iterations)
+        scale = 1_000_000 / args.iterations
+        print(f"{name:<10}{resolve * scale:>12.2f}{bitmask * scale:>12.3f}{legacy * scale:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
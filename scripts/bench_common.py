@@ -0,0 +1,55 @@
+"""Shared setup for the scripts/bench_*.py and load-test scripts.
+
+Import ``use_temp_database`` before anything from ``app`` so settings pick up
+the throwaway SQLite URL.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+NODE_TOKEN = "bench-node-token"
+SUBSCRIPTION_TOKEN = "bench-subscription-token"
+
+
+def use_temp_database() -> str:
+    sys.path.insert(0, str(ROOT))
+    db_dir = tempfile.mkdtemp(prefix="pepoapple-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite+pysqlite:///{db_dir}/bench.db"
+    os.environ["RATE_LIMIT_PER_MINUTE"] = str(10**9)
+    return os.environ["DATABASE_URL"]
+
+
+def seed_fleet(servers: int = 20) -> None:
+    """Create one squad with ``servers`` servers, a node on the first and one subscribed user."""
+    from app.db.init_db import init_db
+    from app.db.session import SessionLocal
+    from app.models import Node, Server, Squad, User
+
+    init_db()
+    with SessionLocal() as db:
+        squad = Squad(name="BENCH", allowed_protocols=["AWG2", "Sing-box"])
+        db.add(squad)
+        db.flush()
+        for idx in range(servers):
+            server = Server(host=f"bench-{idx}.example.com", ip=f"10.9.{idx // 250}.{idx % 250}", region="eu", squad_id=squad.id)
+            db.add(server)
+            db.flush()
+            if idx == 0:
+                db.add(Node(server_id=server.id, node_token=NODE_TOKEN))
+        db.add(
+            User(
+                uuid="bbbbbbbb-0000-0000-0000-000000000001",
+                vless_id="bbbbbbbb-0000-0000-0000-000000000002",
+                short_id="bench",
+                squad_id=squad.id,
+                subscription_token=SUBSCRIPTION_TOKEN,
+            )
+        )
+        db.commit()
+
+
+def percentile(samples: list[float], pct: int) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
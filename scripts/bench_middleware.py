@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Compare the raw ASGI rate limiter with the old BaseHTTPMiddleware version.
+
+Runs in-process through httpx's ASGI transport against a throwaway SQLite
+database, so the numbers isolate middleware and handler overhead from the
+network stack:
+
+    python3 scripts/bench_middleware.py --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import time
+
+from bench_common import NODE_TOKEN, SUBSCRIPTION_TOKEN, percentile, seed_fleet, use_temp_database
+
+use_temp_database()
+
+import httpx  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from app.core import rate_limit  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """The pre-ASGI implementation, kept here only as the baseline."""
+
+    async def dispatch(self, request, call_next):
+        if request.url.path in rate_limit.EXEMPT_PATHS:
+            return await call_next(request)
+
+        client_host = request.client.host if request.client else "unknown"
+        auth_marker = request.headers.get("authorization") or request.headers.get("x-api-key") or client_host
+        key = f"{client_host}:{rate_limit.route_template(request.scope)}:{rate_limit._auth_digest(auth_marker)}"
+        if not rate_limit.rate_limiter.allow(key):
+            return JSONResponse(status_code=429, content={"error": "rate_limit_exceeded"})
+        return await call_next(request)
+
+
+def use_middleware(middleware_cls: type) -> None:
+    app.user_middleware = [
+        Middleware(middleware_cls) if item.cls in (rate_limit.RateLimitMiddleware, LegacyRateLimitMiddleware) else item
+        for item in app.user_middleware
+    ]
+    app.middleware_stack = None
+
+
+SCENARIOS = {
+    "health": ("GET", "/api/v1/health", None),
+    "subscription": ("GET", f"/api/v1/subscriptions/{SUBSCRIPTION_TOKEN}", None),
+    "agent.heartbeat": ("POST", "/agent/heartbeat", {"node_token": NODE_TOKEN}),
+    "agent.desired-config": ("GET", f"/agent/desired-config?node_token={NODE_TOKEN}", None),
+}
+
+
+async def run_scenario(method: str, path: str, body, total: int, concurrency: int) -> tuple[float, float]:
+    latencies: list[float] = []
+    remaining = iter(range(total))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker() -> None:
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await client.request(method, path, json=body)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return total / elapsed, percentile(latencies, 99) * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    seed_fleet()
+    print(f"{'scenario':<22}{'middleware':<12}{'req/s':>10}{'p99 ms':>10}")
+    for name, (method, path, body) in SCENARIOS.items():
+        for label, middleware_cls in (("before", LegacyRateLimitMiddleware), ("after", rate_limit.RateLimitMiddleware)):
+            use_middleware(middleware_cls)
+            await run_scenario(method, path, body, min(args.requests, 200), args.concurrency)
+            rps, p99 = await run_scenario(method, path, body, args.requests, args.concurrency)
+            print(f"{name:<22}{label:<12}{rps:>10.0f}{p99:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Serialization time and bytes on the wire for the largest API responses.
+
+Builds payloads shaped like the biggest responses (a big-squad subscription,
+500 webhook deliveries, a 500-row audit page, a 500-user list and a desired
+config with thousands of users) and times rendering each one with
+``jsonable_encoder`` plus the stdlib encoder, with FastAPI's Pydantic
+``dump_json`` path for routes with a return type or response model, and with
+``ORJSONResponse``. It then reports body size and compression time for every
+available encoding:
+
+    python3 scripts/bench_responses.py --rows 500 --config-users 5000
+"""
+import argparse
+import gzip
+import timeit
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from bench_common import use_temp_database
+
+use_temp_database()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.core.compression import BROTLI_QUALITY, GZIP_LEVEL, ZSTD_LEVEL, brotli, zstandard  # noqa: E402
+from app.core.responses import ORJSONResponse  # noqa: E402
+from app.schemas.nodes import DesiredConfigResponse  # noqa: E402
+from app.schemas.users import UserListResponse  # noqa: E402
+from app.schemas.webhooks import WebhookDeliveryResponse  # noqa: E402
+
+
+def subscription(endpoints: int) -> dict:
+    return {
+        "user_uuid": str(uuid.uuid4()),
+        "short_id": "bench",
+        "selection_policy": "weighted",
+        "fallback_used": False,
+        "subscription_url": "/api/v1/subscriptions/bench-subscription-token",
+        "endpoints": [
+            {
+                "server_id": str(uuid.uuid4()),
+                "host": f"bench-{idx}.example.com",
+                "ip": f"10.9.{idx // 250}.{idx % 250}",
+                "region": "eu",
+                "provider": "bench",
+                "protocols": ["AWG2", "Sing-box"],
+            }
+            for idx in range(endpoints)
+        ],
+    }
+
+
+def audit_page(rows: int) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "items": [
+            {
+                "id": str(uuid.uuid4()),
+                "actor": "admin",
+                "action": "user.limits_updated",
+                "entity_type": "user",
+                "entity_id": str(uuid.uuid4()),
+                "payload": {"traffic_limit_bytes": 10**11, "max_devices": 3},
+                "created_at": now - timedelta(seconds=idx),
+            }
+            for idx in range(rows)
+        ],
+        "next_cursor": "bench",
+    }
+
+
+def deliveries(rows: int) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "endpoint_id": str(uuid.uuid4()),
+            "event": "user.blocked",
+            "status": "success",
+            "attempts": 1,
+            "response_status": 200,
+            "last_error": "",
+            "created_at": now,
+            "sent_at": now,
+        }
+        for _ in range(rows)
+    ]
+
+
+def users(rows: int) -> dict:
+    return {
+        "items": [
+            {
+                "id": str(uuid.uuid4()),
+                "uuid": str(uuid.uuid4()),
+                "vless_id": str(uuid.uuid4()),
+                "short_id": f"u{idx:07d}",
+                "status": "active",
+                "traffic_limit_bytes": 10**11,
+                "traffic_used_bytes": idx * 1024,
+                "expires_at": datetime.now(timezone.utc),
+                "max_devices": 3,
+                "hwid_policy": "hash",
+                "strict_bind": False,
+                "device_eviction_policy": "reject",
+                "squad_id": str(uuid.uuid4()),
+                "reseller_id": None,
+                "subscription_token": f"tok-{idx:07d}",
+            }
+            for idx in range(rows)
+        ],
+        "total": rows,
+    }
+
+
+def desired_config(config_users: int) -> dict:
+    members = [{"name": f"u{idx:07d}", "uuid": str(uuid.uuid4()), "flow": "xtls-rprx-vision"} for idx in range(config_users)]
+    return {
+        "node_id": str(uuid.uuid4()),
+        "desired_config_revision": 42,
+        "desired_config_hash": "0" * 64,
+        "desired_config": {"inbounds": [{"type": "vless", "tag": "vless-main", "listen_port": 443, "users": members}], "awg2": []},
+    }
+
+
+def renderers(payload, model) -> dict:
+    adapter = TypeAdapter(model)
+    return {
+        "stdlib": lambda: JSONResponse(jsonable_encoder(payload)).body,
+        "pydantic": lambda: adapter.dump_json(adapter.validate_python(payload)),
+        "orjson": lambda: ORJSONResponse(payload).body,
+    }
+
+
+def encoders() -> dict:
+    available = {"gzip": lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        available["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+    if zstandard is not None:
+        available["zstd"] = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+    return available
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--endpoints", type=int, default=1000)
+    parser.add_argument("--config-users", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = {
+        "subscription": (subscription(args.endpoints), dict),
+        "deliveries": (deliveries(args.rows), list[WebhookDeliveryResponse]),
+        "audit logs": (audit_page(args.rows), dict),
+        "users": (users(args.rows), UserListResponse),
+        "desired config": (desired_config(args.config_users), DesiredConfigResponse),
+    }
+    codecs = encoders()
+    scale = 1000 / args.iterations
+
+    print(f"{'response':<16}{'stdlib ms':>10}{'pydantic ms':>12}{'orjson ms':>10}{'identity KB':>13}", end="")
+    for name in codecs:
+        print(f"{f'{name} KB':>10}{f'{name} ms':>10}", end="")
+    print()
+    for label, (payload, model) in cases.items():
+        render = renderers(payload, model)
+        timings = {name: timeit.timeit(fn, number=args.iterations) * scale for name, fn in render.items()}
+        body = render["orjson"]()
+        print(f"{label:<16}{timings['stdlib']:>10.2f}{timings['pydantic']:>12.2f}{timings['orjson']:>10.2f}", end="")
+        print(f"{len(body) / 1024:>13.1f}", end="")
+        for compress in codecs.values():
+            seconds = timeit.timeit(lambda: compress(body), number=args.iterations) * scale
+            print(f"{len(compress(body)) / 1024:>10.1f}{seconds:>10.2f}", end="")
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of per-request endpoint selection.
+
+Times ``rank_endpoints``, the selection step the subscription endpoint runs,
+for every squad selection policy over an in-memory squad: with every node
+ready, and with ``--demoted`` percent of the nodes saturated so the window
+has to widen past K. The whole-squad column ranks all servers, and the last
+row is the previous approach of ordering the full server list per request:
+
+    python3 scripts/bench_selection.py --servers 1000 --k 5 --demoted 10
+"""
+import argparse
+import random
+import timeit
+
+from bench_common import use_temp_database
+
+use_temp_database()
+
+from app.models import SquadSelectionPolicy  # noqa: E402
+from app.services.node_load import node_load  # noqa: E402
+from app.services.selection import Candidate, build_selector  # noqa: E402
+from app.services.subscription import rank_endpoints  # noqa: E402
+
+REGIONS = ("eu", "us", "asia", "sa", "af")
+
+
+def candidates(count: int) -> list[Candidate]:
+    return [
+        Candidate(
+            id=str(idx),
+            host=f"bench-{idx}.example.com",
+            ip=f"10.9.{idx // 250}.{idx % 250}",
+            region=REGIONS[idx % len(REGIONS)],
+            provider="bench",
+            weight=random.randint(0, 200),
+        )
+        for idx in range(count)
+    ]
+
+
+def full_sort(servers: list[Candidate], k: int) -> list[Candidate]:
+    """Order the whole list per request, for comparison."""
+    return sorted(servers, key=lambda server: -server.weight * random.random())[:k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--demoted", type=float, default=10.0, help="percent of nodes reported saturated")
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    servers = candidates(args.servers)
+    scale = 1_000_000 / args.iterations
+    print(f"{'policy':<14}{'build ms':>10}{f'top-{args.k} us':>12}{'demoted us':>12}{'all us':>12}")
+    for policy in SquadSelectionPolicy:
+        build = timeit.timeit(lambda: build_selector(policy, servers), number=10) * 100
+        selector = build_selector(policy, servers)
+        node_load.clear()
+        top_k = timeit.timeit(lambda: rank_endpoints(selector, args.k, "eu"), number=args.iterations)
+        for server in random.sample(servers, int(len(servers) * args.demoted / 100)):
+            node_load.record_heartbeat(server.id, cpu_percent=100.0)
+        demoted = timeit.timeit(lambda: rank_endpoints(selector, args.k, "eu"), number=args.iterations)
+        whole = timeit.timeit(lambda: rank_endpoints(selector, args.servers, "eu"), number=args.iterations // 10)
+        print(f"{policy.value:<14}{build:>10.2f}{top_k * scale:>12.2f}{demoted * scale:>12.2f}{whole * scale * 10:>12.2f}")
+    top_k = timeit.timeit(lambda: full_sort(servers, args.k), number=args.iterations // 10)
+    print(f"{'full sort':<14}{'-':>10}{top_k * scale * 10:>12.2f}{'-':>12}{'-':>12}")
+
+
+if __name__ == "__main__":
+    main()
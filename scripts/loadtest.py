@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Concurrency ramp against a running API, or a local uvicorn it spawns.
+
+Each level keeps ``concurrency`` requests in flight and reports req/s, p50 and
+p99. ``/api/v1/squads`` is still a sync handler on the thread pool and is
+included as the contrast for the async agent/subscription routes:
+
+    python3 scripts/loadtest.py --spawn --levels 1,16,64,256
+    python3 scripts/loadtest.py --base-url http://localhost:8080 --node-token ... --subscription-token ...
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from bench_common import NODE_TOKEN, ROOT, SUBSCRIPTION_TOKEN, percentile, seed_fleet, use_temp_database
+
+import httpx
+
+
+def scenarios(node_token: str, subscription_token: str) -> dict:
+    return {
+        "health": ("GET", "/api/v1/health", None),
+        "subscription": ("GET", f"/api/v1/subscriptions/{subscription_token}", None),
+        "agent.heartbeat": ("POST", "/agent/heartbeat", {"node_token": node_token}),
+        "agent.desired-config": ("GET", f"/agent/desired-config?node_token={node_token}", None),
+        "squads (sync)": ("GET", "/api/v1/squads", None),
+    }
+
+
+async def run_level(client: httpx.AsyncClient, method: str, path: str, body, concurrency: int, seconds: float):
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers={"X-Scopes": "*"})
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000, errors
+
+
+def spawn_server(port: int) -> subprocess.Popen:
+    use_temp_database()
+    seed_fleet()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=os.environ.copy(),
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/v1/health", timeout=0.5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8099")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn on a seeded temp SQLite database")
+    parser.add_argument("--levels", default="1,16,64,256")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--node-token", default=NODE_TOKEN)
+    parser.add_argument("--subscription-token", default=SUBSCRIPTION_TOKEN)
+    args = parser.parse_args()
+
+    process = spawn_server(int(args.base_url.rsplit(":", 1)[1])) if args.spawn else None
+    try:
+        limits = httpx.Limits(max_connections=max(int(level) for level in args.levels.split(",")))
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+            print(f"{'scenario':<22}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+            for name, (method, path, body) in scenarios(args.node_token, args.subscription_token).items():
+                for level in (int(level) for level in args.levels.split(",")):
+                    rps, p50, p99, errors = await run_level(client, method, path, body, level, args.seconds)
+                    print(f"{name:<22}{level:>6}{rps:>10.0f}{p50:>10.2f}{p99:>10.2f}{errors:>8}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())